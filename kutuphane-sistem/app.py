@@ -1,20 +1,36 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
+from typing import List
+import json
 import logging
+import os
+import time
+import uuid
 from dotenv import load_dotenv
-from integrations.query_service import QueryService
+from integrations.query_service import QueryService, BATCH_MAX_QUERIES
+from integrations.search_cursor import CursorExpired, SEARCH_PAGE_SIZE
+from integrations.results import dumps, text_answer
+from integrations.oai_pmh import OAIHarvester
+from integrations.library_api import CatalogMirrorSync, LIBRARY_SEARCH_MODE
+from integrations.oai_health import get_monitor
+from integrations.http_client import close_async_client
+from integrations.cache import cache_stats
+from integrations.resilience import breaker_status
+from integrations.shared_state import get_leader
+from integrations.query_log import QueryLog
+from integrations.warmup import CacheWarmer
+from integrations.yordam_token_manager import TokenRefresher, get_diagnostic_info, has_credentials
+from integrations import metrics
+from integrations.log_config import configure_logging, request_id_var, stop_logging
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging (levels, format and sampling come from LOG_* settings)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
@@ -26,8 +42,115 @@ app = FastAPI(
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
+# Run catalog, academic and website backends concurrently
+QUERY_FANOUT = os.getenv("QUERY_FANOUT", "true").lower() == "true"
+
 # Initialize services
+# (with several workers, background jobs run only in the worker holding the leader lease)
+leader = get_leader()
 query_service = QueryService()
+oai_monitor = get_monitor()
+oai_harvester = OAIHarvester(monitor=oai_monitor)
+catalog_sync = CatalogMirrorSync()
+token_refresher = TokenRefresher(leader)
+query_log = QueryLog()
+cache_warmer = CacheWarmer(query_service, query_log, leader)
+
+def all_cache_stats():
+    caches = cache_stats()
+    if query_service.semantic_cache is not None:
+        caches.append(query_service.semantic_cache.stats())
+    return caches
+
+metrics.CallbackMetric(
+    "cache_hit_ratio", "Share of cache lookups answered from the cache", ("cache",),
+    lambda: {(stats["name"],): stats["hit_ratio"] for stats in all_cache_stats()}
+)
+metrics.CallbackMetric(
+    "cache_lookups_total", "Cache lookups by result", ("cache", "result"),
+    lambda: {
+        (stats["name"], result): stats.get(result, 0)
+        for stats in all_cache_stats()
+        for result in ("hits", "stale_hits", "misses", "coalesced")
+        if result in stats
+    },
+    type_name="counter"
+)
+metrics.CallbackMetric(
+    "cache_entries", "Entries currently held per cache", ("cache",),
+    lambda: {(stats["name"],): stats["size"] for stats in all_cache_stats()}
+)
+
+@app.middleware("http")
+async def assign_request_id(request: Request, call_next):
+    """Her isteğe günlük kayıtlarında kullanılacak bir istek kimliği ata"""
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:12]
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+# Route paths as metric labels; anything else is grouped as "other"
+_metric_paths = None
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """İstek süresini ve eşzamanlı istek sayısını ölç"""
+    global _metric_paths
+    if _metric_paths is None:
+        _metric_paths = {route.path for route in app.routes}
+    path = request.url.path if request.url.path in _metric_paths else "other"
+    start = time.perf_counter()
+    status = 500
+    with metrics.REQUESTS_IN_FLIGHT.labels(path=path).track_inprogress():
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            metrics.REQUEST_LATENCY.labels(
+                method=request.method, path=path, status=str(status)
+            ).observe(time.perf_counter() - start)
+
+@app.on_event("startup")
+async def start_background_jobs():
+    """Arka plan işlerini başlat"""
+    leader.start()
+    token_refresher.start()
+    oai_monitor.start()
+    query_service.site_snapshot.start()
+    if os.getenv("OAI_HARVEST_ENABLED", "true").lower() == "true":
+        oai_harvester.start()
+    if LIBRARY_SEARCH_MODE in ("mirror", "hybrid"):
+        catalog_sync.start()
+    # Last, so the replayed queries find a token and the harvest store ready
+    await cache_warmer.start()
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    """Arka plan işlerini durdur"""
+    await cache_warmer.stop()
+    oai_harvester.stop()
+    catalog_sync.stop()
+    token_refresher.stop()
+    oai_monitor.stop()
+    await query_service.site_snapshot.stop()
+    leader.stop()
+    await close_async_client()
+    stop_logging()
+
+class ResultResponse(JSONResponse):
+    """
+    JSON response for answers and search pages. Result items serialize
+    themselves (integrations/results.dumps), so FastAPI's generic encoder is
+    skipped; endpoints return this response directly.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content).encode("utf-8")
 
 class Query(BaseModel):
     query: str
@@ -39,56 +162,188 @@ class Query(BaseModel):
             }
         }
 
+class BatchQuery(BaseModel):
+    queries: List[str]
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "queries": ["Yapay zeka konusunda kitap arıyorum", "Kütüphane duyuruları"]
+            }
+        }
+
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """Ana sayfa"""
     return templates.TemplateResponse("index.html", {"request": request})
 
-@app.post("/sorgula")
+@app.post("/sorgula", response_class=ResultResponse)
 async def sorgula(query: Query):
     """
-    Kullanıcı sorgusunu işle ve yanıt döndür.
+    Kullanıcı sorgusunu işle ve yapılandırılmış yanıt döndür
+    ({"source", "items", "text"}, bkz. integrations/results.py).
     Sırasıyla:
     1. Kütüphane kataloğunu kontrol et
     2. Akademik kaynakları kontrol et
     3. Website bilgilerini kontrol et
     4. Son çare olarak ChatGPT'yi kullan
+    Niyet yönlendiricisi sorguya yanıt veremeyecek kaynakları baştan atlar.
     """
-    try:
-        # Step 1: Library catalog
-        library_response = query_service.process_library_query(query.query)
-        if library_response:
-            return {"response": library_response}
+    query_log.record(query.query)
+    with metrics.QUERY_LATENCY.labels(endpoint="sorgula").time():
+        return ResultResponse(await _answer(query))
 
-        # Step 2: Academic resources
-        academic_response = query_service.process_academic_query(query.query)
-        if academic_response:
-            return {"response": academic_response}
+async def _answer(query: Query):
+    try:
+        if QUERY_FANOUT:
+            # Steps 1-3 concurrently, answer chosen in the same priority order
+            backend_response = await query_service.process_query_fanout(query.query)
+            if backend_response:
+                return backend_response
+            return text_answer("chatgpt", await query_service.get_chatgpt_response_async(query.query))
 
-        # Step 3: Website information
-        website_response = query_service.process_website_query(query.query)
-        if website_response:
-            return {"response": website_response}
+        # Steps 1-3 in order: catalog, academic resources, website information
+        # (backends the intent router rules out are skipped)
+        for name, handler, _ in query_service.backend_stages(query.query):
+            backend_response = await handler(query.query)
+            if backend_response:
+                metrics.count_answer(name)
+                return backend_response
 
         # Step 4: ChatGPT fallback
-        return {"response": query_service.get_chatgpt_response(query.query)}
+        return text_answer("chatgpt", await query_service.get_chatgpt_response_async(query.query))
 
     except Exception as e:
-        logger.error(f"Error processing query: {e}")
-        return {"response": query_service.get_chatgpt_response(query.query, is_error=True)}
+        logger.error("Error processing query: %s", e)
+        return text_answer("error", await query_service.get_chatgpt_response_async(query.query, is_error=True))
+
+@app.post("/sorgula/akis")
+async def sorgula_akis(query: Query):
+    """
+    Sorguyu akış olarak yanıtla (NDJSON, satır başına bir olay).
+    Kaynak sonuçları öncelik sırasıyla hazır oldukça, ChatGPT yanıtı ise parça parça gönderilir.
+    """
+    query_log.record(query.query)
+    async def events():
+        start = time.perf_counter()
+        try:
+            async for event in query_service.stream_query(query.query):
+                yield dumps(event) + "\n"
+        except Exception as e:
+            logger.error("Error streaming query: %s", e)
+            response = await query_service.get_chatgpt_response_async(query.query, is_error=True)
+            yield dumps({"type": "error", **text_answer("error", response)}) + "\n"
+            yield json.dumps({"type": "done"}) + "\n"
+        metrics.QUERY_LATENCY.labels(endpoint="sorgula_akis").observe(time.perf_counter() - start)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/sorgula/batch", response_class=ResultResponse)
+async def sorgula_batch(batch: BatchQuery):
+    """
+    Birden çok sorguyu tek istekte işle (kiosklar ve LMS entegrasyonu için).
+    Aynı sorgular bir kez yanıtlanır; katalog ve akademik aramalar toplu
+    yapılır. Yanıtlar istek sırasıyla, her biri "query" alanıyla döner.
+    """
+    if not batch.queries:
+        raise HTTPException(status_code=400, detail="En az bir sorgu gerekli")
+    if len(batch.queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"En fazla {BATCH_MAX_QUERIES} sorgu gönderilebilir")
+    if any(not query.strip() for query in batch.queries):
+        raise HTTPException(status_code=400, detail="Boş sorgu gönderilemez")
+    for query in batch.queries:
+        query_log.record(query)
+    with metrics.QUERY_LATENCY.labels(endpoint="sorgula_batch").time():
+        try:
+            return ResultResponse({"results": await query_service.process_batch(batch.queries)})
+        except Exception as e:
+            logger.error("Error processing query batch: %s", e)
+            raise HTTPException(status_code=500, detail="Sorgular işlenirken bir hata oluştu")
+
+@app.get("/ara", response_class=ResultResponse)
+async def ara(q: str = "", source: str = "catalog", limit: int = SEARCH_PAGE_SIZE, cursor: str = ""):
+    """
+    Katalog veya akademik kaynaklarda sayfalı arama (JSON).
+    İlk sayfa için `q` ve `source` (catalog/academic), sonraki sayfalar için
+    önceki yanıttaki `next_cursor` değeri `cursor` olarak gönderilir.
+    """
+    try:
+        if cursor:
+            return ResultResponse(await query_service.search_cursors.page(cursor))
+        if not q.strip():
+            raise HTTPException(status_code=400, detail="q veya cursor gerekli")
+        return ResultResponse(await query_service.search_cursors.search(source, q.strip(), limit))
+    except CursorExpired:
+        raise HTTPException(status_code=410, detail="Arama imlecinin süresi doldu, aramayı yeniden başlatın")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/durum/oai")
+async def oai_durum():
+    """OAI-PMH endpoint durumunu ve desteklenen formatları döndür"""
+    return oai_monitor.status()
+
+@app.get("/durum/onbellek")
+async def onbellek_durum():
+    """Önbellek isabet/ıska sayaçlarını döndür"""
+    return {"caches": all_cache_stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus metin formatında gecikme, verim ve önbellek metrikleri"""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/durum/site")
+async def site_durum():
+    """Web sitesi anlık görüntüsünün bölüm bazında son güncellenme zamanları"""
+    return query_service.site_snapshot.status()
+
+@app.get("/durum/isinma")
+async def isinma_durum():
+    """Önbellek ısıtma işinin son çalışması: tekrar oynatılan ve yanıtlanan sorgu sayısı, süre"""
+    return cache_warmer.status()
+
+@app.get("/durum/devre")
+async def devre_durum():
+    """Arka uç devre kesicilerinin durumu ve uyarlanabilir zaman aşımları"""
+    return {"breakers": breaker_status()}
+
+@app.get("/durum/calisan")
+async def calisan_durum():
+    """Bu çalışan sürecin kimliği, paylaşılan durum arka ucu ve arka plan işlerinin lideri olup olmadığı"""
+    return {
+        "pid": os.getpid(),
+        "shared_state": type(leader.state).__name__,
+        "leader": leader.is_leader,
+        "lease_owner": leader.owner
+    }
+
+@app.get("/durum/katalog")
+async def katalog_durum():
+    """Katalog arama modu, yerel katalog aynasının ve Yordam token'ının durumu"""
+    mirror = catalog_sync.mirror
+    diagnostics = get_diagnostic_info()
+    return {
+        "mode": LIBRARY_SEARCH_MODE,
+        "records": mirror.count(),
+        "last_sync": mirror.get_state("last_sync"),
+        "export_offset": mirror.get_state("export_offset"),
+        "token": {
+            "source": "login" if has_credentials() else "static",
+            "expiry": diagnostics["token_expiry"],
+            "has_static_token": diagnostics["has_static_token"]
+        }
+    }
 
 @app.get("/bilgiler", response_class=HTMLResponse)
 async def bilgiler(request: Request):
     """Kütüphane bilgilerini görüntüle"""
     try:
-        # Get announcements
-        announcements = query_service.web_scraper.get_announcements()
-        
-        # Get staff info
-        staff = query_service.web_scraper.get_all_staff_details()
-        
-        # Get contact info
-        contact = query_service.web_scraper.get_contact_info()
+        # Served from the background-refreshed snapshot, no outbound HTTP
+        snapshot = query_service.site_snapshot
+        announcements = snapshot.get_announcements()
+        staff = snapshot.get_all_staff_details()
+        contact = snapshot.get_contact_info()
 
         return templates.TemplateResponse(
             "bilgiler.html",
@@ -100,7 +355,7 @@ async def bilgiler(request: Request):
             }
         )
     except Exception as e:
-        logger.error(f"Error getting library information: {e}")
+        logger.error("Error getting library information: %s", e)
         return templates.TemplateResponse(
             "bilgiler.html",
             {
@@ -0,0 +1,54 @@
+"""
+Compares two benchmark result files, e.g. the run before and after a change:
+
+    python benchmarks/compare.py results/base.json results/new.json --max-regression 10
+
+Exits with status 1 if any p50/p95/p99 latency grew by more than
+--max-regression percent, so it can gate a CI job.
+"""
+from typing import Dict, Optional
+import argparse
+import json
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "error_rate")
+
+
+def _change(old: Optional[float], new: Optional[float]) -> Optional[float]:
+    if old is None or new is None or old == 0:
+        return None
+    return (new - old) / old * 100
+
+
+def compare(base: Dict, new: Dict, max_regression: float) -> bool:
+    """Prints a table of changes; returns False if a latency regression exceeds the limit."""
+    ok = True
+    sections = {"overall": (base["results"]["overall"], new["results"]["overall"])}
+    for endpoint, summary in new["results"]["endpoints"].items():
+        if endpoint in base["results"]["endpoints"]:
+            sections[endpoint] = (base["results"]["endpoints"][endpoint], summary)
+
+    print(f"base {base['commit']} ({base['timestamp']})  ->  new {new['commit']} ({new['timestamp']})")
+    for section, (old, current) in sections.items():
+        print(f"\n{section}")
+        for metric in METRICS:
+            change = _change(old.get(metric), current.get(metric))
+            flag = ""
+            if metric.endswith("_ms") and change is not None and change > max_regression:
+                flag = "  REGRESSION"
+                ok = False
+            change_text = f"{change:+.1f}%" if change is not None else "n/a"
+            print(f"  {metric:<16}{str(old.get(metric)):>12}{str(current.get(metric)):>12}{change_text:>10}{flag}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--max-regression", type=float, default=10, help="Allowed latency increase in percent")
+    args = parser.parse_args()
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    raise SystemExit(0 if compare(base, new, args.max_regression) else 1)
@@ -0,0 +1,252 @@
+"""
+Local stand-ins for every upstream the assistant talks to, on one port:
+
+    /yordam/webservis.php   Yordam webservice (Solr-style JSON, paging with start=, islem=token logins)
+    /oai/request            OAI-PMH repository (oai_dc, resumption tokens)
+    /site/...               Library website pages (ETag / 304 like the real site)
+    /v1/chat/completions    OpenAI-compatible chat endpoint (plain and streamed)
+
+Each upstream can be given latency, jitter and a failure rate:
+
+    python benchmarks/fake_upstreams.py --port 9100 --latency yordam=200 --jitter yordam=50 --fail oai=0.1
+"""
+from typing import Dict, List
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+UPSTREAMS = ("yordam", "oai", "site", "openai")
+
+WORDS = [
+    "yapay", "zeka", "tarih", "osmanlı", "ekonomi", "hukuk", "edebiyat", "roman", "fizik", "kimya",
+    "matematik", "eğitim", "psikoloji", "sosyoloji", "mühendislik", "tıp", "felsefe", "sanat", "müzik",
+    "biyoloji", "istatistik", "yönetim", "pazarlama", "programlama", "veri", "ağ", "güvenlik", "enerji",
+]
+AUTHORS = ["Ayşe Kaya", "Mehmet Demir", "İlber Ortaylı", "Orhan Pamuk", "Elif Şafak", "Ahmet Yılmaz"]
+ANSWER = (
+    "Kütüphanemiz hafta içi 08:00-22:00 arasında açıktır.\n\n"
+    "- Ödünç alma süresi 15 gündür\n- Kitaplar iki kez uzatılabilir\n- Geciken kitaplar için ceza uygulanır\n\n"
+    "Daha fazla bilgi için kütüphane personeliyle iletişime geçebilirsiniz."
+)
+OAI_NS = "http://www.openarchives.org/OAI/2.0/"
+
+
+def _title(i: int, words: int = 3) -> str:
+    rng = random.Random(i)
+    return " ".join(rng.choice(WORDS) for _ in range(words)).title()
+
+
+class Settings:
+    def __init__(self, args: argparse.Namespace):
+        self.latency = _per_upstream(args.latency)
+        self.jitter = _per_upstream(args.jitter)
+        self.fail = _per_upstream(args.fail)
+        self.catalog_size = args.catalog_size
+        self.oai_records = args.oai_records
+        self.oai_page = args.oai_page
+        self.staff = args.staff
+        self.token_delay = args.token_delay / 1000
+        self.yordam_token_ttl = args.yordam_token_ttl
+
+
+def _per_upstream(values: List[str]) -> Dict[str, float]:
+    parsed = {}
+    for value in values or []:
+        name, _, number = value.partition("=")
+        targets = UPSTREAMS if name == "all" else (name,)
+        for target in targets:
+            if target not in UPSTREAMS:
+                raise SystemExit(f"Unknown upstream {target!r}, expected one of {UPSTREAMS} or 'all'")
+            parsed[target] = float(number)
+    return parsed
+
+
+def create_app(settings: Settings) -> FastAPI:
+    app = FastAPI(title="Fake upstreams")
+    catalog = [
+        {
+            "id": str(i),
+            "kunyeEserAdiYazarlar_txt": _title(i),
+            "qYazar_str": AUTHORS[i % len(AUTHORS)],
+            "qYayinTarihi_str": str(1980 + i % 45),
+            "qYerNumarasi_str": f"QA{i % 900}.{i % 97}",
+            "qDurum_str": "Rafta" if i % 4 else "Ödünçte",
+        }
+        for i in range(settings.catalog_size)
+    ]
+
+    @app.middleware("http")
+    async def inject(request: Request, call_next):
+        upstream = request.url.path.strip("/").split("/")[0]
+        upstream = "openai" if upstream == "v1" else upstream
+        delay = settings.latency.get(upstream, 0) + random.uniform(0, settings.jitter.get(upstream, 0))
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if random.random() < settings.fail.get(upstream, 0):
+            return Response("injected failure", status_code=503)
+        return await call_next(request)
+
+    # Issued Yordam tokens -> expiry; only checked when --yordam-token-ttl is set
+    tokens: Dict[str, float] = {}
+
+    @app.get("/yordam/webservis.php")
+    async def yordam(islem: str = "arama", token: str = "", q: str = "", limit: int = 10, start: int = 0):
+        if islem == "token":
+            issued = f"fake-{len(tokens) + 1}"
+            ttl = settings.yordam_token_ttl or 3600
+            tokens[issued] = time.time() + ttl
+            return {"token": issued, "expires_in": ttl}
+        if settings.yordam_token_ttl and tokens.get(token, 0) <= time.time():
+            # Like the real webservice: an invalid token gets an empty 200 response
+            return Response("", media_type="application/json")
+        if q.strip() == "*":
+            docs = catalog
+        else:
+            terms = [term for term in q.lower().split() if term]
+            docs = [doc for doc in catalog if any(term in doc["kunyeEserAdiYazarlar_txt"].lower() for term in terms)]
+        return {"response": {"numFound": len(docs), "start": start, "docs": docs[start:start + limit]}}
+
+    def oai_response(body: str) -> Response:
+        xml = (
+            f'<?xml version="1.0" encoding="UTF-8"?><OAI-PMH xmlns="{OAI_NS}">'
+            f"<responseDate>{time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}</responseDate>"
+            f"<request>fake</request>{body}</OAI-PMH>"
+        )
+        return Response(xml, media_type="text/xml")
+
+    def oai_record(i: int) -> str:
+        return (
+            f"<record><header><identifier>oai:fake:{i}</identifier>"
+            f"<datestamp>2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}T00:00:00Z</datestamp></header>"
+            '<metadata><oai_dc:dc xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/" '
+            'xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            f"<dc:title>{_title(i + 100000, 5)}</dc:title><dc:creator>{AUTHORS[i % len(AUTHORS)]}</dc:creator>"
+            f"<dc:subject>{_title(i + 200000, 1)}</dc:subject>"
+            f"<dc:description>{_title(i + 300000, 12)}</dc:description>"
+            f"<dc:date>{2000 + i % 25}</dc:date><dc:identifier>http://earsiv.local/handle/{i}</dc:identifier>"
+            "</oai_dc:dc></metadata></record>"
+        )
+
+    @app.get("/oai/request")
+    async def oai(verb: str = "", resumptionToken: str = ""):
+        if verb == "Identify":
+            return oai_response(
+                "<Identify><repositoryName>Fake e-Arşiv</repositoryName><baseURL>fake</baseURL>"
+                "<protocolVersion>2.0</protocolVersion><granularity>YYYY-MM-DDThh:mm:ssZ</granularity></Identify>"
+            )
+        if verb == "ListMetadataFormats":
+            return oai_response(
+                "<ListMetadataFormats><metadataFormat><metadataPrefix>oai_dc</metadataPrefix>"
+                "</metadataFormat></ListMetadataFormats>"
+            )
+        if verb == "ListSets":
+            return oai_response("<ListSets><set><setSpec>com_1</setSpec><setName>Tezler</setName></set></ListSets>")
+        if verb == "ListIdentifiers":
+            return oai_response(
+                "<ListIdentifiers><header><identifier>oai:fake:0</identifier>"
+                "<datestamp>2024-01-01T00:00:00Z</datestamp></header></ListIdentifiers>"
+            )
+        if verb == "ListRecords":
+            start = int(resumptionToken or 0)
+            end = min(start + settings.oai_page, settings.oai_records)
+            token = (
+                f'<resumptionToken completeListSize="{settings.oai_records}" cursor="{start}">{end}</resumptionToken>'
+                if end < settings.oai_records else "<resumptionToken/>"
+            )
+            records = "".join(oai_record(i) for i in range(start, end))
+            return oai_response(f"<ListRecords>{records}{token}</ListRecords>")
+        return oai_response(f'<error code="badVerb">Unknown verb {verb}</error>')
+
+    def page(request: Request, html: str) -> Response:
+        etag = '"' + hashlib.md5(html.encode()).hexdigest() + '"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(html, media_type="text/html; charset=utf-8", headers={"ETag": etag})
+
+    @app.get("/site/tum-duyurular")
+    async def announcements(request: Request):
+        rows = "".join(
+            f'<tr><td>{i}</td><td>{i + 1:02d}.01.2025</td><td><a href="/site/duyuru/{i}">Duyuru {i}</a></td></tr>'
+            for i in range(10)
+        )
+        return page(request, f"<html><table><tr><th>#</th><th>Tarih</th><th>Başlık</th></tr>{rows}</table></html>")
+
+    @app.get("/site/idari-kadro")
+    async def staff_listing(request: Request):
+        links = "".join(f'<a href="/site/personel?pers_id={i}">Personel {i}</a>' for i in range(settings.staff))
+        return page(request, f"<html>{links}</html>")
+
+    @app.get("/site/personel")
+    async def staff_profile(request: Request, pers_id: int = 0):
+        return page(request, (
+            '<html><div class="form"><table>'
+            f"<tr><td>Adı Soyadı:</td><td>{AUTHORS[pers_id % len(AUTHORS)]} {pers_id}</td></tr>"
+            "<tr><td>Ünvanı:</td><td>Kütüphaneci</td></tr><tr><td>Birimi:</td><td>Kütüphane</td></tr>"
+            f'<tr><td>E-posta:</td><td><a href="mailto:personel{pers_id}@batman.edu.tr">e-posta</a></td></tr>'
+            "</table></div></html>"
+        ))
+
+    @app.get("/site/sayfalar/17995")
+    async def contact(request: Request):
+        return page(request, (
+            '<html><div class="dinamic-content text-left"><strong><span>Batman Üniversitesi Merkez Kütüphane'
+            '</span></strong><img alt="+90 488 217 3500"/><a href="mailto:kutuphane@batman.edu.tr">e-posta</a>'
+            "</div></html>"
+        ))
+
+    @app.post("/v1/chat/completions")
+    async def chat(request: Request):
+        body = await request.json()
+        created = int(time.time())
+        if not body.get("stream"):
+            return JSONResponse({
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": created, "model": body.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": ANSWER}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+
+        async def events():
+            for word in ANSWER.split(" "):
+                chunk = {
+                    "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created,
+                    "model": body.get("model"),
+                    "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                if settings.token_delay:
+                    await asyncio.sleep(settings.token_delay)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", action="append", metavar="UPSTREAM=MS",
+                        help="Fixed latency per upstream (yordam, oai, site, openai or all)")
+    parser.add_argument("--jitter", action="append", metavar="UPSTREAM=MS", help="Extra uniform random latency")
+    parser.add_argument("--fail", action="append", metavar="UPSTREAM=RATE", help="Share of requests answered with 503")
+    parser.add_argument("--catalog-size", type=int, default=20000)
+    parser.add_argument("--oai-records", type=int, default=5000)
+    parser.add_argument("--oai-page", type=int, default=100)
+    parser.add_argument("--staff", type=int, default=20)
+    parser.add_argument("--token-delay", type=float, default=5, help="Milliseconds between streamed chat tokens")
+    parser.add_argument("--yordam-token-ttl", type=float, default=0,
+                        help="Seconds issued Yordam tokens stay valid; 0 accepts any token")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    uvicorn.run(create_app(Settings(args)), host=args.host, port=args.port, log_level="warning")
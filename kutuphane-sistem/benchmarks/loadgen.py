@@ -0,0 +1,171 @@
+"""
+Open-loop load driver for a running assistant.
+
+Requests are started on a fixed schedule (`--rps`) regardless of how fast
+earlier ones finish, so queueing inside the service shows up as latency
+instead of being hidden by a slower request rate. Queries are replayed from a
+text file (one per line) or a JSONL query log with a "query" field.
+
+    python benchmarks/loadgen.py --url http://127.0.0.1:8000 --rps 20 --duration 60
+"""
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import time
+import httpx
+
+DEFAULT_QUERIES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "queries.txt")
+
+
+def load_queries(path: str) -> List[str]:
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            queries.append(json.loads(line)["query"] if line.startswith("{") else line)
+    if not queries:
+        raise SystemExit(f"No queries in {path}")
+    return queries
+
+
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples: List[Dict], elapsed: float) -> Dict:
+    """Latency percentiles (ms), error counts and throughput for a list of samples."""
+    latencies = sorted(sample["latency"] for sample in samples if sample["ok"])
+    errors = sum(1 for sample in samples if not sample["ok"])
+
+    def ms(value: Optional[float]) -> Optional[float]:
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+        "mean_ms": ms(sum(latencies) / len(latencies) if latencies else None),
+    }
+
+
+async def run_load(base_url: str, queries: List[str], rps: float, duration: float,
+                   bilgiler_ratio: float = 0.1, stream_ratio: float = 0.0,
+                   max_in_flight: int = 256, timeout: float = 60, seed: int = 1) -> Dict:
+    """
+    Drives /sorgula, /sorgula/akis and /bilgiler at `rps` for `duration` seconds.
+
+    Returns:
+        Dict: Overall and per-endpoint summaries plus the number of requests
+        dropped because `max_in_flight` was reached
+    """
+    rng = random.Random(seed)
+    query_cycle = itertools.cycle(queries)
+    samples: List[Dict] = []
+    in_flight = asyncio.Semaphore(max_in_flight)
+    dropped = 0
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def one(endpoint: str, query: str):
+            start = time.perf_counter()
+            ok = False
+            try:
+                if endpoint == "/bilgiler":
+                    response = await client.get(endpoint)
+                    ok = response.status_code == 200
+                elif endpoint == "/sorgula/akis":
+                    async with client.stream("POST", endpoint, json={"query": query}) as response:
+                        async for _ in response.aiter_lines():
+                            pass
+                    ok = response.status_code == 200
+                else:
+                    response = await client.post(endpoint, json={"query": query})
+                    body = response.json() if response.status_code == 200 else {}
+                    ok = bool(body.get("items") or body.get("text"))
+            except Exception:
+                ok = False
+            finally:
+                in_flight.release()
+            samples.append({"endpoint": endpoint, "latency": time.perf_counter() - start, "ok": ok})
+
+        tasks = []
+        started = time.perf_counter()
+        interval = 1.0 / rps
+        next_at = started
+        while next_at - started < duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            next_at += interval
+            roll = rng.random()
+            if roll < bilgiler_ratio:
+                endpoint = "/bilgiler"
+            elif roll < bilgiler_ratio + stream_ratio:
+                endpoint = "/sorgula/akis"
+            else:
+                endpoint = "/sorgula"
+            if in_flight.locked():
+                dropped += 1
+                continue
+            await in_flight.acquire()
+            tasks.append(asyncio.ensure_future(one(endpoint, next(query_cycle))))
+        send_elapsed = time.perf_counter() - started
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    endpoints = sorted({sample["endpoint"] for sample in samples})
+    return {
+        "target_rps": rps,
+        "duration_s": round(send_elapsed, 2),
+        "elapsed_s": round(elapsed, 2),
+        "dropped": dropped,
+        "overall": summarize(samples, elapsed),
+        "endpoints": {
+            endpoint: summarize([sample for sample in samples if sample["endpoint"] == endpoint], elapsed)
+            for endpoint in endpoints
+        },
+    }
+
+
+def add_load_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--rps", type=float, default=10, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to send requests for")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES, help="Text file or JSONL query log to replay")
+    parser.add_argument("--bilgiler-ratio", type=float, default=0.1, help="Share of requests sent to /bilgiler")
+    parser.add_argument("--stream-ratio", type=float, default=0.0, help="Share of queries sent to /sorgula/akis")
+    parser.add_argument("--max-in-flight", type=int, default=256,
+                        help="Requests beyond this many outstanding are dropped and counted")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def load_from_args(base_url: str, args: argparse.Namespace) -> Dict:
+    return asyncio.run(run_load(
+        base_url, load_queries(args.queries), args.rps, args.duration,
+        bilgiler_ratio=args.bilgiler_ratio, stream_ratio=args.stream_ratio,
+        max_in_flight=args.max_in_flight, timeout=args.timeout, seed=args.seed
+    ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the running assistant")
+    add_load_arguments(parser)
+    args = parser.parse_args()
+    print(json.dumps(load_from_args(args.url, args), indent=2, ensure_ascii=False))
@@ -0,0 +1,146 @@
+"""
+End-to-end benchmark: starts the fake upstreams and the assistant wired to
+them, drives it with loadgen and writes the results as JSON.
+
+    python benchmarks/run.py --rps 20 --duration 60 --latency yordam=150 --fail yordam=0.05
+
+Results go to benchmarks/results/<timestamp>-<commit>.json; compare two runs
+with benchmarks/compare.py.
+"""
+from typing import Dict, List
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+from loadgen import add_load_arguments, load_from_args
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+
+
+def wait_ready(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=2).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"{url} did not become ready within {timeout:.0f}s")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def app_environment(upstream_url: str, workdir: str, extra: List[str]) -> Dict[str, str]:
+    """Points every upstream setting of the assistant at the fake servers."""
+    env = dict(os.environ)
+    env.update({
+        "YORDAM_API_URL": f"{upstream_url}/yordam/webservis.php",
+        "STATIC_YORDAM_TOKEN": "benchmark",
+        "OAI_PMH_ENDPOINT": f"{upstream_url}/oai/request",
+        "OAI_STORE_PATH": os.path.join(workdir, "oai_store.sqlite3"),
+        "LIBRARY_WEBSITE_URL": f"{upstream_url}/site",
+        "CONTACT_PAGE_URL": f"{upstream_url}/site/sayfalar/17995",
+        "SITE_SNAPSHOT_PATH": os.path.join(workdir, "site_snapshot.json"),
+        "CATALOG_MIRROR_PATH": os.path.join(workdir, "catalog_mirror.sqlite3"),
+        "QUERY_LOG_PATH": os.path.join(workdir, "query_log.sqlite3"),
+        "OPENAI_BASE_URL": f"{upstream_url}/v1",
+        "OPENAI_API_KEY": "benchmark",
+    })
+    for assignment in extra:
+        name, _, value = assignment.partition("=")
+        env[name] = value
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--upstream-port", type=int, default=9100)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes for the assistant")
+    parser.add_argument("--warmup", type=float, default=5,
+                        help="Seconds to wait after startup so background harvest and scraping can run")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="Extra environment for the assistant, e.g. LIBRARY_SEARCH_MODE=hybrid")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<timestamp>-<commit>.json)")
+    parser.add_argument("--label", default="", help="Free-form note stored with the results")
+    for name in ("--latency", "--jitter", "--fail"):
+        parser.add_argument(name, action="append", default=[], metavar="UPSTREAM=VALUE",
+                            help=f"Passed to fake_upstreams.py {name}")
+    add_load_arguments(parser)
+    args = parser.parse_args()
+
+    upstream_url = f"http://127.0.0.1:{args.upstream_port}"
+    app_url = f"http://127.0.0.1:{args.app_port}"
+    upstream_cmd = [sys.executable, os.path.join(BENCH_DIR, "fake_upstreams.py"), "--port", str(args.upstream_port)]
+    for name in ("latency", "jitter", "fail"):
+        for value in getattr(args, name):
+            upstream_cmd += [f"--{name}", value]
+    app_cmd = [
+        sys.executable, "-m", "uvicorn", "app:app", "--port", str(args.app_port),
+        "--workers", str(args.workers), "--log-level", "warning",
+    ]
+
+    processes = []
+    with tempfile.TemporaryDirectory(prefix="kutuphane-bench-") as workdir, \
+            open(os.path.join(workdir, "app.log"), "w") as log:
+        try:
+            processes.append(subprocess.Popen(upstream_cmd))
+            wait_ready(f"{upstream_url}/oai/request?verb=Identify")
+            processes.append(subprocess.Popen(
+                app_cmd, cwd=APP_DIR, env=app_environment(upstream_url, workdir, args.env),
+                stdout=log, stderr=subprocess.STDOUT
+            ))
+            wait_ready(f"{app_url}/durum/onbellek")
+            time.sleep(args.warmup)
+
+            results = load_from_args(app_url, args)
+        finally:
+            for process in reversed(processes):
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "label": args.label,
+        "config": {
+            "rps": args.rps, "duration": args.duration, "workers": args.workers,
+            "bilgiler_ratio": args.bilgiler_ratio, "stream_ratio": args.stream_ratio,
+            "queries": os.path.basename(args.queries),
+            "latency": args.latency, "jitter": args.jitter, "fail": args.fail, "env": args.env,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        BENCH_DIR, "results", f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    overall = results["overall"]
+    print(f"{overall['requests']} requests, {overall['errors']} errors, {results['dropped']} dropped, "
+          f"{overall['throughput_rps']} req/s, p50 {overall['p50_ms']} ms, p95 {overall['p95_ms']} ms, "
+          f"p99 {overall['p99_ms']} ms")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
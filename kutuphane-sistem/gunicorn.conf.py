@@ -0,0 +1,24 @@
+"""
+Multi-worker launch: gunicorn -c gunicorn.conf.py app:app
+
+Workers share caches, the website snapshot and the Yordam token through the
+shared state backend, and only one of them (the leader) runs background
+harvesting, syncing and scraping. The in-process backend cannot be shared,
+so SQLite is used unless SHARED_STATE_BACKEND says otherwise.
+"""
+import multiprocessing
+import os
+from dotenv import load_dotenv
+
+# Load .env first: load_dotenv does not override variables that are already set,
+# so the default below would otherwise hide SHARED_STATE_BACKEND from .env
+load_dotenv()
+os.environ.setdefault("SHARED_STATE_BACKEND", "sqlite")
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Workers whose event loop stays blocked this long are restarted
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
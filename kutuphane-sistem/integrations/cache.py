@@ -0,0 +1,280 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from collections import OrderedDict
+import asyncio
+import re
+import threading
+import time
+import logging
+from .text_index import turkish_lower
+from .shared_state import get_state
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Every TTLCache registers itself here so its counters can be reported
+_registry: List["TTLCache"] = []
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a user query: Turkish lowercase, collapsed whitespace."""
+    return _WHITESPACE_RE.sub(" ", turkish_lower(query)).strip()
+
+
+class TTLCache:
+    """
+    Bounded LRU cache with per-entry expiry.
+
+    Entries are fresh for `ttl` seconds and may then be served stale for another
+    `stale_ttl` seconds while a single background refresh runs. Concurrent
+    misses for the same key share one loader call (request coalescing).
+    Empty results are kept for `negative_ttl` seconds only and never served
+    stale, so a transient upstream failure is not remembered for long.
+
+    With `shared=True` and a shared state backend configured, entries are also
+    written to the shared state and a local miss checks it before loading, so
+    one worker's upstream call serves every worker. On the async path
+    (get_async, set_async, get_or_load) those shared reads and writes run in
+    the default executor, since SQLite and Redis calls block. Values must then be JSON
+    serializable, or `encode`/`decode` must convert them to and from a JSON
+    form (e.g. results.pack_items for lists of result items). Concurrent
+    misses in different workers are not coalesced.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 300,
+                 stale_ttl: float = 600, negative_ttl: float = 30, shared: bool = False,
+                 encode: Optional[Callable[[Any], Any]] = None, decode: Optional[Callable[[Any], Any]] = None):
+        self.name = name
+        self._encode = encode
+        self._decode = decode
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        # key -> (value, fresh until, stale until), monotonic
+        self._data: "OrderedDict[Hashable, Tuple[Any, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._inflight_sync: Dict[Hashable, threading.Event] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.shared_hits = 0
+        state = get_state() if shared else None
+        self._shared = state if state is not None and state.shared else None
+        _registry.append(self)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any, bool]:
+        """Returns (found, value, fresh), consulting the shared state on a local miss."""
+        found, value, fresh = self._lookup_local(key)
+        if not found and self._shared is not None and self._pull_shared(key):
+            return self._lookup_local(key)
+        return found, value, fresh
+
+    def _lookup_local(self, key: Hashable) -> Tuple[bool, Any, bool]:
+        """Returns (found, value, fresh) and refreshes the entry's LRU position."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None, False
+            value, expires, stale_until = entry
+            if now < expires:
+                self._data.move_to_end(key)
+                return True, value, True
+            if now < stale_until:
+                self._data.move_to_end(key)
+                return True, value, False
+            del self._data[key]
+            return False, None, False
+
+    async def _lookup_async(self, key: Hashable) -> Tuple[bool, Any, bool]:
+        """_lookup with the shared state read in the default executor."""
+        found, value, fresh = self._lookup_local(key)
+        # A key being loaded here will be in the local cache soon, skip the shared read
+        if not found and self._shared is not None and key not in self._inflight:
+            if await asyncio.get_running_loop().run_in_executor(None, self._pull_shared, key):
+                return self._lookup_local(key)
+        return found, value, fresh
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        found, value, _ = self._lookup(key)
+        return value if found else None
+
+    async def get_async(self, key: Hashable) -> Optional[Any]:
+        found, value, _ = await self._lookup_async(key)
+        return value if found else None
+
+    def set(self, key: Hashable, value: Any):
+        ttl = self._store(key, value)
+        if self._shared is not None:
+            self._write_shared(key, value, ttl)
+
+    async def set_async(self, key: Hashable, value: Any):
+        """set with the shared state write in the default executor."""
+        ttl = self._store(key, value)
+        if self._shared is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_shared, key, value, ttl)
+
+    def _store(self, key: Hashable, value: Any) -> float:
+        """Stores value locally and returns its TTL."""
+        ttl = self.ttl if value else self.negative_ttl
+        self._store_local(key, value, time.monotonic() + ttl)
+        return ttl
+
+    def _stale_ttl(self, value: Any) -> float:
+        """Seconds value may be served stale after expiring; none for empty results."""
+        return self.stale_ttl if value else 0
+
+    def _write_shared(self, key: Hashable, value: Any, ttl: float):
+        try:
+            # Wall-clock expiry, since monotonic clocks differ between processes
+            shared_value = self._encode(value) if self._encode is not None else value
+            self._shared.set(self._shared_key(key), [shared_value, time.time() + ttl],
+                             ttl=ttl + self._stale_ttl(value))
+        except Exception as e:
+            logger.warning("Could not write %s cache entry to shared state: %s", self.name, e)
+
+    def _store_local(self, key: Hashable, value: Any, expires: float):
+        with self._lock:
+            self._data[key] = (value, expires, expires + self._stale_ttl(value))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def _shared_key(self, key: Hashable) -> str:
+        return f"cache:{self.name}:{key}"
+
+    def _pull_shared(self, key: Hashable) -> bool:
+        """Copies the shared entry for key into the local cache. Returns False if there is none."""
+        try:
+            entry = self._shared.get(self._shared_key(key))
+        except Exception as e:
+            logger.warning("Shared state unavailable for %s cache: %s", self.name, e)
+            return False
+        if entry is None:
+            return False
+        value, expires_at = entry
+        if self._decode is not None:
+            try:
+                value = self._decode(value)
+            except Exception as e:
+                # e.g. an entry written in an older format: load it again instead
+                logger.warning("Could not decode shared %s cache entry: %r", self.name, e)
+                return False
+        self._store_local(key, value, time.monotonic() + (expires_at - time.time()))
+        self.shared_hits += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "shared_hits": self.shared_hits,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0
+        }
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Returns the cached value for key, calling `loader` on a miss.
+        A stale value is returned immediately and refreshed in the background.
+        """
+        found, value, fresh = await self._lookup_async(key)
+        if found:
+            if fresh:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                self._load_shared(key, loader)
+            return value
+
+        if key in self._inflight:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+        return await asyncio.shield(self._load_shared(key, loader))
+
+    def _load_shared(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        future = self._inflight.get(key)
+        if future is not None:
+            return future
+
+        async def load():
+            try:
+                result = await loader()
+                await self.set_async(key, result)
+                return result
+            finally:
+                self._inflight.pop(key, None)
+
+        future = self._inflight[key] = asyncio.ensure_future(load())
+        # Background refreshes may finish with nobody awaiting them
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return future
+
+    def get_or_load_sync(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Blocking counterpart of get_or_load for threaded callers."""
+        found, value, fresh = self._lookup(key)
+        if found and fresh:
+            self.hits += 1
+            return value
+        if found:
+            self.stale_hits += 1
+            with self._lock:
+                refreshing = key in self._inflight_sync
+                if not refreshing:
+                    self._inflight_sync[key] = threading.Event()
+            if not refreshing:
+                threading.Thread(target=self._refresh_sync, args=(key, loader), daemon=True).start()
+            return value
+
+        with self._lock:
+            event = self._inflight_sync.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight_sync[key] = threading.Event()
+        if not leader:
+            self.coalesced += 1
+            event.wait()
+            found, value, _ = self._lookup(key)
+            if found:
+                return value
+            # The leading call failed; load ourselves rather than fail too
+            return loader()
+
+        self.misses += 1
+        return self._refresh_sync(key, loader)
+
+    def _refresh_sync(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Runs the loader for a key whose in-flight event is already registered."""
+        try:
+            result = loader()
+            self.set(key, result)
+            return result
+        except Exception as e:
+            logger.error("%s cache refresh failed: %s", self.name, e)
+            raise
+        finally:
+            with self._lock:
+                event = self._inflight_sync.pop(key, None)
+            if event:
+                event.set()
+
+
+def cache_stats() -> List[Dict[str, Any]]:
+    """Hit/miss counters of every cache in the process."""
+    return [cache.stats() for cache in _registry]
@@ -0,0 +1,177 @@
+from typing import Dict, Iterable, List, Optional
+import os
+import sqlite3
+import threading
+import logging
+from dotenv import load_dotenv
+from .text_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Local catalog mirror location
+CATALOG_MIRROR_PATH = os.getenv("CATALOG_MIRROR_PATH", "data/catalog_mirror.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalog (
+    record_id TEXT PRIMARY KEY,
+    title TEXT,
+    author TEXT,
+    year TEXT,
+    call_number TEXT,
+    availability TEXT,
+    synced_at TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS catalog_fts USING fts5(title, author, tokenize = 'unicode61');
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+RECORD_FIELDS = ("record_id", "title", "author", "year", "call_number", "availability", "synced_at")
+
+
+def _index_text(text: str) -> str:
+    """Turkish-folded, stemmed terms, so the FTS index matches the same way as the OAI index."""
+    return " ".join(tokenize(text or "", keep_stopwords=True))
+
+
+def _match_expression(query: str, operator: str) -> Optional[str]:
+    terms = tokenize(query)
+    if not terms:
+        return None
+    # Prefix match on the stem also catches suffixed forms the stemmer left alone
+    return f" {operator} ".join(f'"{term}"*' for term in dict.fromkeys(terms))
+
+
+class CatalogMirror:
+    """
+    SQLite copy of the Yordam catalog with an FTS5 index over title and author.
+
+    Records are written by the background export sync and read by catalog
+    searches, so answering a query needs no Yordam round trip. Each sync pass
+    stamps the records it sees; records not seen by a completed pass are
+    removed with prune().
+    """
+
+    def __init__(self, path: str = CATALOG_MIRROR_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+        logger.info("Catalog mirror opened: %s (%d records)", path, self.count())
+
+    def upsert_records(self, records: Iterable[Dict]) -> int:
+        """Insert or update exported records. Returns the number of rows written."""
+        rows = [
+            tuple(str(record.get(field) or "") for field in RECORD_FIELDS)
+            for record in records
+            if record.get("record_id")
+        ]
+        if not rows:
+            return 0
+        with self._lock:
+            for row in rows:
+                # Upsert keeps the rowid stable so the FTS row can be replaced in place
+                self._conn.execute(
+                    "INSERT INTO catalog (record_id, title, author, year, call_number, availability, synced_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(record_id) DO UPDATE SET title = excluded.title, author = excluded.author, "
+                    "year = excluded.year, call_number = excluded.call_number, "
+                    "availability = excluded.availability, synced_at = excluded.synced_at",
+                    row
+                )
+                rowid = self._conn.execute("SELECT rowid FROM catalog WHERE record_id = ?", (row[0],)).fetchone()[0]
+                self._conn.execute("DELETE FROM catalog_fts WHERE rowid = ?", (rowid,))
+                self._conn.execute(
+                    "INSERT INTO catalog_fts (rowid, title, author) VALUES (?, ?, ?)",
+                    (rowid, _index_text(row[1]), _index_text(row[2]))
+                )
+            self._conn.commit()
+        return len(rows)
+
+    def prune(self, synced_before: str) -> int:
+        """Deletes records that the last completed sync pass did not see."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM catalog_fts WHERE rowid IN (SELECT rowid FROM catalog WHERE synced_at < ?)",
+                (synced_before,)
+            )
+            deleted = self._conn.execute("DELETE FROM catalog WHERE synced_at < ?", (synced_before,)).rowcount
+            self._conn.commit()
+        return deleted
+
+    def get_state(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def set_state(self, key: str, value: Optional[str]):
+        with self._lock:
+            if value is None:
+                self._conn.execute("DELETE FROM sync_state WHERE key = ?", (key,))
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+                    (key, value)
+                )
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM catalog").fetchone()[0]
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """
+        Full-text search over the mirrored catalog, ranked with BM25.
+        All query terms are required; if that finds nothing, any term may match.
+
+        Args:
+            query (str): Search query
+            limit (int): Maximum number of records to return
+
+        Returns:
+            List[Dict]: Records in the same shape as live Yordam results, best first
+        """
+        for operator in ("AND", "OR"):
+            expression = _match_expression(query, operator)
+            if expression is None:
+                return []
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT c.record_id, c.title, c.author, c.year, c.call_number, c.availability, c.synced_at "
+                    "FROM catalog_fts JOIN catalog c ON c.rowid = catalog_fts.rowid "
+                    "WHERE catalog_fts MATCH ? ORDER BY bm25(catalog_fts, 3.0, 2.0) LIMIT ?",
+                    (expression, limit)
+                ).fetchall()
+            if rows:
+                return [dict(row) for row in rows]
+        return []
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_mirror: Optional[CatalogMirror] = None
+_mirror_lock = threading.Lock()
+
+
+def get_mirror() -> CatalogMirror:
+    """Returns the process wide catalog mirror, opening it on first use."""
+    global _mirror
+    if _mirror is None:
+        with _mirror_lock:
+            if _mirror is None:
+                _mirror = CatalogMirror()
+    return _mirror
@@ -0,0 +1,51 @@
+from typing import Optional
+import importlib.util
+import os
+import logging
+import httpx
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package."""
+    return HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Returns the process wide async HTTP client.
+    All upstream calls share its connection pool, so TCP/TLS connections are
+    kept alive between requests. Must be called from the event loop thread.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=_http2_available(),
+            timeout=httpx.Timeout(10.0),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE
+            ),
+            follow_redirects=True
+        )
+        logger.info("Async HTTP client created (http2=%s)", _http2_available())
+    return _client
+
+
+async def close_async_client():
+    """Closes the shared client; called on application shutdown."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
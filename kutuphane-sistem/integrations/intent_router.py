@@ -0,0 +1,159 @@
+from typing import Dict, List, Optional, Tuple
+from collections import Counter
+import json
+import math
+import os
+import re
+import logging
+from dotenv import load_dotenv
+from .text_index import turkish_casefold, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "true").lower() == "true"
+INTENT_THRESHOLD = float(os.getenv("INTENT_THRESHOLD", "0.6"))
+# Optional JSONL training file: {"text": "...", "intent": "catalog|academic|website|general"}
+INTENT_TRAINING_PATH = os.getenv("INTENT_TRAINING_PATH", "").strip()
+
+# Backends to ask for each intent, in cascade priority order.
+# "general" goes straight to ChatGPT.
+INTENT_BACKENDS = {
+    "catalog": ["catalog", "academic"],
+    "academic": ["academic", "catalog"],
+    "website": ["website"],
+    "general": [],
+}
+
+# Website section -> keywords (Turkish-folded). Used both to route website
+# questions and by QueryService to pick the section, so the two cannot disagree
+WEBSITE_TOPICS = {
+    "announcements": r"duyuru\w*",
+    "staff": r"personel\w*|calisan\w*",
+    "contact": r"iletisim\w*|adres\w*|telefon\w*|e-?posta\w*",
+}
+# Words that mark a staff or contact keyword as a question about the library
+# rather than part of a book title ("Personel Yönetimi", "Adres Defteri").
+# "...niz/...nuz" is the polite possessive: "adresiniz", "telefonunuz"
+WEBSITE_CONTEXT = r"kutuphane\w*|numara\w*|nere\w*|kimler\w*|nedir|ulas\w*|\w+(?:niz|nuz)\b"
+
+# (intent, weight, pattern) over Turkish-folded text. A rule at or above
+# INTENT_THRESHOLD decides the route on its own; words that also occur in book
+# titles ("Suç ve Ceza", "Da Vinci Şifresi", "Çelik Nasıl Su Verildi") stay
+# below it, so alone they leave the query to the full cascade. Staff and
+# contact words only count for the website together with WEBSITE_CONTEXT
+RULES = [
+    ("website", 0.9, r"\b(" + WEBSITE_TOPICS["announcements"] + r"|iletisim bilgi\w*)"
+     + r"|^(?=.*\b(" + WEBSITE_TOPICS["staff"] + "|" + WEBSITE_TOPICS["contact"] + r"))"
+     + r"(?=.*\b(" + WEBSITE_CONTEXT + "))"),
+    ("academic", 0.8, r"\b(tez\w*|makale\w*|bildiri\w*|akademik|doktora|yuksek lisans|dergi makale\w*|e-?arsiv)"),
+    ("catalog", 0.6, r"\b(kitap\w*|kitab\w*|roman\w*|yazar\w*|eser\w*|isbn|katalog\w*|yayin\w*)"),
+    ("general", 0.7, r"\b(merhaba|selam|tesekkur\w*|sagol|gunaydin|iyi aksamlar|nasilsin)\b"),
+    ("general", 0.7, r"\b(kacta|saat kac|calisma saat\w*|acik mi|kapali mi|ne zaman (acil|kapan)\w*)"),
+    ("general", 0.5, r"\b(odunc|uye ol\w*|uyelik|kart\w*|ceza\w*|iade|wifi|wi-fi|internet|sifre\w*|nasil)\b"),
+    ("general", 0.3, r"\b(nedir|ne demek|misin|musun|miyim|yardim\w*)\b"),
+]
+
+_COMPILED = [(intent, weight, re.compile(pattern)) for intent, weight, pattern in RULES]
+_WEBSITE_TOPICS = [(topic, re.compile(r"\b(" + pattern + ")")) for topic, pattern in WEBSITE_TOPICS.items()]
+
+
+def website_topic(query: str) -> Optional[str]:
+    """The website section (a WEBSITE_TOPICS key) a query asks about, or None."""
+    text = turkish_casefold(query)
+    for topic, pattern in _WEBSITE_TOPICS:
+        if pattern.search(text):
+            return topic
+    return None
+
+
+class NaiveBayesIntentModel:
+    """Multinomial naive Bayes over folded, stemmed tokens; small and fast enough for per-query use."""
+
+    def __init__(self, examples: List[Tuple[str, str]]):
+        self.term_counts: Dict[str, Counter] = {}
+        self.doc_counts: Counter = Counter()
+        vocabulary = set()
+        for text, intent in examples:
+            terms = tokenize(text, keep_stopwords=True)
+            self.term_counts.setdefault(intent, Counter()).update(terms)
+            self.doc_counts[intent] += 1
+            vocabulary.update(terms)
+        self.vocab_size = max(len(vocabulary), 1)
+        self.totals = {intent: sum(counts.values()) for intent, counts in self.term_counts.items()}
+        self.n_docs = sum(self.doc_counts.values())
+
+    @classmethod
+    def from_jsonl(cls, path: str) -> "NaiveBayesIntentModel":
+        examples = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    examples.append((row["text"], row["intent"]))
+        return cls(examples)
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """Returns (intent, posterior probability)."""
+        terms = tokenize(text, keep_stopwords=True)
+        if not terms or not self.n_docs:
+            return None, 0.0
+        log_probs = {}
+        for intent, counts in self.term_counts.items():
+            score = math.log(self.doc_counts[intent] / self.n_docs)
+            denominator = self.totals[intent] + self.vocab_size
+            for term in terms:
+                score += math.log((counts.get(term, 0) + 1) / denominator)
+            log_probs[intent] = score
+        best = max(log_probs, key=log_probs.get)
+        peak = log_probs[best]
+        total = sum(math.exp(value - peak) for value in log_probs.values())
+        return best, 1.0 / total
+
+
+class IntentRouter:
+    """
+    Decides up front which backends can answer a query.
+
+    Keyword rules run first. If they are not confident, the optional trained
+    model is asked. If neither reaches the threshold, route() returns None and
+    the caller runs the full cascade as before.
+    """
+
+    def __init__(self, model: Optional[NaiveBayesIntentModel] = None, threshold: float = INTENT_THRESHOLD):
+        self.threshold = threshold
+        self.model = model
+        if self.model is None and INTENT_TRAINING_PATH:
+            try:
+                self.model = NaiveBayesIntentModel.from_jsonl(INTENT_TRAINING_PATH)
+                logger.info("Intent model trained from %s", INTENT_TRAINING_PATH)
+            except Exception as e:
+                logger.error("Could not train intent model: %s", e)
+
+    def classify(self, query: str) -> Tuple[Optional[str], float]:
+        """Returns (intent, confidence) from the rules, falling back to the model."""
+        text = turkish_casefold(query)
+        scores: Dict[str, float] = {}
+        for intent, weight, pattern in _COMPILED:
+            if pattern.search(text):
+                scores[intent] = scores.get(intent, 0.0) + weight
+        if scores:
+            best = max(scores, key=scores.get)
+            top = scores[best]
+            # Share of the total evidence, damped when the winning evidence is weak
+            confidence = top / sum(scores.values()) * min(1.0, top)
+            if confidence >= self.threshold or self.model is None:
+                return best, confidence
+        if self.model is not None:
+            return self.model.predict(query)
+        return None, 0.0
+
+    def route(self, query: str) -> Optional[List[str]]:
+        """Backends to ask in priority order, or None to run the full cascade."""
+        intent, confidence = self.classify(query)
+        if intent in INTENT_BACKENDS and confidence >= self.threshold:
+            logger.debug("Intent %s (%.2f) for query %r", intent, confidence, query)
+            return INTENT_BACKENDS[intent]
+        return None
@@ -1,145 +1,538 @@
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+from datetime import datetime
 import requests
+import httpx
+import asyncio
+import contextvars
+import json
 import os
+import threading
 from dotenv import load_dotenv
 import logging
-from .yordam_token_manager import get_yordam_token, validate_token
+from .yordam_token_manager import get_yordam_token, renew_yordam_token, renew_yordam_token_async, validate_token
+from .http_client import get_async_client
+from .cache import TTLCache, normalize_query
+from .catalog_mirror import CatalogMirror, get_mirror
+from .resilience import CircuitOpenError, get_breaker
+from .results import CatalogItem, catalog_item, pack_items, unpack_items
+from .shared_state import LeaderLease, SHARED_STATE_POLL_INTERVAL, get_leader
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
 # API Configuration
-API_URL = "https://katalog.yordamdestek.com/yordam/webservis/webservis.php"
+API_URL = os.getenv("YORDAM_API_URL", "https://katalog.yordamdestek.com/yordam/webservis/webservis.php")
 
-def query_library(query: str, token: str) -> List[Dict]:
+# Catalog response cache: popular searches are answered without an upstream call,
+# and with a shared state backend one worker's answer serves all workers.
+# Entries are CatalogItem lists, stored in the shared state as compact rows
+catalog_cache = TTLCache(
+    "catalog",
+    maxsize=int(os.getenv("CATALOG_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("CATALOG_CACHE_TTL", "600")),
+    stale_ttl=float(os.getenv("CATALOG_CACHE_STALE_TTL", "1800")),
+    shared=True,
+    encode=pack_items,
+    decode=unpack_items
+)
+
+# live: every search goes to Yordam (default)
+# mirror: searches are answered from the local catalog mirror only
+# hybrid: mirror results, with availability refreshed from Yordam when it answers in time
+LIBRARY_SEARCH_MODE = os.getenv("LIBRARY_SEARCH_MODE", "live").lower()
+CATALOG_AVAILABILITY_TIMEOUT = float(os.getenv("CATALOG_AVAILABILITY_TIMEOUT", "2"))
+
+# Catalog export used by the mirror sync. Yordam has no documented bulk export,
+# so the sync pages through a match-all search; adjust these if the installation differs.
+CATALOG_MIRROR_INTERVAL = int(os.getenv("CATALOG_MIRROR_INTERVAL", "86400"))
+CATALOG_EXPORT_QUERY = os.getenv("CATALOG_EXPORT_QUERY", "*")
+CATALOG_EXPORT_PAGE_SIZE = int(os.getenv("CATALOG_EXPORT_PAGE_SIZE", "500"))
+CATALOG_EXPORT_OFFSET_PARAM = os.getenv("CATALOG_EXPORT_OFFSET_PARAM", "start")
+
+# Yordam (Solr) document field -> result field. Only title and year are confirmed
+# against live responses; override with CATALOG_FIELD_MAP='{"author": "..."}'.
+CATALOG_FIELD_MAP = {
+    "record_id": "id",
+    "title": "kunyeEserAdiYazarlar_txt",
+    "author": "qYazar_str",
+    "year": "qYayinTarihi_str",
+    "call_number": "qYerNumarasi_str",
+    "availability": "qDurum_str",
+}
+CATALOG_FIELD_MAP.update(json.loads(os.getenv("CATALOG_FIELD_MAP", "{}")))
+
+# Fails fast while Yordam is down; per-call timeouts follow its observed p99
+catalog_breaker = get_breaker("catalog", timeout=10)
+
+def _request_params(query: str, token: str, limit: int = 10, offset: Optional[int] = None) -> Dict:
+    params = {
+        "token": token,
+        "islem": "arama",
+        "q": query,
+        "limit": limit,
+        "format": "json"
+    }
+    if offset is not None:
+        params[CATALOG_EXPORT_OFFSET_PARAM] = offset
+    return params
+
+REQUEST_HEADERS = {
+    'Accept': 'application/json',
+    'User-Agent': 'BatmanLibrary/1.0',
+    'Cache-Control': 'no-cache'
+}
+
+def _log_request(query: str, token: str):
+    logger.debug("🔍 YORDAM API sorgu: endpoint=%s arama=%r token=%.10s...", API_URL, query, token)
+
+def _is_auth_failure(response) -> bool:
+    """
+    True if Yordam refused the token: 401/403, an empty 200 body (what the
+    webservice returns for an invalid token, among other causes) or an error
+    message about the token.
+    """
+    if response.status_code in (401, 403):
+        return True
+    if response.status_code != 200:
+        return False
+    if not response.text.strip():
+        return True
+    try:
+        data = response.json()
+    except ValueError:
+        return False
+    return (isinstance(data, dict) and data.get("status") == "error"
+            and "token" in str(data.get("message", "")).lower())
+
+def _parse_response(response) -> List[CatalogItem]:
+    """
+    Turns a YORDAM HTTP response into result items.
+    Works with both `requests` and `httpx` responses.
+    """
+    return _parse_page(response)[0]
+
+def _parse_page(response) -> Tuple[List[CatalogItem], Optional[int]]:
+    """_parse_response plus the total hit count (Solr numFound) when Yordam reports it."""
+    logger.debug(
+        "📥 YORDAM API yanıtı: durum=%s tip=%s uzunluk=%d bayt",
+        response.status_code, response.headers.get('content-type'), len(response.content)
+    )
+
+    # Check response status
+    if response.status_code != 200:
+        logger.error("❌ YORDAM API hatası: durum=%s yanıt=%.500s", response.status_code, response.text)
+        return [], None
+
+    # Check if response is empty
+    if not response.text.strip():
+        logger.error(
+            "⚠️ YORDAM API sunucudan boş yanıt döndü "
+            "(token geçersiz, sorgu formatı hatalı veya sunucu yanıt vermiyor olabilir)"
+        )
+        return [], None
+
+    # Try to parse JSON
+    try:
+        data = response.json()
+    except ValueError as e:
+        logger.error("❌ JSON parse hatası: %s, ham yanıt: %.200s", e, response.text)
+        return [], None
+
+    # %.1000s keeps a sampled debug line bounded; nothing is formatted when DEBUG is off
+    logger.debug("Parsed JSON response: %.1000s", data)
+
+    if isinstance(data, list):
+        logger.debug("✅ %d sonuç bulundu", len(data))
+        return [catalog_item(item) for item in data], None
+    elif isinstance(data, dict):
+        if data.get("status") == "error":
+            logger.error("API hata döndü: %s", data.get('message', 'Bilinmeyen hata'))
+            return [], None
+        elif "response" in data and "docs" in data["response"]:
+            raw_results = data["response"]["docs"]
+            results = [catalog_item(_doc_to_record(item)) for item in raw_results]
+
+            logger.debug("✅ %d düzenlenmiş sonuç döndü", len(results))
+            total = data["response"].get("numFound")
+            return results, int(total) if total is not None else None
+        else:
+            logger.error("⚠️ Beklenmeyen yanıt yapısı: %.500s", data)
+            return [], None
+
+    else:
+        logger.error("Beklenmeyen yanıt tipi: %s", type(data))
+        return [], None
+
+def _field(item: Dict, name: str) -> str:
+    value = item.get(CATALOG_FIELD_MAP[name])
+    if isinstance(value, list):
+        value = "; ".join(str(v) for v in value)
+    return str(value) if value not in (None, "") else ""
+
+def _doc_to_record(item: Dict) -> Dict:
+    """Maps a Yordam search document to the result format shared with the mirror."""
+    return {
+        "record_id": _field(item, "record_id"),
+        "title": _field(item, "title") or "Başlık bulunamadı",
+        "author": _field(item, "author") or "Bilinmiyor",  # YORDAM genelde bu alanı dönmez
+        "year": _field(item, "year") or "Yıl yok",
+        "call_number": _field(item, "call_number"),
+        "availability": _field(item, "availability")
+    }
+
+def _mirror_search(query: str, limit: int = 10) -> Optional[List[CatalogItem]]:
+    """Mirror results, or None when the mirror should not answer (live mode, empty mirror, error)."""
+    if LIBRARY_SEARCH_MODE not in ("mirror", "hybrid"):
+        return None
+    try:
+        mirror = get_mirror()
+        if not mirror.get_state("last_sync"):
+            logger.warning("Katalog aynası henüz senkronize edilmedi, canlı sorgu yapılıyor")
+            return None
+        return [catalog_item(record) for record in mirror.search(query, limit=limit)]
+    except Exception as e:
+        logger.error("Catalog mirror search failed: %s", e)
+        return None
+
+async def _mirror_search_async(query: str, limit: int = 10) -> Optional[List[CatalogItem]]:
+    """_mirror_search in the default executor, since the SQLite FTS query blocks."""
+    if LIBRARY_SEARCH_MODE not in ("mirror", "hybrid"):
+        return None
+    # Copy the context so log lines from the worker keep the request ID
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(None, context.run, _mirror_search, query, limit)
+
+def _merge_availability(records: List[CatalogItem], live: List[CatalogItem]) -> List[CatalogItem]:
+    """Overlays live availability onto mirror records with the same record id."""
+    current = {item.identifier: item.availability for item in live if item.identifier}
+    for record in records:
+        if current.get(record.identifier):
+            record.availability = current[record.identifier]
+    return records
+
+def query_library(query: str, token: str) -> List[CatalogItem]:
     """
     Queries the YORDAM library system for resources.
+    Results are cached per normalized query (see catalog_cache).
 
     Args:
         query (str): Search query
         token (str): Authentication token
 
     Returns:
-        List[Dict]: List of resources found
+        List[CatalogItem]: List of resources found
     """
     if not query or not token:
         logger.error("Query veya token boş olamaz")
         return []
 
-    # Log request details
-    logger.info(f"""
-    🔍 YORDAM API Sorgu:
-    - Endpoint: {API_URL}
-    - Arama: {query}
-    - Token: {token[:10]}...
-    """)
+    local = _mirror_search(query)
+    if local is not None:
+        if LIBRARY_SEARCH_MODE == "hybrid" and local:
+            try:
+                live = catalog_cache.get_or_load_sync(
+                    normalize_query(query),
+                    lambda: _fetch_library(query, token, timeout=CATALOG_AVAILABILITY_TIMEOUT)
+                )
+                _merge_availability(local, live)
+            except Exception as e:
+                logger.warning("Canlı erişilebilirlik alınamadı, ayna verisi kullanılıyor: %s", e)
+        return local
 
-    # Prepare request
-    params = {
-        "token": token,
-        "islem": "arama",
-        "q": query,
-        "limit": 10,
-        "format": "json"
-    }
-
-    headers = {
-        'Accept': 'application/json',
-        'User-Agent': 'BatmanLibrary/1.0',
-        'Cache-Control': 'no-cache'
-    }
+    return catalog_cache.get_or_load_sync(
+        normalize_query(query),
+        lambda: _fetch_library(query, token)
+    )
 
-    try:
-        # Make request with detailed logging
+def _get_library(query: str, token: str, timeout: float):
+    _log_request(query, token)
+    with catalog_breaker.attempt() as call_timeout:
         response = requests.get(
             API_URL,
-            params=params,
-            headers=headers,
-            timeout=10
+            params=_request_params(query, token),
+            headers=REQUEST_HEADERS,
+            timeout=min(timeout, call_timeout)
         )
+        if response.status_code >= 500:
+            response.raise_for_status()
+    return response
 
-        # Log response details
-        logger.info(f"""
-        📥 YORDAM API Yanıtı:
-        - Durum Kodu: {response.status_code}
-        - İçerik Tipi: {response.headers.get('content-type')}
-        - Yanıt Uzunluğu: {len(response.text) if response.text else 0} bytes
-        """)
-
-        # Check response status
-        if response.status_code != 200:
-            logger.error(f"""
-            ❌ YORDAM API Hatası:
-            - Durum Kodu: {response.status_code}
-            - Yanıt: {response.text}
-            """)
-            return []
-
-        # Check if response is empty
-        if not response.text.strip():
-            logger.error("""
-            ⚠️ YORDAM API Hatası:
-            Sunucudan boş yanıt döndü. Bu durum genellikle şu sebeplerden kaynaklanır:
-            1. Token geçersiz olabilir
-            2. Sorgu formatı hatalı olabilir
-            3. Sunucu yanıt vermiyor olabilir
-            """)
-            return []
-
-        # Try to parse JSON
-        try:
-            data = response.json()
-            logger.debug(f"Parsed JSON response: {data}")
-
-            if isinstance(data, list):
-                logger.info(f"✅ {len(data)} sonuç bulundu")
-                return data
-            elif isinstance(data, dict):
-                if data.get("status") == "error":
-                    logger.error(f"API hata döndü: {data.get('message', 'Bilinmeyen hata')}")
-                    return []
-                elif "response" in data and "docs" in data["response"]:
-                    raw_results = data["response"]["docs"]
-                    results = []
-
-                    for item in raw_results:
-                        results.append({
-                            "title": item.get("kunyeEserAdiYazarlar_txt", "Başlık bulunamadı"),
-                            "author": "Bilinmiyor",  # YORDAM genelde bu alanı dönmez
-                            "year": item.get("qYayinTarihi_str", "Yıl yok")
-                        })
-
-                    logger.info(f"✅ {len(results)} düzenlenmiş sonuç döndü")
-                    return results
-                else:
-                    logger.error(f"⚠️ Beklenmeyen yanıt yapısı: {data}")
-                    return []
-
-            else:
-                logger.error(f"Beklenmeyen yanıt tipi: {type(data)}")
-                return []
-
-        except ValueError as e:
-            logger.error(f"""
-            ❌ JSON parse hatası: {e}
-            Ham yanıt: {response.text[:200]}
-            """)
-            return []
+def _fetch_library(query: str, token: str, timeout: float = 10) -> List[CatalogItem]:
+    try:
+        response = _get_library(query, token, timeout)
+        if _is_auth_failure(response):
+            # Retried once with a new token; concurrent failures share one login
+            fresh = renew_yordam_token(rejected=token)
+            if fresh:
+                logger.warning("🔑 YORDAM token reddedildi, yeni token ile tekrar deneniyor")
+                response = _get_library(query, fresh, timeout)
+        return _parse_response(response)
 
+    except CircuitOpenError as e:
+        logger.warning("⛔ %s", e)
+        return []
     except requests.exceptions.Timeout:
         logger.error("⏰ Sorgu zaman aşımına uğradı")
         return []
     except requests.exceptions.RequestException as e:
-        logger.error(f"❌ Sorgu başarısız: {e}")
+        logger.error("❌ Sorgu başarısız: %s", e)
         return []
     except Exception as e:
-        logger.error(f"❌ Beklenmeyen hata: {e}")
+        logger.error("❌ Beklenmeyen hata: %s", e)
+        return []
+
+async def query_library_async(query: str, token: str) -> List[CatalogItem]:
+    """
+    Async version of query_library on the shared pooled HTTP client.
+
+    Args:
+        query (str): Search query
+        token (str): Authentication token
+
+    Returns:
+        List[CatalogItem]: List of resources found
+    """
+    if not query or not token:
+        logger.error("Query veya token boş olamaz")
         return []
 
+    local = await _mirror_search_async(query)
+    if local is not None:
+        if LIBRARY_SEARCH_MODE == "hybrid" and local:
+            try:
+                live = await asyncio.wait_for(
+                    catalog_cache.get_or_load(normalize_query(query), lambda: _fetch_library_async(query, token)),
+                    CATALOG_AVAILABILITY_TIMEOUT
+                )
+                _merge_availability(local, live)
+            except asyncio.TimeoutError:
+                logger.warning("Canlı erişilebilirlik zaman aşımına uğradı, ayna verisi kullanılıyor")
+        return local
+
+    return await catalog_cache.get_or_load(
+        normalize_query(query),
+        lambda: _fetch_library_async(query, token)
+    )
+
+async def query_library_many_async(queries: List[str], token: str, concurrency: int = 8,
+                                   timeout: Optional[float] = None) -> List[List[CatalogItem]]:
+    """
+    query_library_async for a batch of queries sharing one token.
+
+    Queries that normalize to the same cache key are looked up once, and at
+    most `concurrency` lookups run at a time on the pooled client, so a large
+    batch does not flood Yordam or trip its circuit breaker.
+
+    Args:
+        queries (List[str]): Search queries
+        token (str): Authentication token
+        concurrency (int): Maximum lookups in flight
+        timeout (Optional[float]): Deadline per lookup; a lookup that misses it returns no records
+
+    Returns:
+        List[List[CatalogItem]]: Records per query, in the same order
+    """
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+    groups: Dict[str, str] = {}
+    for query in queries:
+        groups.setdefault(normalize_query(query), query)
+
+    async def lookup(query: str) -> List[CatalogItem]:
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(query_library_async(query, token), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Katalog sorgusu zaman aşımına uğradı: %s", query)
+            except Exception as e:
+                logger.error("Catalog lookup failed for %r: %s", query, e)
+            return []
+
+    found = dict(zip(groups, await asyncio.gather(*(lookup(query) for query in groups.values()))))
+    return [found[normalize_query(query)] for query in queries]
+
+async def _get_library_async(query: str, token: str, limit: int = 10, offset: Optional[int] = None):
+    _log_request(query, token)
+    with catalog_breaker.attempt() as call_timeout:
+        response = await get_async_client().get(
+            API_URL,
+            params=_request_params(query, token, limit=limit, offset=offset),
+            headers=REQUEST_HEADERS,
+            timeout=call_timeout
+        )
+        if response.status_code >= 500:
+            response.raise_for_status()
+    return response
+
+async def _fetch_library_async(query: str, token: str) -> List[CatalogItem]:
+    return (await _fetch_library_page_async(query, token))[0]
+
+async def _fetch_library_page_async(query: str, token: str, limit: int = 10,
+                                    offset: Optional[int] = None) -> Tuple[List[CatalogItem], Optional[int]]:
+    try:
+        response = await _get_library_async(query, token, limit, offset)
+        if _is_auth_failure(response):
+            fresh = await renew_yordam_token_async(rejected=token)
+            if fresh:
+                logger.warning("🔑 YORDAM token reddedildi, yeni token ile tekrar deneniyor")
+                response = await _get_library_async(query, fresh, limit, offset)
+        return _parse_page(response)
+
+    except CircuitOpenError as e:
+        logger.warning("⛔ %s", e)
+        return [], None
+    except httpx.TimeoutException:
+        logger.error("⏰ Sorgu zaman aşımına uğradı")
+        return [], None
+    except httpx.HTTPError as e:
+        logger.error("❌ Sorgu başarısız: %s", e)
+        return [], None
+    except Exception as e:
+        logger.error("❌ Beklenmeyen hata: %s", e)
+        return [], None
+
+async def search_catalog_page_async(query: str, token: str, offset: int,
+                                    limit: int) -> Tuple[List[CatalogItem], Optional[int]]:
+    """
+    One page of catalog results for cursor pagination.
+
+    In mirror and hybrid mode the page comes from the local mirror, otherwise
+    from Yordam with the offset parameter used by the mirror export. Pages are
+    not cached here; the caller keeps them in its cursor state.
+
+    Args:
+        query (str): Search query
+        token (str): Authentication token
+        offset (int): Index of the first result
+        limit (int): Maximum number of results
+
+    Returns:
+        Tuple[List[CatalogItem], Optional[int]]: Results and the total hit count, if known
+    """
+    if not query or not token:
+        return [], 0
+    records = await _mirror_search_async(query, limit=offset + limit)
+    if records is not None:
+        return records[offset:], len(records) if len(records) < offset + limit else None
+    return await _fetch_library_page_async(query, token, limit=limit, offset=offset)
+
+class CatalogMirrorSync:
+    """
+    Copies the Yordam catalog into the local mirror.
+
+    Each pass pages through CATALOG_EXPORT_QUERY, CATALOG_EXPORT_PAGE_SIZE
+    records at a time, and saves the next offset after every page so an
+    interrupted pass continues where it stopped. When a pass completes,
+    records it did not see are pruned and `last_sync` is recorded.
+    With several workers only the leader syncs; all of them read the same
+    mirror file.
+    """
+
+    def __init__(self, mirror: Optional[CatalogMirror] = None, interval: int = CATALOG_MIRROR_INTERVAL,
+                 leader: Optional[LeaderLease] = None):
+        self.mirror = mirror or get_mirror()
+        self.interval = interval
+        self.leader = leader or get_leader()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _fetch_page(self, token: str, offset: int) -> Optional[Dict]:
+        def get(token: str):
+            return requests.get(
+                API_URL,
+                params=_request_params(CATALOG_EXPORT_QUERY, token, limit=CATALOG_EXPORT_PAGE_SIZE, offset=offset),
+                headers=REQUEST_HEADERS,
+                timeout=60
+            )
+
+        response = get(token)
+        if _is_auth_failure(response):
+            token = renew_yordam_token(rejected=token)
+            if not token:
+                logger.error("YORDAM token reddedildi ve yenilenemedi, katalog senkronizasyonu durdu")
+                return None
+            response = get(token)
+        response.raise_for_status()
+        data = response.json()
+        if not isinstance(data, dict) or "docs" not in data.get("response", {}):
+            logger.error("⚠️ Beklenmeyen katalog dışa aktarma yanıtı: %.200s", data)
+            return None
+        return data["response"]
+
+    def sync(self) -> int:
+        """
+        Runs one export pass.
+
+        Returns:
+            int: Number of records written
+        """
+        token = get_yordam_token()
+        if not token or not validate_token(token):
+            logger.error("YORDAM token alınamadı, katalog senkronizasyonu atlandı")
+            return 0
+
+        started = self.mirror.get_state("pass_started")
+        offset = int(self.mirror.get_state("export_offset") or 0)
+        if started and offset:
+            logger.info("Resuming catalog export at offset %d", offset)
+        else:
+            started = datetime.now().isoformat(timespec="seconds")
+            offset = 0
+            self.mirror.set_state("pass_started", started)
+
+        written = 0
+        while not self._stop.is_set():
+            # A pass can outlive a token, so take the current one for every page
+            token = get_yordam_token()
+            if not token:
+                return written
+            page = self._fetch_page(token, offset)
+            if page is None:
+                return written
+            docs = page["docs"]
+            records = [_doc_to_record(doc) for doc in docs]
+            for record in records:
+                record["synced_at"] = started
+            written += self.mirror.upsert_records(records)
+            offset += len(docs)
+            self.mirror.set_state("export_offset", str(offset))
+            if not docs or len(docs) < CATALOG_EXPORT_PAGE_SIZE or offset >= int(page.get("numFound", offset)):
+                break
+
+        if not self._stop.is_set():
+            pruned = self.mirror.prune(started)
+            self.mirror.set_state("export_offset", None)
+            self.mirror.set_state("pass_started", None)
+            self.mirror.set_state("last_sync", started)
+            logger.info("Catalog mirror synced: %d records written, %d pruned, %d in mirror",
+                        written, pruned, self.mirror.count())
+        return written
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self.leader.is_leader:
+                self._stop.wait(SHARED_STATE_POLL_INTERVAL)
+                continue
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error("Catalog mirror sync failed: %s", e)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Starts periodic syncing in a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="catalog-mirror-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
 def get_mock_data() -> List[Dict]:
     """
     Returns mock data when the library API is unavailable.
@@ -0,0 +1,132 @@
+from typing import Dict, Optional
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Per-logger overrides, e.g. "integrations.web_scraper=DEBUG,httpx=WARNING"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "httpx=WARNING")
+# "text" or "json" (one JSON object per line)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+# Share of DEBUG records that are kept; the rest are dropped before any formatting
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+# Hand records to a background thread instead of writing to stderr on the calling thread
+LOG_ASYNC = os.getenv("LOG_ASYNC", "true").lower() == "true"
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+# Correlates every log line written while handling one HTTP request
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+_configured = False
+_listener: Optional[QueueListener] = None
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps records with the current request ID; runs on the thread that logs."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """Keeps only `rate` of DEBUG records so verbose modules can stay on in production."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or self.rate >= 1.0 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, for log shippers."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler merges msg % args on the calling thread; here the record
+    is queued as is, so a request pays only for the enqueue. Arguments must not
+    be mutated after logging, which holds for the values logged in this app.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.strip().partition("=")
+        if name and level:
+            levels[name.strip()] = logging.getLevelName(level.strip().upper())
+    return levels
+
+
+def configure_logging():
+    """
+    Installs the root handler once per process.
+
+    Records pass the request ID and DEBUG sampling filters on the calling
+    thread, then go through a queue to a listener thread that formats and
+    writes them. Existing root handlers (e.g. from basicConfig) are replaced.
+    """
+    global _configured, _listener
+    if _configured:
+        return
+    _configured = True
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+
+    if LOG_ASYNC:
+        handler: logging.Handler = DeferredQueueHandler(queue.SimpleQueue())
+        _listener = QueueListener(handler.queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+    else:
+        handler = stream_handler
+    # Sampling first, so dropped records cost nothing more
+    handler.addFilter(DebugSampler(LOG_DEBUG_SAMPLE_RATE))
+    handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    for name, level in parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+
+def stop_logging():
+    """Flushes queued records; call on shutdown."""
+    global _configured, _listener
+    _configured = False
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
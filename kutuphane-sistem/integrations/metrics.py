@@ -0,0 +1,245 @@
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from bisect import bisect_left
+from contextlib import contextmanager
+import threading
+import time
+
+# Latency buckets in seconds; the top ones cover LLM answers and upstream timeouts
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Starlette appends "; charset=utf-8" to text/* media types
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+LabelValues = Tuple[str, ...]
+
+# Every metric registers itself here; render() walks it in registration order
+_registry: List["Metric"] = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """
+    Base class for a metric family in the Prometheus text format.
+    Children are created per label-value combination with labels().
+    """
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str, **kwargs: str):
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(value) for value in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = float(value)
+
+    @contextmanager
+    def track_inprogress(self) -> Iterator[None]:
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+
+class Counter(Metric):
+    """Monotonically increasing count, e.g. answered queries per source. Name it with a _total suffix."""
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def _samples(self) -> Iterator[str]:
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class Gauge(Metric):
+    """Value that goes up and down, e.g. requests in flight."""
+
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def _samples(self) -> Iterator[str]:
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # One count per bucket plus +Inf; cumulated only when rendering
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """
+        Observes the duration of the block, including blocks that raise.
+        Cancelled blocks (e.g. a fan-out stage that lost the race) are not
+        observed, since their duration says nothing about the stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.observe(time.perf_counter() - start)
+            raise
+        self.observe(time.perf_counter() - start)
+
+
+class Histogram(Metric):
+    """Distribution of observed values in fixed buckets, e.g. latencies in seconds."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _samples(self) -> Iterator[str]:
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, values)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, values)} {cumulative}"
+
+
+class CallbackMetric(Metric):
+    """
+    Metric whose samples are read from elsewhere at scrape time, e.g. the
+    counters kept by the caches. `collect` returns {label values: value}.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 collect: Callable[[], Dict[LabelValues, float]], type_name: str = "gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+        self.type_name = type_name
+
+    def _samples(self) -> Iterator[str]:
+        for values, value in self.collect().items():
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}"
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_registry)
+    return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+# Metrics shared across the query pipeline
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency until the response starts",
+    ("method", "path", "status")
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being handled", ("path",))
+QUERY_LATENCY = Histogram(
+    "query_duration_seconds", "End-to-end query latency including streamed answers", ("endpoint",)
+)
+STAGE_LATENCY = Histogram(
+    "query_stage_duration_seconds", "Latency of each query pipeline stage", ("stage",)
+)
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds", "Upstream HTTP call latency per backend", ("backend", "outcome")
+)
+ANSWERS = Counter("query_answers_total", "Queries answered, by the stage that produced the answer", ("source",))
+SCRAPER_PARSES = Counter("scraper_page_parses_total", "Website pages parsed, by page and parser", ("page", "parser"))
+LLM_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds", "Time until the first streamed ChatGPT token"
+)
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_LATENCY.labels(stage=stage).observe(seconds)
+
+
+def count_answer(source: Optional[str]):
+    if source:
+        ANSWERS.labels(source=source).inc()
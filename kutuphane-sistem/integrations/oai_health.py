@@ -0,0 +1,253 @@
+from typing import Dict, List, Optional
+from sickle import Sickle
+from datetime import datetime
+import io
+import os
+import threading
+from dotenv import load_dotenv
+import requests
+import logging
+from .shared_state import LeaderLease, SHARED_STATE_POLL_INTERVAL, get_leader
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Get OAI-PMH endpoint from environment variables
+OAI_ENDPOINT = os.getenv("OAI_PMH_ENDPOINT", "https://earsiv.batman.edu.tr/server/oai/request")
+
+# Seconds between endpoint capability checks
+OAI_HEALTH_INTERVAL = int(os.getenv("OAI_HEALTH_INTERVAL", "900"))
+
+ENDPOINT_VARIANTS = [
+    OAI_ENDPOINT,
+    OAI_ENDPOINT.rstrip('/'),
+    OAI_ENDPOINT.rstrip('/') + '/request',
+    "https://earsiv.batman.edu.tr/oai/request",
+    "https://earsiv.batman.edu.tr/oai"
+]
+
+def test_oai_endpoint(endpoint: str = OAI_ENDPOINT) -> Dict:
+    """
+    Tests the OAI-PMH endpoint with various verbs and returns diagnostic information.
+    """
+    diagnostic_info = {
+        "endpoint": endpoint,
+        "identify": None,
+        "list_metadata_formats": None,
+        "list_identifiers": None,
+        "error": None
+    }
+
+    try:
+        # Test Identify
+        params = {'verb': 'Identify'}
+        response = requests.get(endpoint, params=params, timeout=10)
+        diagnostic_info["identify"] = {
+            "status": response.status_code,
+            "content_type": response.headers.get('content-type'),
+            "content": response.text[:200] if response.text else None
+        }
+
+        # Test ListMetadataFormats
+        params = {'verb': 'ListMetadataFormats'}
+        response = requests.get(endpoint, params=params, timeout=10)
+        diagnostic_info["list_metadata_formats"] = {
+            "status": response.status_code,
+            "content_type": response.headers.get('content-type'),
+            "content": response.text[:200] if response.text else None,
+            "formats": []  # Will be populated if successful
+        }
+
+        # If ListMetadataFormats was successful, parse the formats
+        if response.status_code == 200:
+            try:
+                # Imported here: oai_pmh imports this module
+                from .oai_pmh import parse_metadata_formats
+                diagnostic_info["list_metadata_formats"]["formats"] = parse_metadata_formats(
+                    io.BytesIO(response.content)
+                )
+            except Exception as e:
+                logger.error("Error parsing metadata formats: %s", e)
+
+        # Test ListIdentifiers
+        params = {'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc'}
+        response = requests.get(endpoint, params=params, timeout=10)
+        diagnostic_info["list_identifiers"] = {
+            "status": response.status_code,
+            "content_type": response.headers.get('content-type'),
+            "content": response.text[:200] if response.text else None
+        }
+
+    except Exception as e:
+        diagnostic_info["error"] = str(e)
+        logger.error("OAI-PMH endpoint test hatası: %s", e)
+
+    return diagnostic_info
+
+class OAIEndpointMonitor:
+    """
+    Discovers the working OAI-PMH endpoint and its capabilities off the hot path.
+
+    The first check runs at startup and is repeated every OAI_HEALTH_INTERVAL
+    seconds in a daemon thread. The harvester takes the working endpoint from
+    get_endpoint instead of probing endpoint variants itself, and the cached
+    result is exposed through the diagnostics route. With several workers only the
+    leader probes and publishes the result in the shared state.
+    """
+
+    STATE_KEY = "oai_health:status"
+
+    def __init__(self, endpoints: Optional[List[str]] = None, interval: int = OAI_HEALTH_INTERVAL,
+                 leader: Optional[LeaderLease] = None):
+        self.endpoints = list(dict.fromkeys(endpoints or ENDPOINT_VARIANTS))
+        self.interval = interval
+        self.leader = leader or get_leader()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        # Set once the monitor thread has finished its first check
+        self._checked = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._status: Dict = {
+            "endpoint": None,
+            "repository_name": None,
+            "metadata_formats": [],
+            "sets": [],
+            "diagnostics": None,
+            "last_checked": None,
+            "error": None
+        }
+
+    def _make_client(self, endpoint: str) -> Sickle:
+        return Sickle(
+            endpoint,
+            headers={'Accept': 'application/xml'},
+            protocol_version="2.0",
+            timeout=30
+        )
+
+    def refresh(self) -> Dict:
+        """
+        Probes the endpoint variants and caches the first working one together
+        with its metadata formats and sets.
+
+        Returns:
+            Dict: The refreshed status
+        """
+        status = {
+            "endpoint": None,
+            "repository_name": None,
+            "metadata_formats": [],
+            "sets": [],
+            "diagnostics": None,
+            "last_checked": datetime.now().isoformat(timespec="seconds"),
+            "error": None
+        }
+
+        for endpoint in self.endpoints:
+            try:
+                logger.info("Trying endpoint: %s", endpoint)
+                sickle = self._make_client(endpoint)
+                identify = sickle.Identify()
+                status["endpoint"] = endpoint
+                status["repository_name"] = getattr(identify, "repositoryName", None)
+                logger.info("Successfully connected to: %s", endpoint)
+                break
+            except Exception as e:
+                logger.error("Failed with endpoint %s: %s", endpoint, e)
+
+        if status["endpoint"]:
+            try:
+                status["metadata_formats"] = [f.metadataPrefix for f in sickle.ListMetadataFormats()]
+            except Exception as e:
+                logger.error("Error listing metadata formats: %s", e)
+            try:
+                status["sets"] = [s.setSpec for s in sickle.ListSets()]
+            except Exception as e:
+                # Sets are optional in OAI-PMH (noSetHierarchy)
+                logger.info("Sets not available: %s", e)
+        else:
+            status["error"] = "Could not connect to any OAI-PMH endpoint"
+            status["diagnostics"] = test_oai_endpoint(self.endpoints[0])
+            logger.error("""
+            ⚠️ OAI-PMH HATASI:
+            DSpace OAI endpoint'e erişilemiyor. Bu durum genellikle şu sebeplerden kaynaklanır:
+            1. Endpoint yanlış olabilir
+            2. Sunucu yanıt vermiyor olabilir
+            3. OAI-PMH servisi kapalı olabilir
+
+            Denenen endpoint'ler: %s
+            """, self.endpoints)
+
+        with self._lock:
+            self._status = status
+        return status
+
+    def status(self) -> Dict:
+        """Returns the last cached capability check."""
+        with self._lock:
+            return dict(self._status)
+
+    def get_endpoint(self) -> Optional[str]:
+        """
+        Returns the cached working endpoint. While the monitor thread's first
+        check is running this waits for its result instead of probing every
+        endpoint a second time; otherwise it probes once if none is known.
+        """
+        endpoint = self.status()["endpoint"]
+        if endpoint:
+            return endpoint
+        if self._thread is not None and self._thread.is_alive() and not self._checked.is_set():
+            self._checked.wait()
+            return self.status()["endpoint"]
+        return self.refresh()["endpoint"]
+
+    def _run(self):
+        state = self.leader.state
+        while not self._stop.is_set():
+            leader = self.leader.is_leader
+            try:
+                if leader:
+                    status = self.refresh()
+                    if state.shared:
+                        state.set(self.STATE_KEY, status)
+                else:
+                    status = state.get(self.STATE_KEY)
+                    if status:
+                        with self._lock:
+                            self._status = status
+            except Exception as e:
+                logger.error("OAI-PMH health check failed: %s", e)
+            self._checked.set()
+            self._stop.wait(self.interval if leader else min(self.interval, SHARED_STATE_POLL_INTERVAL))
+
+    def start(self):
+        """Starts periodic capability checks in a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._checked.clear()
+        self._thread = threading.Thread(target=self._run, name="oai-health", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        # Nobody is left to answer a waiting get_endpoint
+        self._checked.set()
+
+
+_monitor: Optional[OAIEndpointMonitor] = None
+_monitor_lock = threading.Lock()
+
+
+def get_monitor() -> OAIEndpointMonitor:
+    """Returns the process wide endpoint monitor."""
+    global _monitor
+    if _monitor is None:
+        with _monitor_lock:
+            if _monitor is None:
+                _monitor = OAIEndpointMonitor()
+    return _monitor
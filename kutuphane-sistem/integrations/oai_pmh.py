@@ -1,206 +1,414 @@
-from typing import List, Dict
-from sickle import Sickle
-from sickle.iterator import OAIResponseIterator
+from typing import Callable, Dict, IO, Iterator, List, NamedTuple, Optional, Tuple
+import itertools
 import os
-from dotenv import load_dotenv
+import threading
 import requests
+from dotenv import load_dotenv
 import logging
+from .oai_store import OAIHarvestStore, RECORD_FIELDS, get_store
+from .oai_health import OAIEndpointMonitor, get_monitor
+from .resilience import CircuitOpenError, get_breaker
+from .results import AcademicItem, academic_item
+from .shared_state import LeaderLease, SHARED_STATE_POLL_INTERVAL, get_leader
+
+try:
+    from lxml.etree import iterparse as _iterparse
+    # Repository responses are untrusted: no entity expansion, no network lookups
+    _PARSER_OPTIONS = {"resolve_entities": False, "no_network": True}
+except ImportError:
+    from xml.etree.ElementTree import iterparse as _iterparse
+    _PARSER_OPTIONS = {}
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
-# Get OAI-PMH endpoint from environment variables
-OAI_ENDPOINT = os.getenv("OAI_PMH_ENDPOINT", "https://earsiv.batman.edu.tr/server/oai/request")
+# Seconds between incremental harvests
+OAI_HARVEST_INTERVAL = int(os.getenv("OAI_HARVEST_INTERVAL", "3600"))
+OAI_REQUEST_TIMEOUT = float(os.getenv("OAI_REQUEST_TIMEOUT", "30"))
+
+# User queries read the local store; only the harvester talks to the repository
+oai_breaker = get_breaker("oai", timeout=30)
+
+OAI_NS = "{http://www.openarchives.org/OAI/2.0/}"
+DC_NS = "{http://purl.org/dc/elements/1.1/}"
+RECORD_TAG = OAI_NS + "record"
+TOKEN_TAG = OAI_NS + "resumptionToken"
+ERROR_TAG = OAI_NS + "error"
+FORMAT_PREFIX_TAG = OAI_NS + "metadataPrefix"
+
+
+class OAIError(Exception):
+    """An OAI-PMH error response (e.g. noRecordsMatch, badResumptionToken)."""
+
+    def __init__(self, code: str, message: str = ""):
+        super().__init__(f"{code}: {message}" if message else code)
+        self.code = code
+        self.message = message
+
+
+class OAIRecord(NamedTuple):
+    """One harvested record, flattened to the harvest store's fields."""
+    identifier: str
+    datestamp: str
+    deleted: bool
+    title: str = ""
+    creator: str = ""
+    subject: str = ""
+    description: str = ""
+    date: str = ""
+    link: str = ""
+
+    def as_row(self) -> Dict[str, str]:
+        return {field: getattr(self, field) for field in RECORD_FIELDS}
 
-def test_oai_endpoint() -> Dict:
+
+def _stream(source: IO[bytes], tags: Tuple[str, ...]) -> Iterator:
     """
-    Tests the OAI-PMH endpoint with various verbs and returns diagnostic information.
+    Parses `source` incrementally and yields each element whose tag is in
+    `tags` once it is complete. After the consumer is done with it, the
+    element is cleared and detached from its parent, so the tree never holds
+    more than the element being read.
     """
-    diagnostic_info = {
-        "endpoint": OAI_ENDPOINT,
-        "identify": None,
-        "list_metadata_formats": None,
-        "list_identifiers": None,
-        "error": None
-    }
+    path = []
+    for event, elem in _iterparse(source, events=("start", "end"), **_PARSER_OPTIONS):
+        if event == "start":
+            path.append(elem)
+            continue
+        path.pop()
+        if elem.tag in tags:
+            yield elem
+            elem.clear()
+            if path:
+                path[-1].remove(elem)
 
-    try:
-        # Test Identify
-        params = {'verb': 'Identify'}
-        response = requests.get(OAI_ENDPOINT, params=params, timeout=10)
-        diagnostic_info["identify"] = {
-            "status": response.status_code,
-            "content_type": response.headers.get('content-type'),
-            "content": response.text[:200] if response.text else None
-        }
 
-        # Test ListMetadataFormats
-        params = {'verb': 'ListMetadataFormats'}
-        response = requests.get(OAI_ENDPOINT, params=params, timeout=10)
-        diagnostic_info["list_metadata_formats"] = {
-            "status": response.status_code,
-            "content_type": response.headers.get('content-type'),
-            "content": response.text[:200] if response.text else None,
-            "formats": []  # Will be populated if successful
-        }
+def _parse_record(elem) -> OAIRecord:
+    header = elem.find(OAI_NS + "header")
+    if header is None:
+        raise ValueError("record without a header")
+    identifier = header.findtext(OAI_NS + "identifier", "").strip()
+    if not identifier:
+        raise ValueError("record without an identifier")
+    datestamp = header.findtext(OAI_NS + "datestamp", "").strip()
+    if header.get("status") == "deleted":
+        return OAIRecord(identifier, datestamp, True)
+
+    fields: Dict[str, List[str]] = {}
+    metadata = elem.find(OAI_NS + "metadata")
+    if metadata is not None:
+        for child in metadata.iter():
+            tag = child.tag
+            # Comments and processing instructions have a non-string tag in lxml
+            if isinstance(tag, str) and tag.startswith(DC_NS) and child.text and child.text.strip():
+                fields.setdefault(tag[len(DC_NS):], []).append(child.text.strip())
+
+    def first(name: str) -> str:
+        return fields.get(name, [""])[0]
+
+    return OAIRecord(
+        identifier, datestamp, False,
+        title=first("title"),
+        creator="; ".join(fields.get("creator", [])),
+        subject="; ".join(fields.get("subject", [])),
+        description=" ".join(fields.get("description", [])),
+        date=first("date"),
+        link=first("identifier")
+    )
+
+
+def parse_list_records(source: IO[bytes]) -> Iterator[OAIRecord]:
+    """
+    Yields the records of one ListRecords response as they are parsed.
+    A malformed record is logged and skipped, so it cannot abort the harvest.
+
+    Returns (as the generator's return value): the resumption token for the
+    next page, or None on the last page.
 
-        # If ListMetadataFormats was successful, parse the formats
-        if response.status_code == 200:
+    Raises:
+        OAIError: The response is an OAI-PMH error
+    """
+    token = None
+    for elem in _stream(source, (RECORD_TAG, TOKEN_TAG, ERROR_TAG)):
+        if elem.tag == RECORD_TAG:
             try:
-                from xml.etree import ElementTree as ET
-                root = ET.fromstring(response.text)
-                formats = root.findall('.//{http://www.openarchives.org/OAI/2.0/}metadataFormat')
-                diagnostic_info["list_metadata_formats"]["formats"] = [
-                    format.find('{http://www.openarchives.org/OAI/2.0/}metadataPrefix').text
-                    for format in formats
-                ]
+                record = _parse_record(elem)
             except Exception as e:
-                logger.error(f"Error parsing metadata formats: {e}")
-
-        # Test ListIdentifiers
-        params = {'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc'}
-        response = requests.get(OAI_ENDPOINT, params=params, timeout=10)
-        diagnostic_info["list_identifiers"] = {
-            "status": response.status_code,
-            "content_type": response.headers.get('content-type'),
-            "content": response.text[:200] if response.text else None
-        }
+                identifier = elem.findtext(f"{OAI_NS}header/{OAI_NS}identifier", "").strip()
+                logger.warning("Skipping malformed OAI-PMH record %s: %r", identifier or "(no identifier)", e)
+                continue
+            yield record
+        elif elem.tag == TOKEN_TAG:
+            token = (elem.text or "").strip() or None
+        else:
+            raise OAIError(elem.get("code", "unknown"), (elem.text or "").strip())
+    return token
 
-    except Exception as e:
-        diagnostic_info["error"] = str(e)
-        logger.error(f"OAI-PMH endpoint test hatası: {e}")
 
-    return diagnostic_info
+def parse_metadata_formats(source: IO[bytes]) -> List[str]:
+    """Metadata prefixes listed in a ListMetadataFormats response."""
+    prefixes = []
+    for elem in _stream(source, (FORMAT_PREFIX_TAG, ERROR_TAG)):
+        if elem.tag == ERROR_TAG:
+            raise OAIError(elem.get("code", "unknown"), (elem.text or "").strip())
+        prefixes.append((elem.text or "").strip())
+    return prefixes
+
+
+class OAIPMHClient:
+    """
+    Streaming OAI-PMH client for harvesting.
+
+    Responses are parsed straight from the socket with iterparse: each record
+    becomes a compact OAIRecord and its elements are dropped before the next
+    one is read, so memory stays flat regardless of page or repository size.
+    list_records follows resumption tokens by itself.
+    """
+
+    def __init__(self, endpoint: str, timeout: float = OAI_REQUEST_TIMEOUT,
+                 session: Optional[requests.Session] = None):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.session.headers.update({"Accept": "application/xml", "User-Agent": "BatmanLibrary/1.0"})
+
+    def _records_page(self, params: Dict[str, str]):
+        with self.session.get(self.endpoint, params=params, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            # Let urllib3 undo any Content-Encoding while iterparse reads the raw stream
+            response.raw.decode_content = True
+            return (yield from parse_list_records(response.raw))
+
+    def list_records(self, metadata_prefix: str = "oai_dc", from_date: Optional[str] = None,
+                     resumption_token: Optional[str] = None,
+                     on_page: Optional[Callable[[Optional[str]], None]] = None) -> Iterator[OAIRecord]:
+        """
+        Yields every record of a ListRecords request, page after page.
+
+        Args:
+            metadata_prefix (str): Metadata format to request
+            from_date (Optional[str]): Only records changed since this datestamp
+            resumption_token (Optional[str]): Continue an earlier request from this token instead
+            on_page (Optional[Callable]): Called once all records of a page are consumed, with the
+                token of the next page (None after the last page); harvesters checkpoint here
+
+        Raises:
+            OAIError: The repository answered with an OAI-PMH error
+        """
+        if resumption_token:
+            params = {"verb": "ListRecords", "resumptionToken": resumption_token}
+        else:
+            params = {"verb": "ListRecords", "metadataPrefix": metadata_prefix}
+            if from_date:
+                params["from"] = from_date
+        while True:
+            token = yield from self._records_page(params)
+            if on_page is not None:
+                on_page(token)
+            if not token:
+                return
+            params = {"verb": "ListRecords", "resumptionToken": token}
+
+class OAIHarvester:
+    """
+    Keeps the local harvest store in sync with the OAI-PMH repository.
+
+    The first run harvests everything; later runs send the highest datestamp
+    seen so far as `from=` and only fetch changed records. The resumption token
+    is saved after every page so an interrupted harvest continues where it
+    stopped instead of starting over.
+
+    With several workers only the leader harvests; the others reload their
+    search index when the leader's writes reach the shared store file.
+    """
+
+    def __init__(self, store: Optional[OAIHarvestStore] = None,
+                 monitor: Optional[OAIEndpointMonitor] = None,
+                 interval: int = OAI_HARVEST_INTERVAL,
+                 leader: Optional[LeaderLease] = None):
+        self.store = store or get_store()
+        self.monitor = monitor or get_monitor()
+        self.interval = interval
+        self.leader = leader or get_leader()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def harvest(self) -> int:
+        """
+        Runs one incremental harvest pass.
 
-def query_oai(keyword: str) -> List[Dict]:
+        Returns:
+            int: Number of records written or deleted
+        """
+        endpoint = self.monitor.get_endpoint()
+        if not endpoint:
+            logger.error("No working OAI-PMH endpoint, skipping harvest")
+            return 0
+
+        changed = 0
+        batch, deleted = [], []
+        # Highest datestamp seen in this pass; only promoted to `from=` once the pass completes
+        newest = self.store.get_state("pending_datestamp") or self.store.get_state("last_datestamp") or ""
+
+        def flush():
+            nonlocal changed, batch, deleted
+            changed += self.store.upsert_records(batch)
+            changed += self.store.delete_records(deleted)
+            batch, deleted = [], []
+            if newest:
+                self.store.set_state("pending_datestamp", newest)
+
+        def page_done(next_token: Optional[str]):
+            # A page is complete: store it and remember where the next one starts
+            flush()
+            if next_token:
+                self.store.set_state("resumption_token", next_token)
+
+        while True:
+            resume_token = self.store.get_state("resumption_token")
+            if resume_token:
+                logger.info("Resuming interrupted harvest")
+            records = OAIPMHClient(endpoint).list_records(
+                from_date=None if resume_token else self.store.get_state("last_datestamp"),
+                resumption_token=resume_token,
+                on_page=page_done
+            )
+            # Only the first request goes through the breaker. OAI-PMH error
+            # responses mean the repository is up, so they do not count as failures
+            oai_error = None
+            try:
+                with oai_breaker.attempt():
+                    try:
+                        first = next(records, None)
+                    except OAIError as e:
+                        if e.code not in ("noRecordsMatch", "badResumptionToken"):
+                            raise
+                        oai_error = e
+            except CircuitOpenError as e:
+                logger.warning("Skipping harvest: %s", e)
+                return 0
+            if oai_error is None:
+                break
+            if oai_error.code == "noRecordsMatch":
+                logger.info("No new OAI-PMH records since last harvest")
+                return 0
+            if not resume_token:
+                # Only a saved token can have expired; anything else is the repository's fault
+                raise oai_error
+            logger.warning("Saved resumption token expired, restarting incremental harvest")
+            self.store.set_state("resumption_token", None)
+
+        for record in itertools.chain([first] if first is not None else [], records):
+            if self._stop.is_set():
+                records.close()
+                break
+            if record.deleted:
+                deleted.append(record.identifier)
+            else:
+                batch.append(record.as_row())
+            newest = max(newest, record.datestamp or "")
+
+        flush()
+        if not self._stop.is_set():
+            self.store.set_state("resumption_token", None)
+            self.store.set_state("pending_datestamp", None)
+            if newest:
+                self.store.set_state("last_datestamp", newest)
+
+        logger.info("OAI-PMH harvest finished: %d changes, %d records in store", changed, self.store.count())
+        return changed
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self.leader.is_leader:
+                try:
+                    self.store.reload_if_changed()
+                except Exception as e:
+                    logger.error("Could not reload OAI harvest store: %s", e)
+                self._stop.wait(SHARED_STATE_POLL_INTERVAL)
+                continue
+            try:
+                self.harvest()
+            except Exception as e:
+                logger.error("OAI-PMH harvest failed: %s", e)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Starts periodic harvesting in a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="oai-harvester", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+def query_oai(keyword: str) -> List[AcademicItem]:
     """
-    Queries the university's OAI-PMH service for records matching the keyword.
+    Searches the locally harvested OAI-PMH records for the keyword.
     Returns a list of records with title, author, and date information.
-    
+
     Args:
         keyword (str): Search term to find records
-        
+
     Returns:
-        List[Dict]: List of records with their details
+        List[AcademicItem]: List of records with their details
     """
+    if not keyword or not keyword.strip():
+        return []
     try:
-        # Test endpoint and get diagnostic info
-        diag_info = test_oai_endpoint()
-        logger.info("OAI-PMH Diagnostic Info:")
-        for verb, info in diag_info.items():
-            if verb != "endpoint":
-                logger.info(f"{verb}: {info}")
-
-        if diag_info["error"]:
-            logger.error("""
-            ⚠️ OAI-PMH HATASI:
-            DSpace OAI endpoint'e erişilemiyor. Bu durum genellikle şu sebeplerden kaynaklanır:
-            1. Endpoint yanlış olabilir
-            2. Sunucu yanıt vermiyor olabilir
-            3. OAI-PMH servisi kapalı olabilir
-            
-            Lütfen sistem yöneticisiyle iletişime geçin ve şu bilgileri iletin:
-            - Endpoint: https://earsiv.batman.edu.tr/server/oai/
-            - Test sonuçları: {diag_info}
-            """)
-            return []
-
-        # Try different endpoint variations
-        endpoints = [
-            OAI_ENDPOINT,
-            OAI_ENDPOINT.rstrip('/'),
-            OAI_ENDPOINT.rstrip('/') + '/request',
-            "https://earsiv.batman.edu.tr/oai/request",
-            "https://earsiv.batman.edu.tr/oai"
-        ]
-
-        sickle = None
-        working_endpoint = None
-
-        for endpoint in endpoints:
-            try:
-                logger.info(f"Trying endpoint: {endpoint}")
-                sickle = Sickle(
-                    endpoint,
-                    headers={'Accept': 'application/xml'},
-                    protocol_version="2.0"
-                )
-                identify = sickle.Identify()
-                logger.info(f"Successfully connected to: {endpoint}")
-                logger.info(f"Repository name: {identify.repositoryName}")
-                working_endpoint = endpoint
-                break
-            except Exception as e:
-                logger.error(f"Failed with endpoint {endpoint}: {str(e)}")
-                continue
+        return [academic_item(record) for record in get_store().search(keyword.strip(), limit=5)]
+    except Exception as e:
+        logger.error("Error querying OAI harvest store: %s", e)
+        return []
 
-        if not sickle or not working_endpoint:
-            logger.error("Could not connect to any OAI-PMH endpoint")
-            return []
-
-        # Get available metadata formats
-        try:
-            formats = list(sickle.ListMetadataFormats())
-            logger.info(f"Available metadata formats: {[f.metadataPrefix for f in formats]}")
-        except Exception as e:
-            logger.error(f"Error listing metadata formats: {e}")
-            formats = []
-
-        # Try to list records
-        try:
-            records = sickle.ListRecords(metadataPrefix='oai_dc')
-        except Exception as e:
-            logger.error(f"Error listing records: {e}")
-            try:
-                # Try listing sets
-                sets = list(sickle.ListSets())
-                if sets:
-                    logger.info(f"Available sets: {[s.setSpec for s in sets]}")
-                    records = sickle.ListRecords(
-                        metadataPrefix='oai_dc',
-                        set=sets[0].setSpec
-                    )
-                else:
-                    logger.error("No sets available")
-                    return []
-            except Exception as set_error:
-                logger.error(f"Error listing sets: {set_error}")
-                return []
-
-        results = []
-        for record in records:
-            try:
-                metadata = record.metadata
-                if not metadata:
-                    continue
-
-                title = metadata.get("title", [""])[0] if "title" in metadata else ""
-                creator = metadata.get("creator", [""])[0] if "creator" in metadata else ""
-                date = metadata.get("date", [""])[0] if "date" in metadata else ""
-                identifier = metadata.get("identifier", [""])[0] if "identifier" in metadata else ""
-
-                if (keyword.lower() in title.lower() or 
-                    keyword.lower() in creator.lower()) and title:
-                    results.append({
-                        "title": title,
-                        "creator": creator,
-                        "date": date,
-                        "identifier": identifier
-                    })
-                if len(results) >= 5:
-                    break
-
-            except Exception as record_error:
-                logger.error(f"Error processing record: {record_error}")
-                continue
+async def query_oai_async(keyword: str) -> List[AcademicItem]:
+    """
+    Async entry point for academic searches.
+    Records come from the local harvest store, so there is no network I/O to
+    await; the lookup is a sub-millisecond index search done inline.
+    """
+    return query_oai(keyword)
 
-        return results
+def query_oai_many(keywords: List[str]) -> List[List[AcademicItem]]:
+    """
+    query_oai for a batch of keywords, read from the harvest store together.
 
+    Args:
+        keywords (List[str]): Search terms
+
+    Returns:
+        List[List[AcademicItem]]: Records per keyword, in the same order
+    """
+    searchable = [keyword.strip() for keyword in keywords if keyword and keyword.strip()]
+    try:
+        records = get_store().search_many(searchable, limit=5) if searchable else []
+        found = {
+            keyword: [academic_item(record) for record in result] for keyword, result in zip(searchable, records)
+        }
+    except Exception as e:
+        logger.error("Error querying OAI harvest store: %s", e)
+        found = {}
+    return [found.get((keyword or "").strip(), []) for keyword in keywords]
+
+def query_oai_page(keyword: str, offset: int, limit: int) -> Tuple[List[AcademicItem], Optional[int]]:
+    """
+    One page of academic results for cursor pagination. The index ranks the
+    top offset + limit matches and the page is cut from them.
+
+    Returns:
+        Tuple[List[AcademicItem], Optional[int]]: Records and the total match count, once known
+    """
+    if not keyword or not keyword.strip():
+        return [], 0
+    try:
+        records = get_store().search(keyword.strip(), limit=offset + limit)
     except Exception as e:
-        logger.error(f"Error querying OAI-PMH service: {e}")
-        logger.error("Full error details:", str(e))
-        return [] 
\ No newline at end of file
+        logger.error("Error querying OAI harvest store: %s", e)
+        return [], None
+    total = len(records) if len(records) < offset + limit else None
+    return [academic_item(record) for record in records[offset:]], total
@@ -0,0 +1,215 @@
+from typing import Dict, Iterable, List, Optional
+import os
+import sqlite3
+import threading
+import logging
+from dotenv import load_dotenv
+from .text_index import InvertedIndex
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Local harvest store location
+OAI_STORE_PATH = os.getenv("OAI_STORE_PATH", "data/oai_store.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    identifier TEXT PRIMARY KEY,
+    datestamp TEXT,
+    title TEXT,
+    creator TEXT,
+    subject TEXT,
+    description TEXT,
+    date TEXT,
+    link TEXT
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+RECORD_FIELDS = ("identifier", "datestamp", "title", "creator", "subject", "description", "date", "link")
+
+
+class OAIHarvestStore:
+    """
+    SQLite backed local copy of the OAI-PMH repository.
+    Records are written by the background harvester and read by query_oai,
+    so user queries never touch the network. An in-memory inverted index over
+    title/creator/subject/description is kept in step with the table.
+
+    Several workers may open the same file while only the leader harvests;
+    the others call reload_if_changed to pick up its writes.
+    """
+
+    # Identifiers per IN (...) query in search_many, below SQLite's variable limit
+    SEARCH_MANY_CHUNK = 500
+
+    def __init__(self, path: str = OAI_STORE_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+        self.index = InvertedIndex()
+        self._load_index()
+        self._data_version = self._read_data_version()
+        logger.info("OAI harvest store opened: %s (%d records indexed)", path, len(self.index))
+
+    def _load_index(self, index: Optional[InvertedIndex] = None):
+        index = index if index is not None else self.index
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT identifier, title, creator, subject, description FROM records WHERE title != ''"
+            ).fetchall()
+        for row in rows:
+            index.add(row["identifier"], dict(row))
+
+    def _read_data_version(self) -> int:
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def reload_if_changed(self) -> bool:
+        """
+        Rebuilds the index if another process committed to the store since the
+        last check (SQLite's data_version ignores this connection's own writes).
+
+        Returns:
+            bool: True if the index was rebuilt
+        """
+        version = self._read_data_version()
+        if version == self._data_version:
+            return False
+        index = InvertedIndex()
+        self._load_index(index)
+        self.index = index
+        self._data_version = version
+        logger.info("OAI harvest store changed on disk, reindexed %d records", len(index))
+        return True
+
+    def upsert_records(self, records: Iterable[Dict]) -> int:
+        """Insert or replace harvested records. Returns the number of rows written."""
+        records = list(records)
+        if not records:
+            return 0
+        rows = [tuple(record.get(field, "") for field in RECORD_FIELDS) for record in records]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO records "
+                "(identifier, datestamp, title, creator, subject, description, date, link) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+        for record in records:
+            if record.get("title"):
+                self.index.add(record["identifier"], record)
+            else:
+                self.index.remove(record["identifier"])
+        return len(rows)
+
+    def delete_records(self, identifiers: Iterable[str]) -> int:
+        """Remove records flagged as deleted by the repository."""
+        ids = [(identifier,) for identifier in identifiers]
+        if not ids:
+            return 0
+        with self._lock:
+            self._conn.executemany("DELETE FROM records WHERE identifier = ?", ids)
+            self._conn.commit()
+        for (identifier,) in ids:
+            self.index.remove(identifier)
+        return len(ids)
+
+    def get_state(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def set_state(self, key: str, value: Optional[str]):
+        with self._lock:
+            if value is None:
+                self._conn.execute("DELETE FROM sync_state WHERE key = ?", (key,))
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+                    (key, value)
+                )
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def search(self, keyword: str, limit: int = 5) -> List[Dict]:
+        """
+        Returns the records that best match the keyword, ranked with BM25.
+
+        Args:
+            keyword (str): Search term
+            limit (int): Maximum number of records to return
+
+        Returns:
+            List[Dict]: Matching records, best first
+        """
+        return self.search_many([keyword], limit=limit)[0]
+
+    def search_many(self, keywords: List[str], limit: int = 5) -> List[List[Dict]]:
+        """
+        search() for several keywords at once: the records of all of them are
+        read in one query per SEARCH_MANY_CHUNK identifiers.
+
+        Returns:
+            List[List[Dict]]: Matching records per keyword, in keyword order
+        """
+        rankings = [[identifier for identifier, _ in self.index.search(keyword, k=limit)] for keyword in keywords]
+        wanted = list({identifier for ranked in rankings for identifier in ranked})
+        by_id = {}
+        with self._lock:
+            for start in range(0, len(wanted), self.SEARCH_MANY_CHUNK):
+                chunk = wanted[start:start + self.SEARCH_MANY_CHUNK]
+                placeholders = ", ".join("?" * len(chunk))
+                for row in self._conn.execute(
+                    f"SELECT identifier, title, creator, date, link FROM records WHERE identifier IN ({placeholders})",
+                    chunk
+                ):
+                    by_id[row["identifier"]] = row
+        return [
+            [
+                {
+                    "title": row["title"],
+                    "creator": row["creator"],
+                    "date": row["date"],
+                    "identifier": row["link"] or row["identifier"]
+                }
+                for row in (by_id.get(identifier) for identifier in ranked)
+                if row is not None
+            ]
+            for ranked in rankings
+        ]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store: Optional[OAIHarvestStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> OAIHarvestStore:
+    """Returns the process wide harvest store, opening it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = OAIHarvestStore()
+    return _store
@@ -0,0 +1,126 @@
+from typing import Dict, List, Optional, Tuple
+import os
+import sqlite3
+import threading
+import time
+import logging
+from dotenv import load_dotenv
+from .cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+QUERY_LOG_ENABLED = os.getenv("QUERY_LOG_ENABLED", "true").lower() == "true"
+QUERY_LOG_PATH = os.getenv("QUERY_LOG_PATH", "data/query_log.sqlite3")
+# Queries are counted per bucket of this many seconds
+QUERY_LOG_BUCKET = int(os.getenv("QUERY_LOG_BUCKET", "3600"))
+QUERY_LOG_RETENTION_DAYS = int(os.getenv("QUERY_LOG_RETENTION_DAYS", "14"))
+# Longer queries are pasted text rather than topics worth replaying
+QUERY_LOG_MAX_LENGTH = int(os.getenv("QUERY_LOG_MAX_LENGTH", "200"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_counts (
+    query TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (query, bucket)
+)
+"""
+
+
+class QueryLog:
+    """
+    Counts normalized user queries per time bucket, for cache warm-up.
+
+    record() only bumps an in-memory counter; flush() adds the counts to a
+    SQLite file in one transaction. Every worker flushes into the same file,
+    so top() sees the traffic of all workers and survives restarts. Only the
+    normalized query (see normalize_query) and its counts are stored.
+    """
+
+    def __init__(self, path: str = QUERY_LOG_PATH, enabled: bool = QUERY_LOG_ENABLED):
+        self.path = path
+        self.enabled = enabled
+        self._pending: Dict[Tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Reopened after a fork, SQLite connections must not cross processes
+        if self._conn is None or self._pid != os.getpid():
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            if self.path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(SCHEMA)
+            self._pid = os.getpid()
+        return self._conn
+
+    def record(self, query: str):
+        """Counts one occurrence of the query; called on the request path."""
+        if not self.enabled:
+            return
+        key = normalize_query(query)
+        if not key or len(key) > QUERY_LOG_MAX_LENGTH:
+            return
+        bucket = int(time.time()) // QUERY_LOG_BUCKET * QUERY_LOG_BUCKET
+        with self._lock:
+            self._pending[(key, bucket)] = self._pending.get((key, bucket), 0) + 1
+
+    def flush(self) -> int:
+        """
+        Writes the pending counts and drops buckets past the retention.
+
+        Returns:
+            int: Number of (query, bucket) counts written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        cutoff = time.time() - QUERY_LOG_RETENTION_DAYS * 86400
+        try:
+            with self._db_lock:
+                conn = self._connection()
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO query_counts (query, bucket, count) VALUES (?, ?, ?) "
+                        "ON CONFLICT (query, bucket) DO UPDATE SET count = count + excluded.count",
+                        [(query, bucket, count) for (query, bucket), count in pending.items()]
+                    )
+                    conn.execute("DELETE FROM query_counts WHERE bucket < ?", (cutoff,))
+        except sqlite3.Error as e:
+            logger.error("Could not write query log: %s", e)
+            return 0
+        return len(pending)
+
+    def top(self, limit: int, window: float) -> List[str]:
+        """
+        Returns the most frequent normalized queries of the last `window` seconds.
+
+        Args:
+            limit (int): Maximum number of queries
+            window (float): How far back to count, in seconds
+
+        Returns:
+            List[str]: Queries, most frequent first
+        """
+        with self._db_lock:
+            rows = self._connection().execute(
+                "SELECT query FROM query_counts WHERE bucket >= ? "
+                "GROUP BY query ORDER BY SUM(count) DESC, query LIMIT ?",
+                (time.time() - window, limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        self.flush()
+        with self._db_lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
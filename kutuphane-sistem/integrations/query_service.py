@@ -1,135 +1,413 @@
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+import asyncio
+import contextvars
 import logging
-from .library_api import query_library
-from .yordam_token_manager import get_yordam_token, validate_token
-from .oai_pmh import query_oai
-from .web_scraper import LibraryWebScraper
+import time
+from .library_api import query_library_async, query_library_many_async, search_catalog_page_async
+from .yordam_token_manager import get_yordam_token_async, validate_token
+from .oai_pmh import query_oai_async, query_oai_many, query_oai_page
+from .web_scraper import AsyncLibraryWebScraper
+from .site_snapshot import SiteSnapshot
+from .semantic_cache import SemanticCache, SEMANTIC_CACHE_ENABLED
+from .search_cursor import SearchCursors
+from .intent_router import IntentRouter, INTENT_ROUTER_ENABLED, website_topic
+from .results import Item, answer, text_answer
+from .metrics import STAGE_LATENCY, LLM_FIRST_TOKEN, count_answer, observe_stage
 import openai
 import os
 
 logger = logging.getLogger(__name__)
 
+# Per-backend deadlines (seconds) for fan-out mode
+CATALOG_DEADLINE = float(os.getenv("CATALOG_DEADLINE", "10"))
+ACADEMIC_DEADLINE = float(os.getenv("ACADEMIC_DEADLINE", "5"))
+WEBSITE_DEADLINE = float(os.getenv("WEBSITE_DEADLINE", "10"))
+
+# Largest batch /sorgula/batch accepts, and how many catalog or ChatGPT calls a batch runs at once
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "50"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+# (messages, max_tokens) -> completion text
+LLM = Callable[[List[Dict[str, str]], int], str]
+# (messages, max_tokens) -> completion text chunks
+LLMStream = Callable[[List[Dict[str, str]], int], AsyncIterator[str]]
+
 class QueryService:
-    def __init__(self):
+    def __init__(self, llm: Optional[LLM] = None, semantic_cache: Optional[SemanticCache] = None,
+                 llm_stream: Optional[LLMStream] = None):
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
-        openai.api_key = self.openai_api_key
-        self.web_scraper = LibraryWebScraper()
+        self._openai_client = None
+        self._async_openai_client = None
+        # Pluggable so the fallback can run offline with a stub LLM
+        self.llm = llm or self._openai_complete
+        if llm_stream is not None:
+            self.llm_stream = llm_stream
+        elif llm is not None:
+            self.llm_stream = self._complete_as_stream
+        else:
+            self.llm_stream = self._openai_stream
+        if semantic_cache is None and SEMANTIC_CACHE_ENABLED:
+            semantic_cache = SemanticCache()
+        self.semantic_cache = semantic_cache
+        self.intent_router = IntentRouter() if INTENT_ROUTER_ENABLED else None
+        self.async_web_scraper = AsyncLibraryWebScraper()
+        self.site_snapshot = SiteSnapshot(self.async_web_scraper)
+        self.search_cursors = SearchCursors({"catalog": self._catalog_page, "academic": self._academic_page})
 
-    def process_library_query(self, query: str) -> Optional[str]:
-        """Process library catalog query"""
-        token = get_yordam_token()
+    async def process_library_query_async(self, query: str) -> Optional[Dict]:
+        """Process library catalog query without blocking the event loop"""
+        token = await get_yordam_token_async()
         if not token or not validate_token(token):
             logger.error("YORDAM token alınamadı veya geçersiz")
             return None
-            
-        library_results = query_library(query, token)
-        if not library_results:
-            return None
-            
-        response = "Kütüphane kataloğunda şu kaynakları buldum:<br/><br/>"
-        response += "<br/><br/>"
-        for i, result in enumerate(library_results, 1):
-            response += f"{i}. 📚 {result.get('title', 'Başlık yok')}<br/>"
-            if result.get('year'):
-                response += f"   🗓️ Yıl: {result['year']}<br/>"
-            response += "—" * 30 + "<br/>"
-        return response
-
-    def process_academic_query(self, query: str) -> Optional[str]:
-        """Process academic resources query"""
-        oai_results = query_oai(query)
-        if not oai_results:
-            return None
-            
-        response = "Akademik kaynaklarda şu sonuçları buldum:<br/><br/>"
-        for i, result in enumerate(oai_results, 1):
-            response += f"{i}. 📄 {result['title']}<br/>"
-            if result.get('date'):
-                response += f"   📅 Tarih: {result['date']}<br/>"
-            response += "<br/>"
-        return response
-
-    def process_website_query(self, query: str) -> Optional[str]:
-        """Process library website related queries"""
-        query_lower = query.lower()
-        
-        if "duyuru" in query_lower or "duyurular" in query_lower:
-            return self._get_announcements_response()
-        elif "personel" in query_lower or "çalışan" in query_lower:
-            return self._get_staff_response()
-        elif "iletişim" in query_lower or "adres" in query_lower:
-            return self._get_contact_response()
-        return None
-
-    def _get_announcements_response(self) -> Optional[str]:
-        announcements = self.web_scraper.get_announcements()
-        if not announcements:
+
+        return answer("catalog", await query_library_async(query, token))
+
+    async def _catalog_page(self, query: str, offset: int, limit: int) -> Tuple[List[Item], Optional[int]]:
+        """Catalog page fetcher for search cursors"""
+        token = await get_yordam_token_async()
+        if not token or not validate_token(token):
+            logger.error("YORDAM token alınamadı veya geçersiz")
+            return [], None
+        return await search_catalog_page_async(query, token, offset, limit)
+
+    async def _academic_page(self, query: str, offset: int, limit: int) -> Tuple[List[Item], Optional[int]]:
+        """Academic page fetcher for search cursors; a local index lookup"""
+        return query_oai_page(query, offset, limit)
+
+    async def process_academic_query_async(self, query: str) -> Optional[Dict]:
+        """Process academic resources query without blocking the event loop"""
+        return answer("academic", await query_oai_async(query))
+
+    def process_website_query(self, query: str) -> Optional[Dict]:
+        """Process library website related queries from the background-refreshed snapshot"""
+        topic = website_topic(query)
+        if topic is None:
             return None
-            
-        response = "Kütüphane duyurularını buldum:<br/><br/>"
-        for i, ann in enumerate(announcements, 1):
-            response += f"{i}. 📢 {ann['title']}<br/>"
-            if ann.get('date'):
-                response += f"   📅 Tarih: {ann['date']}<br/>"
-            response += "<br/>"
-        return response
-
-    def _get_staff_response(self) -> Optional[str]:
-        staff = self.web_scraper.get_staff_info()
-        if not staff:
+        return answer("website", self.site_snapshot.get_items(topic))
+
+    async def process_website_query_async(self, query: str) -> Optional[Dict]:
+        """Async entry point for website queries; the snapshot makes this a memory read"""
+        return self.process_website_query(query)
+
+    def backend_stages(self, query: str) -> List[Tuple[str, Callable, float]]:
+        """
+        (name, async handler, deadline) for each backend worth asking, in priority order.
+        The intent router drops backends that cannot answer the query; when it
+        is unsure, all backends are returned in the default cascade order.
+        """
+        stages = {
+            "catalog": (self.process_library_query_async, CATALOG_DEADLINE),
+            "academic": (self.process_academic_query_async, ACADEMIC_DEADLINE),
+            "website": (self.process_website_query_async, WEBSITE_DEADLINE),
+        }
+        return [(name, self._timed(name, stages[name][0]), stages[name][1]) for name in self._backend_order(query)]
+
+    def _backend_order(self, query: str) -> List[str]:
+        order = self.intent_router.route(query) if self.intent_router is not None else None
+        return order if order is not None else ["catalog", "academic", "website"]
+
+    def _timed(self, stage: str, handler: Callable) -> Callable:
+        """Wraps a backend handler so its latency is recorded per stage"""
+        async def timed(query: str) -> Optional[Dict]:
+            with STAGE_LATENCY.labels(stage=stage).time():
+                return await handler(query)
+        return timed
+
+    async def process_query_fanout(self, query: str) -> Optional[Dict]:
+        """
+        Runs the catalog, academic and website backends concurrently.
+
+        The answer is still chosen in priority order (see backend_stages):
+        each backend is awaited in turn under its own deadline, and as
+        soon as one returns a result the lower-priority ones are cancelled.
+        Worst-case latency is the largest deadline instead of their sum.
+        """
+        tasks = [
+            (name, asyncio.ensure_future(asyncio.wait_for(handler(query), deadline)))
+            for name, handler, deadline in self.backend_stages(query)
+        ]
+        try:
+            for name, task in tasks:
+                try:
+                    result = await task
+                except asyncio.TimeoutError:
+                    logger.warning("%s backend missed its deadline", name)
+                    continue
+                except Exception as e:
+                    logger.error("%s backend failed: %s", name, e)
+                    continue
+                if result:
+                    count_answer(name)
+                    return result
             return None
-            
-        response = "Kütüphane personel bilgileri:<br/><br/>"
-        for i, person in enumerate(staff, 1):
-            response += f"{i}. 👤 {person['name']}<br/>"
-            if person.get('title'):
-                response += f"   📋 Görev: {person['title']}<br/>"
-            if person.get('email'):
-                response += f"   📧 E-posta: {person['email']}<br/>"
-            if person.get('phone'):
-                response += f"   📞 Telefon: {person['phone']}<br/>"
-            response += "<br/>"
-        return response
-
-    def _get_contact_response(self) -> Optional[str]:
-        contact = self.web_scraper.get_contact_info()
-        if not contact:
+        finally:
+            for _, task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def process_batch(self, queries: List[str]) -> List[Dict]:
+        """
+        Answers many queries in one call, in request order.
+
+        Repeated queries are answered once. Instead of running the cascade per
+        query, each backend gets one grouped operation: catalog lookups share
+        a token and run BATCH_CONCURRENCY at a time, academic lookups read the
+        harvest store together, website answers come from the snapshot. Each
+        query then takes the first backend answer in its priority order (see
+        backend_stages), falling back to ChatGPT, also BATCH_CONCURRENCY at a time.
+
+        Args:
+            queries (List[str]): User queries
+
+        Returns:
+            List[Dict]: One answer per query with the query added under "query"
+        """
+        unique = list(dict.fromkeys(query.strip() for query in queries))
+        orders = {query: self._backend_order(query) for query in unique}
+        found = await self._backend_answers(orders)
+
+        answers: Dict[str, Dict] = {}
+        fallback = []
+        for query in unique:
+            for name in orders[query]:
+                if found[query].get(name):
+                    count_answer(name)
+                    answers[query] = found[query][name]
+                    break
+            else:
+                fallback.append(query)
+
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def chatgpt(query: str):
+            async with semaphore:
+                answers[query] = text_answer("chatgpt", await self.get_chatgpt_response_async(query))
+
+        await asyncio.gather(*(chatgpt(query) for query in fallback))
+        return [{"query": query, **answers[query.strip()]} for query in queries]
+
+    async def warm(self, queries: List[str]) -> int:
+        """
+        Runs queries through the backends they route to, without ChatGPT or
+        answer metrics, so the catalog cache and the lazily loaded indexes
+        are ready before users ask (see warmup.CacheWarmer).
+
+        Returns:
+            int: Number of queries a backend answered
+        """
+        unique = list(dict.fromkeys(query.strip() for query in queries if query.strip()))
+        found = await self._backend_answers({query: self._backend_order(query) for query in unique})
+        return sum(1 for answers in found.values() if any(answers.values()))
+
+    async def _backend_answers(self, orders: Dict[str, List[str]]) -> Dict[str, Dict[str, Optional[Dict]]]:
+        """
+        One grouped operation per backend for all queries in `orders`
+        (query -> backends to ask). Returns query -> backend -> answer.
+        """
+        found: Dict[str, Dict[str, Optional[Dict]]] = {query: {} for query in orders}
+
+        def wanted(name: str) -> List[str]:
+            return [query for query, order in orders.items() if name in order]
+
+        async def catalog():
+            batch = wanted("catalog")
+            if not batch:
+                return
+            token = await get_yordam_token_async()
+            if not token or not validate_token(token):
+                logger.error("YORDAM token alınamadı veya geçersiz")
+                return
+            records = await query_library_many_async(batch, token, BATCH_CONCURRENCY, CATALOG_DEADLINE)
+            for query, result in zip(batch, records):
+                found[query]["catalog"] = answer("catalog", result)
+
+        async def academic():
+            batch = wanted("academic")
+            if not batch:
+                return
+            # Harvest store reads block, so they run in a worker thread while the catalog calls are out
+            loop = asyncio.get_running_loop()
+            records = await loop.run_in_executor(None, contextvars.copy_context().run, query_oai_many, batch)
+            for query, result in zip(batch, records):
+                found[query]["academic"] = answer("academic", result)
+
+        def website():
+            for query in wanted("website"):
+                found[query]["website"] = self.process_website_query(query)
+
+        website()
+        await asyncio.gather(academic(), catalog())
+        return found
+
+    def _openai_complete(self, messages: List[Dict[str, str]], max_tokens: int) -> str:
+        if self._openai_client is None:
+            self._openai_client = openai.OpenAI(api_key=self.openai_api_key)
+        chat_response = self._openai_client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=messages,
+            temperature=0.7,
+            max_tokens=max_tokens
+        )
+        return chat_response.choices[0].message.content
+
+    async def _openai_stream(self, messages: List[Dict[str, str]], max_tokens: int) -> AsyncIterator[str]:
+        if self._async_openai_client is None:
+            self._async_openai_client = openai.AsyncOpenAI(api_key=self.openai_api_key)
+        stream = await self._async_openai_client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=messages,
+            temperature=0.7,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def _complete_as_stream(self, messages: List[Dict[str, str]], max_tokens: int) -> AsyncIterator[str]:
+        """Adapts a non-streaming llm callable to the streaming interface"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        yield await loop.run_in_executor(None, context.run, self.llm, messages, max_tokens)
+
+    def _build_messages(self, query: str, is_error: bool) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": self._get_system_prompt(is_error)},
+            {"role": "user", "content": query if not is_error else f"Kullanıcının sorusu: {query}"}
+        ]
+
+    def _cached_answer(self, query: str, is_error: bool) -> Optional[str]:
+        if is_error or self.semantic_cache is None:
             return None
-            
-        response = "Kütüphane iletişim bilgileri:<br/><br/>"
-        info_items = []
-        if contact.get('address'):
-            info_items.append(f"📍 Adres: {contact['address']}")
-        if contact.get('phone'):
-            info_items.append(f"📞 Telefon: {contact['phone']}")
-        if contact.get('email'):
-            info_items.append(f"📧 E-posta: {contact['email']}")
-        if contact.get('working_hours'):
-            info_items.append(f"⏰ Çalışma Saatleri: {contact['working_hours']}")
-        
-        return "<br/>".join(f"{i}. {item}" for i, item in enumerate(info_items, 1))
+        return self.semantic_cache.lookup(query)
 
     def get_chatgpt_response(self, query: str, is_error: bool = False) -> str:
-        """Get response from ChatGPT"""
+        """Get response from ChatGPT, reusing the answer of a near-identical earlier question"""
+        cached = self._cached_answer(query, is_error)
+        if cached:
+            count_answer("semantic_cache")
+            return cached
         try:
-            system_content = self._get_system_prompt(is_error)
-            messages = [
-                {"role": "system", "content": system_content},
-                {"role": "user", "content": query if not is_error else f"Kullanıcının sorusu: {query}"}
-            ]
-            
-            chat_response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=500 if not is_error else 300
-            )
-            
-            return self._format_response(chat_response.choices[0].message.content)
+            messages = self._build_messages(query, is_error)
+            with STAGE_LATENCY.labels(stage="llm").time():
+                text = self.llm(messages, 500 if not is_error else 300)
+            with STAGE_LATENCY.labels(stage="formatting").time():
+                formatted = self._format_response(text)
+            if not is_error and self.semantic_cache is not None:
+                self.semantic_cache.store(query, formatted)
+            count_answer("error" if is_error else "chatgpt")
+            return formatted
         except Exception as e:
-            logger.error(f"ChatGPT error: {e}")
+            logger.error("ChatGPT error: %s", e)
+            count_answer("unavailable")
             return "Şu anda hizmet veremiyorum. Lütfen daha sonra tekrar deneyin veya kütüphane personeliyle iletişime geçin."
 
+    async def get_chatgpt_response_async(self, query: str, is_error: bool = False) -> str:
+        """
+        Get response from ChatGPT in a worker thread so the event loop stays free.
+        The semantic cache lookup runs there too, since embedding can be slow.
+        """
+        loop = asyncio.get_running_loop()
+        # Copy the context so log lines from the worker keep the request ID
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(None, context.run, self.get_chatgpt_response, query, is_error)
+
+    async def stream_chatgpt_response(self, query: str) -> AsyncIterator[Dict]:
+        """
+        Stream the ChatGPT answer as events.
+
+        "token" events carry raw text as it arrives. When a paragraph is
+        complete, a "paragraph" event carries its formatted text, which
+        replaces the raw text shown so far. "rest" is the raw text that
+        already belongs to the next paragraph.
+        """
+        # In a worker thread: embedding the query can take a while with SEMANTIC_CACHE_MODEL
+        cached = await asyncio.get_running_loop().run_in_executor(
+            None, contextvars.copy_context().run, self._cached_answer, query, False
+        )
+        if cached:
+            count_answer("semantic_cache")
+            yield {"type": "result", **text_answer("semantic_cache", cached)}
+            return
+
+        formatted: List[str] = []
+        buffer = ""
+        start = time.perf_counter()
+        first_token = True
+        formatting = 0.0
+        try:
+            async for delta in self.llm_stream(self._build_messages(query, False), 500):
+                if first_token:
+                    LLM_FIRST_TOKEN.labels().observe(time.perf_counter() - start)
+                    first_token = False
+                buffer += delta
+                if '\n\n' not in buffer:
+                    yield {"type": "token", "text": delta}
+                    continue
+                *done, buffer = buffer.split('\n\n')
+                for i, paragraph in enumerate(done):
+                    format_start = time.perf_counter()
+                    formatted.append(self._format_paragraph(paragraph))
+                    formatting += time.perf_counter() - format_start
+                    yield {
+                        "type": "paragraph",
+                        "text": formatted[-1],
+                        "rest": buffer if i == len(done) - 1 else ""
+                    }
+            formatted.append(self._format_paragraph(buffer))
+            observe_stage("llm", time.perf_counter() - start)
+            observe_stage("formatting", formatting)
+            yield {"type": "paragraph", "text": formatted[-1], "rest": ""}
+        except Exception as e:
+            logger.error("ChatGPT stream error: %s", e)
+            yield {"type": "error", **text_answer("error", await self.get_chatgpt_response_async(query, is_error=True))}
+            return
+
+        count_answer("chatgpt")
+
+        if self.semantic_cache is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.semantic_cache.store, query, '\n\n'.join(formatted)
+            )
+
+    async def stream_query(self, query: str) -> AsyncIterator[Dict]:
+        """
+        Stream a full answer: backend results in priority order (see
+        backend_stages), then the ChatGPT answer token by token if no backend
+        found anything. The backends run concurrently; each result is sent
+        once its backend and every higher-priority one have finished, so the
+        first result is the answer process_query_fanout would give, and only
+        that one is counted as the answering stage.
+        """
+        async def run(name, handler, deadline):
+            try:
+                return await asyncio.wait_for(handler(query), deadline)
+            except asyncio.TimeoutError:
+                logger.warning("%s backend missed its deadline", name)
+            except Exception as e:
+                logger.error("%s backend failed: %s", name, e)
+            return None
+
+        tasks = [(stage[0], asyncio.ensure_future(run(*stage))) for stage in self.backend_stages(query)]
+        found = False
+        try:
+            for name, task in tasks:
+                result = await task
+                if result:
+                    if not found:
+                        count_answer(name)
+                    found = True
+                    yield {"type": "result", **result}
+        finally:
+            for _, task in tasks:
+                task.cancel()
+
+        if not found:
+            async for event in self.stream_chatgpt_response(query):
+                yield event
+        yield {"type": "done"}
+
     def _get_system_prompt(self, is_error: bool) -> str:
         """Get appropriate system prompt based on context"""
         if is_error:
@@ -156,30 +434,27 @@ Kullanıcı sana herhangi bir konuda soru sorduğunda:
 
     def _format_response(self, text: str) -> str:
         """Format the response text to use numbered lists when appropriate"""
-        paragraphs = text.split('\n\n')
-        formatted_paragraphs = []
-        
-        for paragraph in paragraphs:
-            lines = paragraph.split('\n')
-            
-            if any(line.strip().startswith(('-', '*', '•', '→', '·')) for line in lines):
-                numbered_lines = []
-                item_count = 1
-                for line in lines:
-                    stripped = line.strip()
-                    if stripped.startswith(('-', '*', '•', '→', '·')):
-                        content = stripped[1:].strip()
-                        numbered_lines.append(f"{item_count}. {content}")
-                        item_count += 1
-                    else:
-                        numbered_lines.append(line)
-                formatted_paragraphs.append('<br/>'.join(numbered_lines))
-            else:
-                sentences = [s.strip() for s in paragraph.split('.') if s.strip()]
-                if len(sentences) > 1 and all(len(s) < 100 for s in sentences):
-                    numbered_sentences = [f"{i+1}. {s}." for i, s in enumerate(sentences)]
-                    formatted_paragraphs.append('<br/>'.join(numbered_sentences))
+        return '\n\n'.join(self._format_paragraph(paragraph) for paragraph in text.split('\n\n'))
+
+    def _format_paragraph(self, paragraph: str) -> str:
+        """Format one paragraph; paragraphs are independent, so streaming can format each as it completes"""
+        lines = paragraph.split('\n')
+
+        if any(line.strip().startswith(('-', '*', '•', '→', '·')) for line in lines):
+            numbered_lines = []
+            item_count = 1
+            for line in lines:
+                stripped = line.strip()
+                if stripped.startswith(('-', '*', '•', '→', '·')):
+                    content = stripped[1:].strip()
+                    numbered_lines.append(f"{item_count}. {content}")
+                    item_count += 1
                 else:
-                    formatted_paragraphs.append(paragraph)
-        
-        return '<br/><br/>'.join(formatted_paragraphs) 
\ No newline at end of file
+                    numbered_lines.append(line)
+            return '\n'.join(numbered_lines)
+
+        sentences = [s.strip() for s in paragraph.split('.') if s.strip()]
+        if len(sentences) > 1 and all(len(s) < 100 for s in sentences):
+            numbered_sentences = [f"{i+1}. {s}." for i, s in enumerate(sentences)]
+            return '\n'.join(numbered_sentences)
+        return paragraph
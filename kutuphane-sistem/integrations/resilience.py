@@ -0,0 +1,224 @@
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+from collections import deque
+from contextlib import contextmanager
+import math
+import os
+import threading
+import time
+import logging
+from dotenv import load_dotenv
+from .metrics import CallbackMetric, UPSTREAM_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Circuit breaker: open when at least BREAKER_FAILURE_RATE of the calls in the
+# last BREAKER_WINDOW seconds failed (and there were at least BREAKER_MIN_CALLS)
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_WINDOW = float(os.getenv("BREAKER_WINDOW", "60"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+
+# Adaptive timeout: p99 of recent successful latencies times this factor,
+# clamped to [ADAPTIVE_TIMEOUT_MIN, the backend's configured timeout]
+ADAPTIVE_TIMEOUT_FACTOR = float(os.getenv("ADAPTIVE_TIMEOUT_FACTOR", "2.0"))
+ADAPTIVE_TIMEOUT_MIN = float(os.getenv("ADAPTIVE_TIMEOUT_MIN", "1.0"))
+ADAPTIVE_TIMEOUT_SAMPLES = 20
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Every CircuitBreaker registers itself here so its state can be reported
+_registry: Dict[str, "CircuitBreaker"] = {}
+_registry_lock = threading.RLock()
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend whose circuit is open."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} devre kesici açık, {retry_in:.0f} sn sonra tekrar denenecek")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker with an adaptive timeout for one upstream backend.
+
+    closed: calls pass; outcomes are recorded in a sliding time window. When the
+        failure rate in the window reaches `failure_rate` the circuit opens.
+    open: calls fail immediately with CircuitOpenError for `open_seconds`.
+    half_open: a single probe call is let through; success closes the
+        circuit, failure opens it again.
+
+    timeout() derives the per-call timeout from the p99 of recent successful
+    latencies, so a backend that normally answers in 300 ms is not waited on
+    for the full configured timeout. A timed-out call is recorded at the
+    timeout it was given, which lets the estimate grow when the backend slows.
+    """
+
+    def __init__(self, name: str, timeout: float = 10, failure_rate: float = BREAKER_FAILURE_RATE,
+                 window: float = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 open_seconds: float = BREAKER_OPEN_SECONDS):
+        self.name = name
+        self.max_timeout = timeout
+        self.failure_rate = failure_rate
+        self.window = window
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        # (finished at, succeeded)
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._latencies: Deque[float] = deque(maxlen=200)
+        self._lock = threading.Lock()
+        self.rejected = 0
+        with _registry_lock:
+            _registry[name] = self
+
+    def _trim(self, now: float):
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+
+    def _acquire(self):
+        """Checks whether a call may proceed; raises CircuitOpenError otherwise."""
+        with self._lock:
+            if self.state == OPEN:
+                retry_in = self._opened_at + self.open_seconds - time.monotonic()
+                if retry_in > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, retry_in)
+                self.state = HALF_OPEN
+                logger.info("%s circuit half-open, sending probe", self.name)
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, self.open_seconds)
+                self._probing = True
+
+    def _record(self, ok: bool, latency: Optional[float]):
+        now = time.monotonic()
+        with self._lock:
+            if latency is not None:
+                self._latencies.append(latency)
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if ok:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    logger.info("%s circuit closed", self.name)
+                else:
+                    self._open(now)
+                return
+            self._outcomes.append((now, ok))
+            self._trim(now)
+            failures = sum(1 for _, succeeded in self._outcomes if not succeeded)
+            total = len(self._outcomes)
+            if self.state == CLOSED and total >= self.min_calls and failures / total >= self.failure_rate:
+                self._open(now)
+
+    def _open(self, now: float):
+        self.state = OPEN
+        self._opened_at = now
+        logger.warning("%s circuit opened for %.0fs", self.name, self.open_seconds)
+
+    def _release(self):
+        """Frees the half-open probe slot of a call that ended without an outcome (e.g. cancelled)."""
+        with self._lock:
+            self._probing = False
+
+    def p99(self) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < ADAPTIVE_TIMEOUT_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, math.ceil(0.99 * len(samples)) - 1)]
+
+    def timeout(self) -> float:
+        """Per-call timeout: the configured maximum until enough latencies are observed."""
+        p99 = self.p99()
+        if p99 is None:
+            return self.max_timeout
+        return min(self.max_timeout, max(ADAPTIVE_TIMEOUT_MIN, p99 * ADAPTIVE_TIMEOUT_FACTOR))
+
+    @contextmanager
+    def attempt(self) -> Iterator[float]:
+        """
+        Guards one upstream call and yields the timeout to use for it.
+        An exception raised inside the block counts as a failure; use it for
+        5xx responses as well as transport errors.
+
+        Raises:
+            CircuitOpenError: The circuit is open; the block is not run
+        """
+        self._acquire()
+        timeout = self.timeout()
+        start = time.monotonic()
+        recorded = False
+        try:
+            yield timeout
+            recorded = True
+            elapsed = time.monotonic() - start
+            UPSTREAM_LATENCY.labels(backend=self.name, outcome="ok").observe(elapsed)
+            self._record(True, elapsed)
+        except Exception:
+            recorded = True
+            elapsed = time.monotonic() - start
+            UPSTREAM_LATENCY.labels(backend=self.name, outcome="error").observe(elapsed)
+            # Only timeouts say something about latency; fast errors (refused, 5xx) do not
+            self._record(False, timeout if elapsed >= 0.9 * timeout else None)
+            raise
+        finally:
+            if not recorded:
+                self._release()
+
+    def status(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            failures = sum(1 for _, succeeded in self._outcomes if not succeeded)
+            total = len(self._outcomes)
+            state = self.state
+            retry_in = max(0.0, self._opened_at + self.open_seconds - now) if state == OPEN else 0.0
+        p99 = self.p99()
+        return {
+            "name": self.name,
+            "state": state,
+            "calls_in_window": total,
+            "failure_rate": round(failures / total, 4) if total else 0.0,
+            "rejected": self.rejected,
+            "retry_in": round(retry_in, 1),
+            "p99_ms": round(p99 * 1000, 1) if p99 is not None else None,
+            "timeout": round(self.timeout(), 3)
+        }
+
+
+def get_breaker(name: str, timeout: float = 10) -> CircuitBreaker:
+    """Returns the breaker for a backend, creating it on first use."""
+    with _registry_lock:
+        return _registry.get(name) or CircuitBreaker(name, timeout=timeout)
+
+
+def breaker_status() -> List[Dict[str, Any]]:
+    """State of every circuit breaker in the process."""
+    with _registry_lock:
+        breakers = list(_registry.values())
+    return [breaker.status() for breaker in breakers]
+
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+CallbackMetric(
+    "circuit_breaker_state", "Circuit breaker state per backend (0 closed, 1 half-open, 2 open)", ("backend",),
+    lambda: {(status["name"],): _STATE_VALUES[status["state"]] for status in breaker_status()}
+)
+CallbackMetric(
+    "circuit_breaker_rejected_total", "Calls rejected by an open circuit", ("backend",),
+    lambda: {(status["name"],): status["rejected"] for status in breaker_status()},
+    type_name="counter"
+)
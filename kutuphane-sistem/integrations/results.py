@@ -0,0 +1,221 @@
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import re
+import sys
+
+# Result schema shared by /sorgula, /sorgula/akis and /ara. The server sends
+# data only; templates/index.html renders it. In memory, items are the
+# slotted Item classes below and take this form when serialized.
+#
+# Answer:
+#     {"source": "catalog" | "academic" | "website" | "chatgpt" | "semantic_cache" | "error",
+#      "items": [item, ...], "text": str | None}
+#
+# Item (every key is always present, type-specific fields follow):
+#     {"type": "catalog" | "academic" | "announcement" | "staff" | "contact",
+#      "title": str | None, "author": str | None, "year": str | None,
+#      "identifier": str | None, "links": [{"rel": str, "href": str}, ...]}
+#
+#     catalog: call_number, availability
+#     announcement: date
+#     staff: role, unit, email, phone
+#     contact: address, phone (list), email, working_hours
+
+# Placeholders the catalog puts in place of missing fields
+_MISSING = {"Başlık bulunamadı", "Bilinmiyor", "Yıl yok"}
+_YEAR = re.compile(r"\b(\d{4})\b")
+
+
+def _value(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value if value and value not in _MISSING else None
+
+
+class Item:
+    """
+    Base of the result item classes.
+
+    Items are what the backends return, the caches hold and QueryService
+    passes around: one slot per field and no per-instance dict, so a cached
+    result set costs a fraction of the equivalent dicts. Fields whose values
+    repeat across items (authors, years, availability, units) are interned,
+    so every item shares one copy of each. The schema dict above is only
+    built when a response is serialized (to_dict, dumps).
+    """
+
+    __slots__ = ("title", "author", "year", "identifier")
+    TYPE = ""
+    # Stored fields in constructor and to_row order
+    FIELDS: Tuple[str, ...] = __slots__
+    # Type-specific fields added to the common ones by to_dict
+    EXTRA: Tuple[str, ...] = ()
+    INTERNED: Tuple[str, ...] = ("author", "year")
+
+    def __init__(self, *values, **fields):
+        for name, value in zip(self.FIELDS, values):
+            setattr(self, name, value)
+        for name in self.FIELDS[len(values):]:
+            setattr(self, name, fields.get(name))
+        for name in self.INTERNED:
+            value = getattr(self, name)
+            if type(value) is str:
+                setattr(self, name, sys.intern(value))
+
+    def links(self) -> List[Dict[str, str]]:
+        return []
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The item in the schema above."""
+        item = {
+            "type": self.TYPE,
+            "title": self.title,
+            "author": self.author,
+            "year": self.year,
+            "identifier": self.identifier,
+            "links": self.links(),
+        }
+        for name in self.EXTRA:
+            item[name] = getattr(self, name)
+        return item
+
+    def to_row(self) -> List[Any]:
+        """Compact JSON form for shared caches: [type, *fields]."""
+        return [self.TYPE] + [getattr(self, name) for name in self.FIELDS]
+
+    def __eq__(self, other) -> bool:
+        return type(other) is type(self) and self.to_row() == other.to_row()
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.FIELDS)
+        return f"{type(self).__name__}({fields})"
+
+
+class CatalogItem(Item):
+    __slots__ = ("call_number", "availability")
+    TYPE = "catalog"
+    FIELDS = Item.FIELDS + __slots__
+    EXTRA = __slots__
+    INTERNED = ("author", "year", "availability")
+
+
+class AcademicItem(Item):
+    __slots__ = ()
+    TYPE = "academic"
+
+    def links(self) -> List[Dict[str, str]]:
+        identifier = self.identifier
+        return _link("record", identifier if identifier and identifier.startswith(("http://", "https://")) else None)
+
+
+class AnnouncementItem(Item):
+    __slots__ = ("url", "date")
+    TYPE = "announcement"
+    FIELDS = Item.FIELDS + __slots__
+    EXTRA = ("date",)
+
+    def links(self) -> List[Dict[str, str]]:
+        return _link("page", self.url)
+
+
+class StaffItem(Item):
+    __slots__ = ("role", "unit", "email", "phone")
+    TYPE = "staff"
+    FIELDS = Item.FIELDS + __slots__
+    EXTRA = __slots__
+    INTERNED = ("role", "unit")
+
+    def links(self) -> List[Dict[str, str]]:
+        return _link("email", f"mailto:{self.email}" if self.email else None)
+
+
+class ContactItem(Item):
+    __slots__ = ("address", "phone", "email", "working_hours")
+    TYPE = "contact"
+    FIELDS = Item.FIELDS + __slots__
+    EXTRA = __slots__
+    INTERNED = ()
+
+    def links(self) -> List[Dict[str, str]]:
+        return _link("email", f"mailto:{self.email}" if self.email else None)
+
+
+ITEM_TYPES = {cls.TYPE: cls for cls in (CatalogItem, AcademicItem, AnnouncementItem, StaffItem, ContactItem)}
+
+
+def _link(rel: str, href: Optional[str]) -> List[Dict[str, str]]:
+    return [{"rel": rel, "href": href}] if href else []
+
+
+def catalog_item(record: Dict) -> CatalogItem:
+    """A catalog record (live search or mirror) as a result item."""
+    return CatalogItem(
+        _value(record.get("title")), _value(record.get("author")), _value(record.get("year")),
+        _value(record.get("record_id")), _value(record.get("call_number")), _value(record.get("availability"))
+    )
+
+
+def academic_item(record: Dict) -> AcademicItem:
+    """An OAI-PMH record as a result item; the year is taken from its date."""
+    date = _value(record.get("date"))
+    year = _YEAR.search(date) if date else None
+    return AcademicItem(
+        _value(record.get("title")), _value(record.get("creator")), year.group(1) if year else date,
+        _value(record.get("identifier"))
+    )
+
+
+def announcement_item(announcement: Dict) -> AnnouncementItem:
+    return AnnouncementItem(
+        _value(announcement.get("title")), url=announcement.get("url") or None, date=_value(announcement.get("date"))
+    )
+
+
+def staff_item(person: Dict) -> StaffItem:
+    return StaffItem(
+        _value(person.get("name")),
+        role=_value(person.get("title")), unit=_value(person.get("unit")),
+        email=_value(person.get("email")), phone=_value(person.get("phone"))
+    )
+
+
+def contact_item(contact: Dict) -> ContactItem:
+    phone = contact.get("phone") or []
+    return ContactItem(
+        address=_value(contact.get("address")),
+        phone=[p for p in (phone if isinstance(phone, list) else [phone]) if p],
+        email=_value(contact.get("email")), working_hours=_value(contact.get("working_hours"))
+    )
+
+
+def pack_items(items: List[Item]) -> List[List[Any]]:
+    """Items as JSON rows, for TTLCache's shared state (see unpack_items)."""
+    return [item.to_row() for item in items]
+
+
+def unpack_items(rows: List[List[Any]]) -> List[Item]:
+    return [ITEM_TYPES[row[0]](*row[1:]) for row in rows]
+
+
+def answer(source: str, items: List[Item]) -> Optional[Dict[str, Any]]:
+    """A backend answer, or None when there is nothing to show (so the next source is tried)."""
+    if not items:
+        return None
+    return {"source": source, "items": items, "text": None}
+
+
+def text_answer(source: str, text: str) -> Dict[str, Any]:
+    """A free-text answer (ChatGPT, semantic cache, error message)."""
+    return {"source": source, "items": [], "text": text}
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, Item):
+        return value.to_dict()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> str:
+    """JSON for answers, stream events and search pages; items are serialized as schema dicts."""
+    return json.dumps(value, ensure_ascii=False, default=_encode)
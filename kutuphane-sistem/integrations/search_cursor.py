@@ -0,0 +1,139 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import os
+import uuid
+import weakref
+import logging
+from dotenv import load_dotenv
+from .cache import TTLCache
+from .results import Item, pack_items, unpack_items
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "10"))
+SEARCH_MAX_PAGE_SIZE = int(os.getenv("SEARCH_MAX_PAGE_SIZE", "50"))
+# Results fetched per backend call; later pages inside this window cost only a cursor lookup
+SEARCH_PREFETCH = int(os.getenv("SEARCH_PREFETCH", "50"))
+# Deepest result a cursor will page to
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "500"))
+# Seconds a cursor stays usable after its last page
+SEARCH_CURSOR_TTL = float(os.getenv("SEARCH_CURSOR_TTL", "600"))
+
+# (query, offset, limit) -> (items, total hit count if the backend knows it)
+PageFetcher = Callable[[str, int, int], Awaitable[Tuple[List[Item], Optional[int]]]]
+
+
+def _encode_state(state: Dict) -> Dict:
+    return {**state, "items": pack_items(state["items"])}
+
+
+def _decode_state(state: Dict) -> Dict:
+    return {**state, "items": unpack_items(state["items"])}
+
+
+class CursorExpired(Exception):
+    """The cursor is unknown or its state has expired; the search must be started again."""
+
+
+class SearchCursors:
+    """
+    Server-side cursors for paging through catalog and academic results.
+
+    A new search fetches SEARCH_PREFETCH results from the backend and keeps
+    them under a random cursor ID for SEARCH_CURSOR_TTL seconds. Page tokens
+    are "<id>.<offset>.<limit>", so later pages (and going back) are sliced
+    from the saved results. The backend is asked again only when a page
+    reaches past what was fetched. Cursor state lives in a shared TTLCache,
+    so with several workers any of them can serve the next page.
+
+    Requests for the same cursor are serialized per process, so concurrent
+    pages never fetch the same range twice. Each page writes back a new copy
+    of the state; the cached one is never modified in place.
+    """
+
+    def __init__(self, fetchers: Dict[str, PageFetcher], cache: Optional[TTLCache] = None):
+        self.fetchers = fetchers
+        # Not `cache or ...`: an empty TTLCache is falsy
+        self.cache = cache if cache is not None else TTLCache(
+            "search_cursor", maxsize=int(os.getenv("SEARCH_CURSOR_CACHE_SIZE", "2000")),
+            ttl=SEARCH_CURSOR_TTL, stale_ttl=0, negative_ttl=SEARCH_CURSOR_TTL, shared=True,
+            encode=_encode_state, decode=_decode_state
+        )
+        # cursor ID -> asyncio.Lock, dropped once no request holds it
+        self._locks = weakref.WeakValueDictionary()
+
+    def _lock(self, cursor_id: str) -> asyncio.Lock:
+        lock = self._locks.get(cursor_id)
+        if lock is None:
+            lock = self._locks[cursor_id] = asyncio.Lock()
+        return lock
+
+    async def search(self, source: str, query: str, limit: int = SEARCH_PAGE_SIZE) -> Dict[str, Any]:
+        """
+        Starts a search and returns its first page.
+
+        Args:
+            source (str): "catalog" or "academic"
+            query (str): Search query
+            limit (int): Page size, capped at SEARCH_MAX_PAGE_SIZE
+
+        Returns:
+            Dict[str, Any]: The page (see _page)
+        """
+        if source not in self.fetchers:
+            raise ValueError(f"Unknown search source {source!r}")
+        state = {"source": source, "query": query, "items": [], "total": None, "exhausted": False}
+        return await self._page(uuid.uuid4().hex[:16], state, 0, self._clamp(limit))
+
+    async def page(self, cursor: str) -> Dict[str, Any]:
+        """Returns the page a token from next_cursor/prev_cursor points at."""
+        try:
+            cursor_id, offset, limit = cursor.split(".")
+            offset, limit = int(offset), self._clamp(int(limit))
+        except ValueError:
+            raise CursorExpired(cursor)
+        async with self._lock(cursor_id):
+            # Read under the lock, so a page waiting here sees what the previous one fetched
+            state = await self.cache.get_async(cursor_id)
+            if state is None:
+                raise CursorExpired(cursor)
+            return await self._page(cursor_id, state, max(offset, 0), limit)
+
+    def _clamp(self, limit: int) -> int:
+        return max(1, min(limit, SEARCH_MAX_PAGE_SIZE))
+
+    async def _page(self, cursor_id: str, state: Dict, offset: int, limit: int) -> Dict[str, Any]:
+        items: List[Item] = list(state["items"])
+        state = {**state, "items": items}
+        wanted = min(offset + limit, SEARCH_MAX_RESULTS)
+        fetched = False
+        while len(items) < wanted and not state["exhausted"]:
+            size = max(SEARCH_PREFETCH, wanted - len(items))
+            batch, total = await self.fetchers[state["source"]](state["query"], len(items), size)
+            items.extend(batch)
+            if total is not None:
+                state["total"] = total
+            state["exhausted"] = (len(batch) < size or len(items) >= SEARCH_MAX_RESULTS
+                                  or (state["total"] is not None and len(items) >= state["total"]))
+            fetched = True
+        # Rewritten on every page so the TTL counts from the last use
+        await self.cache.set_async(cursor_id, state)
+        if fetched:
+            logger.debug("Search cursor %s holds %d %s results", cursor_id, len(items), state["source"])
+
+        page_items = items[offset:offset + limit]
+        has_more = offset + limit < len(items) or (not state["exhausted"] and offset + limit < SEARCH_MAX_RESULTS)
+        total = state["total"] if state["total"] is not None else (len(items) if state["exhausted"] else None)
+        return {
+            "source": state["source"],
+            "query": state["query"],
+            "offset": offset,
+            "limit": limit,
+            "total": total,
+            "items": page_items,
+            "next_cursor": f"{cursor_id}.{offset + limit}.{limit}" if has_more and page_items else None,
+            "prev_cursor": f"{cursor_id}.{max(offset - limit, 0)}.{limit}" if offset > 0 else None,
+        }
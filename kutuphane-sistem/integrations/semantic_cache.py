@@ -0,0 +1,299 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+from collections import OrderedDict
+import math
+import os
+import random
+import re
+import threading
+import time
+import zlib
+import logging
+from dotenv import load_dotenv
+from .text_index import turkish_casefold
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+# Calibrated for HashingEmbedder: paraphrases such as "kütüphane kaçta kapanıyor" /
+# "kütüphane saat kaçta kapanır" score 0.87-1.0, different questions sharing most
+# words ("kaçta kapanıyor" / "kaçta açılıyor") 0.7 or less. Tune it for SEMANTIC_CACHE_MODEL
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "2000"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "86400"))
+# Optional sentence-transformers model name, e.g. "paraphrase-multilingual-MiniLM-L12-v2"
+SEMANTIC_CACHE_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "").strip()
+
+# Sparse vector: feature index -> weight, L2-normalized
+Vector = Dict[int, float]
+Embedder = Callable[[str], Union[Vector, Sequence[float]]]
+
+
+_WORD_RE = re.compile(r"\w+")
+
+# Question filler that does not change what is asked (already folded)
+_FILLER_WORDS = {
+    "saat", "ne", "kadar", "zaman", "mi", "mu", "midir", "mudur", "nedir", "acaba", "lutfen",
+    "bana", "bir", "ve", "ile", "de", "da", "ki", "su", "bu"
+}
+
+
+class HashingEmbedder:
+    """
+    Dependency-free embedder over Turkish-folded words. Each word contributes
+    its first PREFIX letters (a cheap Turkish stem: "kapanıyor" and "kapanır"
+    meet, "açılıyor" does not) with a high weight, plus hashed character
+    trigrams for typos. Question filler ("saat", "ne kadar") is skipped. It
+    catches rephrasings that differ in case, punctuation, suffixes, filler or
+    word order; it does not know synonyms, for those configure SEMANTIC_CACHE_MODEL.
+    """
+
+    PREFIX = 5
+    PREFIX_WEIGHT = 3.0
+    TRIGRAM_WEIGHT = 0.5
+
+    def __init__(self, dim: int = 4096):
+        self.dim = dim
+
+    def __call__(self, text: str) -> Vector:
+        vector: Vector = {}
+        for token in _WORD_RE.findall(turkish_casefold(text)):
+            if token in _FILLER_WORDS:
+                continue
+            feature = zlib.crc32(f"p:{token[:self.PREFIX]}".encode()) % self.dim
+            vector[feature] = vector.get(feature, 0.0) + self.PREFIX_WEIGHT
+            padded = f" {token} "
+            for i in range(len(padded) - 2):
+                feature = zlib.crc32(padded[i:i + 3].encode()) % self.dim
+                vector[feature] = vector.get(feature, 0.0) + self.TRIGRAM_WEIGHT
+        return vector
+
+
+class SentenceTransformerEmbedder:
+    """Dense multilingual embeddings; needs the optional sentence-transformers package."""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+
+    def __call__(self, text: str) -> Sequence[float]:
+        return self.model.encode(text).tolist()
+
+
+def _normalize(vector: Union[Vector, Sequence[float]]) -> Vector:
+    if not isinstance(vector, dict):
+        vector = {i: float(value) for i, value in enumerate(vector) if value}
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    return {i: value / norm for i, value in vector.items()} if norm else {}
+
+
+def _cosine(a: Vector, b: Vector) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(i, 0.0) for i, value in a.items())
+
+
+class SparseIndex:
+    """
+    Inverted index over the features of sparse vectors. Candidates are the
+    entries sharing one of the query's heaviest features (at least half its
+    largest weight; for HashingEmbedder, its word prefixes), which any close
+    match shares. Their dot products are summed from the posting lists, so
+    the scores are exact cosines, and no other entry is touched.
+    """
+
+    def __init__(self):
+        self._postings: Dict[int, Dict[str, float]] = {}
+        self._vectors: Dict[str, Vector] = {}
+
+    def add(self, key: str, vector: Vector):
+        self.remove(key)
+        self._vectors[key] = vector
+        for feature, value in vector.items():
+            self._postings.setdefault(feature, {})[key] = value
+
+    def remove(self, key: str):
+        vector = self._vectors.pop(key, None)
+        if vector is None:
+            return
+        for feature in vector:
+            postings = self._postings[feature]
+            del postings[key]
+            if not postings:
+                del self._postings[feature]
+
+    def scores(self, vector: Vector) -> Dict[str, float]:
+        """Cosine similarity of every candidate entry for `vector`."""
+        if not vector:
+            return {}
+        heavy = max(vector.values()) / 2
+        scores: Dict[str, float] = {}
+        light = []
+        for feature, value in vector.items():
+            if value < heavy:
+                light.append((feature, value))
+                continue
+            for key, stored in self._postings.get(feature, {}).items():
+                scores[key] = scores.get(key, 0.0) + value * stored
+        # The other features only add to the candidates' dot products
+        for feature, value in light:
+            postings = self._postings.get(feature)
+            if postings:
+                for key in scores.keys() & postings.keys():
+                    scores[key] += value * postings[key]
+        return scores
+
+
+class LSHIndex:
+    """
+    Random-hyperplane LSH for dense vectors (SEMANTIC_CACHE_MODEL). Each of
+    `tables` hash tables keys an entry by the signs of its projections on
+    `bits` random hyperplanes; close vectors agree on most signs, so a query
+    only scores (exactly) the entries sharing a bucket with it in some table.
+    """
+
+    def __init__(self, tables: int = 12, bits: int = 8, seed: int = 0):
+        self.tables = tables
+        self.bits = bits
+        self._random = random.Random(seed)
+        # One hyperplane per (table, bit), grown to the vector dimension on demand
+        self._planes: List[List[float]] = [[] for _ in range(tables * bits)]
+        self._buckets: List[Dict[int, set]] = [{} for _ in range(tables)]
+        self._vectors: Dict[str, Vector] = {}
+        self._signatures: Dict[str, List[int]] = {}
+
+    def _signature(self, vector: Vector) -> List[int]:
+        dim = max(vector) + 1 if vector else 0
+        for plane in self._planes:
+            while len(plane) < dim:
+                plane.append(self._random.gauss(0.0, 1.0))
+        signature = []
+        for table in range(self.tables):
+            bucket = 0
+            for plane in self._planes[table * self.bits:(table + 1) * self.bits]:
+                bucket = bucket << 1 | (sum(value * plane[i] for i, value in vector.items()) >= 0)
+            signature.append(bucket)
+        return signature
+
+    def add(self, key: str, vector: Vector):
+        self.remove(key)
+        signature = self._signature(vector)
+        self._vectors[key] = vector
+        self._signatures[key] = signature
+        for table, bucket in enumerate(signature):
+            self._buckets[table].setdefault(bucket, set()).add(key)
+
+    def remove(self, key: str):
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        del self._vectors[key]
+        for table, bucket in enumerate(signature):
+            keys = self._buckets[table][bucket]
+            keys.discard(key)
+            if not keys:
+                del self._buckets[table][bucket]
+
+    def scores(self, vector: Vector) -> Dict[str, float]:
+        """Cosine similarity of every entry sharing a bucket with `vector` in some table."""
+        candidates = set()
+        for table, bucket in enumerate(self._signature(vector)):
+            candidates.update(self._buckets[table].get(bucket, ()))
+        return {key: _cosine(vector, self._vectors[key]) for key in candidates}
+
+
+def default_embedder() -> Embedder:
+    """Uses SEMANTIC_CACHE_MODEL when set and installed, otherwise HashingEmbedder."""
+    if SEMANTIC_CACHE_MODEL:
+        try:
+            return SentenceTransformerEmbedder(SEMANTIC_CACHE_MODEL)
+        except Exception as e:
+            logger.error("Could not load embedding model %s: %s", SEMANTIC_CACHE_MODEL, e)
+    return HashingEmbedder()
+
+
+class SemanticCache:
+    """
+    Answer cache keyed by question meaning rather than exact text.
+
+    Each stored question is embedded once and added to a vector index
+    (SparseIndex for HashingEmbedder, LSHIndex for dense model embeddings).
+    A lookup embeds the new question, scores only the candidates the index
+    returns and serves the answer of the most similar one if the cosine
+    similarity reaches `threshold`. Entries expire after `ttl` seconds and the
+    least recently used ones are evicted beyond `maxsize`.
+    """
+
+    def __init__(self, embedder: Optional[Embedder] = None, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 maxsize: int = SEMANTIC_CACHE_SIZE, ttl: float = SEMANTIC_CACHE_TTL):
+        self.embedder = embedder or default_embedder()
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # question -> (answer, expires at), in LRU order
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._index: Optional[Union[SparseIndex, LSHIndex]] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _embed(self, text: str) -> Vector:
+        raw = self.embedder(text)
+        with self._lock:
+            if self._index is None:
+                # The first vector decides the index: sparse features or dense dimensions
+                self._index = SparseIndex() if isinstance(raw, dict) else LSHIndex()
+        return _normalize(raw)
+
+    def _remove(self, key: str):
+        del self._entries[key]
+        self._index.remove(key)
+
+    def lookup(self, question: str) -> Optional[str]:
+        """Returns the cached answer of the closest stored question, if close enough."""
+        vector = self._embed(question)
+        if not vector:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            scores = self._index.scores(vector)
+            for key in sorted(scores, key=scores.get, reverse=True):
+                if scores[key] < self.threshold:
+                    break
+                answer, expires = self._entries[key]
+                if expires <= now:
+                    self._remove(key)
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                logger.debug("Semantic cache hit (%.2f): %r ~ %r", scores[key], question, key)
+                return answer
+            self.misses += 1
+        return None
+
+    def store(self, question: str, answer: str):
+        vector = self._embed(question)
+        if not vector:
+            return
+        with self._lock:
+            self._entries[question] = (answer, time.monotonic() + self.ttl)
+            self._entries.move_to_end(question)
+            self._index.add(question, vector)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "name": "semantic",
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
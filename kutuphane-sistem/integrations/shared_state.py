@@ -0,0 +1,292 @@
+from typing import Any, Dict, Optional, Tuple
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# memory: state lives in the process (single worker, default)
+# sqlite: a local SQLite file shared by every worker on the host
+# redis: a Redis-compatible server (needs the optional redis package)
+SHARED_STATE_BACKEND = os.getenv("SHARED_STATE_BACKEND", "memory").lower()
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", "data/shared_state.sqlite3")
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", "redis://127.0.0.1:6379/0")
+SHARED_STATE_PREFIX = os.getenv("SHARED_STATE_PREFIX", "kutuphane:")
+# Seconds a worker stays leader without renewing; renewed every third of that
+LEADER_LEASE_TTL = float(os.getenv("LEADER_LEASE_TTL", "30"))
+# Seconds between follower reads of state published by the leader
+SHARED_STATE_POLL_INTERVAL = float(os.getenv("SHARED_STATE_POLL_INTERVAL", "30"))
+
+
+class MemoryState:
+    """
+    Process-local state. Every worker has its own copy, so `shared` is False
+    and callers skip their shared-state layer; locks always succeed.
+    """
+
+    shared = False
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Any, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires <= time.time():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def acquire_lock(self, name: str, owner: str, ttl: float) -> bool:
+        return True
+
+    def release_lock(self, name: str, owner: str):
+        pass
+
+
+class SQLiteState:
+    """
+    Key/value state in a SQLite file that all workers on the host open.
+
+    Values are stored as JSON with an optional expiry; expired rows are purged
+    every PURGE_EVERY writes. The connection is reopened after a fork, since
+    SQLite connections must not cross processes.
+    """
+
+    shared = True
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str = SHARED_STATE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)"
+            )
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value FROM state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO state (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, payload, now + ttl if ttl else None)
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                conn.execute("DELETE FROM state WHERE expires_at <= ?", (now,))
+
+    def delete(self, key: str):
+        with self._lock:
+            self._connection().execute("DELETE FROM state WHERE key = ?", (key,))
+
+    def acquire_lock(self, name: str, owner: str, ttl: float) -> bool:
+        """Takes the lock if it is free, expired or already ours (which renews it)."""
+        key = f"lock:{name}"
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT value, expires_at FROM state WHERE key = ?", (key,)).fetchone()
+                if row and json.loads(row[0]) != owner and row[1] > now:
+                    return False
+                conn.execute(
+                    "INSERT OR REPLACE INTO state (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(owner), now + ttl)
+                )
+                return True
+            finally:
+                conn.execute("COMMIT")
+
+    def release_lock(self, name: str, owner: str):
+        with self._lock:
+            self._connection().execute(
+                "DELETE FROM state WHERE key = ? AND value = ?", (f"lock:{name}", json.dumps(owner))
+            )
+
+
+class RedisState:
+    """
+    State in a Redis-compatible server (Redis, Valkey, KeyDB); needs the
+    optional redis package. Keys are namespaced with SHARED_STATE_PREFIX.
+    """
+
+    shared = True
+
+    _RENEW = ("if redis.call('get', KEYS[1]) == ARGV[1] then "
+              "return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end")
+    _RELEASE = ("if redis.call('get', KEYS[1]) == ARGV[1] then "
+                "return redis.call('del', KEYS[1]) else return 0 end")
+
+    def __init__(self, url: str = SHARED_STATE_URL, prefix: str = SHARED_STATE_PREFIX):
+        import redis
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2, decode_responses=True)
+        self._renew = self._client.register_script(self._RENEW)
+        self._release = self._client.register_script(self._RELEASE)
+
+    def get(self, key: str) -> Optional[Any]:
+        payload = self._client.get(self.prefix + key)
+        return json.loads(payload) if payload is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        payload = json.dumps(value, ensure_ascii=False)
+        self._client.set(self.prefix + key, payload, px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, key: str):
+        self._client.delete(self.prefix + key)
+
+    def acquire_lock(self, name: str, owner: str, ttl: float) -> bool:
+        key = f"{self.prefix}lock:{name}"
+        if self._client.set(key, owner, nx=True, px=int(ttl * 1000)):
+            return True
+        return bool(self._renew(keys=[key], args=[owner, int(ttl * 1000)]))
+
+    def release_lock(self, name: str, owner: str):
+        self._release(keys=[f"{self.prefix}lock:{name}"], args=[owner])
+
+
+def create_state(backend: str = SHARED_STATE_BACKEND):
+    """
+    Builds the configured backend. A Redis backend that cannot be created
+    (package missing) falls back to SQLite so workers still share state.
+    """
+    if backend == "redis":
+        try:
+            return RedisState()
+        except Exception as e:
+            logger.error("Could not create Redis shared state, using SQLite: %s", e)
+            backend = "sqlite"
+    if backend == "sqlite":
+        return SQLiteState()
+    if backend != "memory":
+        logger.error("Unknown SHARED_STATE_BACKEND %r, using memory", backend)
+    return MemoryState()
+
+
+class LeaderLease:
+    """
+    Elects one worker to run background jobs (harvesting, mirror sync,
+    website refresh, endpoint checks).
+
+    The lease is a lock in the shared state with a LEADER_LEASE_TTL expiry,
+    renewed by a daemon thread. Jobs check `is_leader` on every wake-up: the
+    leader does the upstream work and publishes results, followers read them.
+    If the leader dies, another worker takes over within one TTL. With the
+    memory backend every process is its own leader.
+    """
+
+    def __init__(self, state=None, name: str = "leader", ttl: float = LEADER_LEASE_TTL):
+        self.state = state or get_state()
+        self.name = name
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._leader = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader or not self.state.shared
+
+    def renew(self) -> bool:
+        try:
+            leader = self.state.acquire_lock(self.name, self.owner, self.ttl)
+        except Exception as e:
+            logger.error("Leader lease renewal failed: %s", e)
+            leader = False
+        if leader != self._leader:
+            logger.info("This worker is %s the background job leader", "now" if leader else "no longer")
+        self._leader = leader
+        return leader
+
+    def _run(self):
+        while not self._stop.wait(self.ttl / 3):
+            self.renew()
+
+    def start(self):
+        """Tries to take the lease right away, then keeps renewing it in a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self.renew()
+        self._thread = threading.Thread(target=self._run, name="leader-lease", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops renewing and hands the lease back so another worker can take over at once."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        if self._leader:
+            try:
+                self.state.release_lock(self.name, self.owner)
+            except Exception as e:
+                logger.error("Could not release leader lease: %s", e)
+            self._leader = False
+
+
+_state = None
+_leader: Optional[LeaderLease] = None
+_state_lock = threading.RLock()
+
+
+def get_state():
+    """Returns the process wide shared state backend."""
+    global _state
+    if _state is None:
+        with _state_lock:
+            if _state is None:
+                _state = create_state()
+    return _state
+
+
+def get_leader() -> LeaderLease:
+    """Returns the process wide leader lease."""
+    global _leader
+    if _leader is None:
+        with _state_lock:
+            if _leader is None:
+                _leader = LeaderLease(get_state())
+    return _leader
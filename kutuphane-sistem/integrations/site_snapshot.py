@@ -0,0 +1,173 @@
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+import asyncio
+import json
+import os
+import logging
+from dotenv import load_dotenv
+from .web_scraper import AsyncLibraryWebScraper
+from .results import Item, announcement_item, contact_item, staff_item
+from .shared_state import LeaderLease, SHARED_STATE_POLL_INTERVAL, get_leader
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Seconds between website refreshes; the content changes a few times a week
+SITE_REFRESH_INTERVAL = int(os.getenv("SITE_REFRESH_INTERVAL", "1800"))
+SITE_SNAPSHOT_PATH = os.getenv("SITE_SNAPSHOT_PATH", "data/site_snapshot.json")
+
+SECTIONS = ("announcements", "staff", "contact")
+
+# Section data -> result items
+ITEM_BUILDERS = {
+    "announcements": lambda announcements: [announcement_item(ann) for ann in announcements],
+    "staff": lambda staff: [staff_item(person) for person in staff],
+    "contact": lambda contact: [contact_item(contact)] if contact else [],
+}
+
+
+class SiteSnapshot:
+    """
+    In-memory snapshot of the library website's announcements, staff and
+    contact pages.
+
+    A background task refreshes the snapshot every SITE_REFRESH_INTERVAL
+    seconds; requests only read it and never trigger outbound HTTP. A section
+    is replaced only when the refresh returns data, so the last good copy keeps
+    being served while the site is down. The snapshot is also written to disk
+    and loaded on startup, so a restart during an outage still has content.
+    Result items for each section are built once per update (get_items), not
+    on every request.
+
+    With several workers only the leader scrapes; it publishes the snapshot in
+    the shared state and the other workers read it from there.
+    """
+
+    STATE_KEY = "site_snapshot"
+
+    def __init__(self, scraper: Optional[AsyncLibraryWebScraper] = None,
+                 interval: int = SITE_REFRESH_INTERVAL, path: Optional[str] = SITE_SNAPSHOT_PATH,
+                 leader: Optional[LeaderLease] = None):
+        self.scraper = scraper or AsyncLibraryWebScraper()
+        self.interval = interval
+        self.path = path
+        self.leader = leader or get_leader()
+        self._data: Dict[str, Any] = {"announcements": [], "staff": [], "contact": {}}
+        self._updated: Dict[str, Optional[str]] = {section: None for section in SECTIONS}
+        self._items: Dict[str, List[Item]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._load()
+
+    def get_announcements(self) -> List[Dict[str, str]]:
+        return self._data["announcements"]
+
+    def get_all_staff_details(self) -> List[Dict[str, str]]:
+        return self._data["staff"]
+
+    def get_contact_info(self) -> Dict[str, Any]:
+        return self._data["contact"]
+
+    def get_items(self, section: str) -> List[Item]:
+        """The section as result items; shared between answers, so callers must not modify the list."""
+        items = self._items.get(section)
+        if items is None:
+            items = self._items[section] = ITEM_BUILDERS[section](self._data[section])
+        return items
+
+    def status(self) -> Dict[str, Optional[str]]:
+        """Last successful update time per section."""
+        return dict(self._updated)
+
+    async def refresh(self):
+        """Scrapes all sections concurrently and keeps the last good copy of any that fail."""
+        results = await asyncio.gather(
+            self.scraper.get_announcements(),
+            self.scraper.get_all_staff_details(),
+            self.scraper.get_contact_info(),
+            return_exceptions=True
+        )
+        changed = False
+        now = datetime.now().isoformat(timespec="seconds")
+        for section, result in zip(SECTIONS, results):
+            if isinstance(result, Exception) or not result:
+                logger.warning("Website refresh failed for %s, keeping last snapshot", section)
+                continue
+            changed = changed or result != self._data[section]
+            self._data[section] = result
+            self._items.pop(section, None)
+            self._updated[section] = now
+        if changed:
+            self._save()
+        state = self.leader.state
+        if state.shared:
+            # SQLite and Redis calls block, keep them off the event loop
+            await asyncio.get_running_loop().run_in_executor(
+                None, state.set, self.STATE_KEY, {"data": self._data, "updated": dict(self._updated)}
+            )
+
+    async def _pull(self):
+        """Takes over the snapshot the leader published in the shared state."""
+        saved = await asyncio.get_running_loop().run_in_executor(None, self.leader.state.get, self.STATE_KEY)
+        if saved:
+            self._apply(saved)
+
+    async def _run(self):
+        while True:
+            leader = self.leader.is_leader
+            try:
+                if leader:
+                    await self.refresh()
+                else:
+                    await self._pull()
+            except Exception as e:
+                logger.error("Website snapshot refresh failed: %s", e)
+            await asyncio.sleep(self.interval if leader else min(self.interval, SHARED_STATE_POLL_INTERVAL))
+
+    def start(self):
+        """Starts the refresh loop on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._apply(json.load(f))
+            logger.info("Loaded website snapshot from %s", self.path)
+        except Exception as e:
+            logger.error("Could not load website snapshot: %s", e)
+
+    def _apply(self, saved: Dict[str, Any]):
+        for section in SECTIONS:
+            updated = saved.get("updated", {}).get(section)
+            if updated is not None and updated == self._updated[section]:
+                # Same update as the one already held; keep its built items
+                continue
+            if saved.get("data", {}).get(section):
+                self._data[section] = saved["data"][section]
+                self._items.pop(section, None)
+                self._updated[section] = updated
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"data": self._data, "updated": self._updated}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error("Could not save website snapshot: %s", e)
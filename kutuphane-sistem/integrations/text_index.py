@@ -0,0 +1,224 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from functools import lru_cache
+import heapq
+import math
+import re
+import threading
+import unicodedata
+
+# Turkish letters folded to their ASCII base so "zekâ", "ZEKA" and "zekası" meet
+_FOLD_TABLE = str.maketrans({
+    "ı": "i", "ş": "s", "ğ": "g", "ç": "c", "ö": "o", "ü": "u",
+    "â": "a", "î": "i", "û": "u"
+})
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Inflectional suffixes (already folded)
+_SUFFIXES = {
+    "lerinin", "larinin", "lerine", "larina", "lerini", "larini", "lerinde", "larinda",
+    "lerden", "lardan", "lerde", "larda", "leri", "lari", "ler", "lar",
+    "sinin", "sunun", "sini", "sunu", "sine", "suna", "inin", "unun",
+    "nin", "nun", "den", "dan", "ten", "tan", "dir", "dur", "tir", "tur",
+    "lik", "luk", "si", "su", "in", "un", "de", "da", "te", "ta", "i", "u", "e", "a"
+}
+_SUFFIX_LENGTHS = sorted({len(suffix) for suffix in _SUFFIXES}, reverse=True)
+
+_MIN_STEM = 4
+
+STOPWORDS = {
+    "ve", "ile", "bir", "bu", "su", "o", "da", "de", "icin", "gibi", "mi", "mu",
+    "ne", "nedir", "hakkinda", "konusunda", "uzerine", "ilgili", "kitap", "kitaplar",
+    "kaynak", "kaynaklar", "ariyorum", "istiyorum", "var", "mi", "hangi", "the", "of", "and"
+}
+
+
+def turkish_lower(text: str) -> str:
+    """Lowercases with Turkish I/İ rules ("I" -> "ı", "İ" -> "i")."""
+    return text.replace("I", "ı").replace("İ", "i").lower()
+
+
+def turkish_casefold(text: str) -> str:
+    """Lowercases with Turkish I/İ rules and folds diacritics."""
+    text = turkish_lower(text).translate(_FOLD_TABLE)
+    if text.isascii():
+        return text
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+@lru_cache(maxsize=65536)
+def stem(token: str) -> str:
+    """Strips up to two inflectional suffixes (longest first), keeping at least four characters."""
+    for _ in range(2):
+        for length in _SUFFIX_LENGTHS:
+            if len(token) - length >= _MIN_STEM and token[-length:] in _SUFFIXES:
+                token = token[:-length]
+                break
+        else:
+            break
+    return token
+
+
+def tokenize(text: str, keep_stopwords: bool = False) -> List[str]:
+    """Splits text into folded, stemmed terms."""
+    if not text:
+        return []
+    terms = []
+    for token in _TOKEN_RE.findall(turkish_casefold(text)):
+        if not keep_stopwords and token in STOPWORDS:
+            continue
+        terms.append(stem(token))
+    return terms
+
+
+class InvertedIndex:
+    """
+    In-memory inverted index with BM25 ranking.
+
+    Documents are added with named fields; each field has a weight that scales
+    its term frequencies, so a title hit outranks a description hit.
+    """
+
+    def __init__(self, field_weights: Optional[Dict[str, float]] = None, k1: float = 1.2, b: float = 0.75):
+        self.field_weights = field_weights or {"title": 3.0, "creator": 2.0, "subject": 2.0, "description": 1.0}
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._doc_terms: Dict[int, Tuple[str, ...]] = {}
+        self._doc_len: Dict[int, float] = {}
+        self._keys: Dict[int, str] = {}
+        self._ids: Dict[str, int] = {}
+        self._next_id = 0
+        self._total_len = 0.0
+        self._ranked_cache: Dict[str, Tuple[List[Tuple[float, int]], Dict[int, float]]] = {}
+        self._cache_avgdl = 0.0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def add(self, key: str, fields: Dict[str, str]):
+        """Indexes a document, replacing any previous version with the same key."""
+        weighted: Dict[str, float] = {}
+        for field, weight in self.field_weights.items():
+            for term in tokenize(fields.get(field) or ""):
+                weighted[term] = weighted.get(term, 0.0) + weight
+        with self._lock:
+            self.remove(key)
+            doc_id = self._next_id
+            self._next_id += 1
+            self._ids[key] = doc_id
+            self._keys[doc_id] = key
+            for term, tf in weighted.items():
+                self._postings.setdefault(term, {})[doc_id] = tf
+                self._ranked_cache.pop(term, None)
+            self._doc_terms[doc_id] = tuple(weighted)
+            length = sum(weighted.values())
+            self._doc_len[doc_id] = length
+            self._total_len += length
+
+    def add_many(self, documents: Iterable[Tuple[str, Dict[str, str]]]):
+        for key, fields in documents:
+            self.add(key, fields)
+
+    def remove(self, key: str):
+        with self._lock:
+            doc_id = self._ids.pop(key, None)
+            if doc_id is None:
+                return
+            del self._keys[doc_id]
+            for term in self._doc_terms.pop(doc_id):
+                postings = self._postings[term]
+                del postings[doc_id]
+                self._ranked_cache.pop(term, None)
+                if not postings:
+                    del self._postings[term]
+            self._total_len -= self._doc_len.pop(doc_id)
+
+    def search(self, query: str, k: int = 5, min_match: float = 0.6) -> List[Tuple[str, float]]:
+        """
+        Ranks documents against the query with BM25.
+
+        Args:
+            query (str): Free text query
+            k (int): Number of results to return
+            min_match (float): Fraction of query terms a document must contain
+
+        Returns:
+            List[Tuple[str, float]]: (document key, score) pairs, best first
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if not n_docs:
+                return []
+            lists = [(self._idf(term, n_docs), *self._ranked(term)) for term in terms if term in self._postings]
+            required = max(1, math.ceil(len(terms) * min_match))
+            if len(lists) < required:
+                return []
+
+            # Threshold algorithm: walk every ranked list in impact order, score each
+            # newly seen document by random access, and stop once no unseen document
+            # can beat the current k-th best.
+            heap: List[Tuple[float, int]] = []
+            seen = set()
+            depth = 0
+            longest = max(len(ranked) for _, ranked, _ in lists)
+            while depth < longest:
+                threshold = 0.0
+                for idf, ranked, _ in lists:
+                    if depth >= len(ranked):
+                        continue
+                    impact, doc_id = ranked[depth]
+                    threshold += idf * impact
+                    if doc_id in seen:
+                        continue
+                    seen.add(doc_id)
+                    total, hits = 0.0, 0
+                    for term_idf, _, impacts in lists:
+                        value = impacts.get(doc_id)
+                        if value is not None:
+                            total += term_idf * value
+                            hits += 1
+                    if hits < required:
+                        continue
+                    if len(heap) < k:
+                        heapq.heappush(heap, (total, doc_id))
+                    elif total > heap[0][0]:
+                        heapq.heapreplace(heap, (total, doc_id))
+                if len(heap) >= k and heap[0][0] >= threshold:
+                    break
+                depth += 1
+
+            return [(self._keys[doc_id], score) for score, doc_id in sorted(heap, reverse=True)]
+
+    def _idf(self, term: str, n_docs: int) -> float:
+        """BM25 idf of a term for the current document count; cheap, so never cached."""
+        df = len(self._postings[term])
+        return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+    def _ranked(self, term: str) -> Tuple[List[Tuple[float, int]], Dict[int, float]]:
+        """
+        Returns the term's postings as BM25 term-frequency weights, sorted best
+        first (cached). A document's impact is the term's idf times its weight.
+        idf scales a whole list alike, so it is applied per search instead of
+        being cached: it changes for every term whenever a document is added.
+        """
+        avgdl = self._total_len / len(self._doc_len)
+        if abs(avgdl - self._cache_avgdl) > 0.1 * self._cache_avgdl:
+            # Document lengths drifted enough to change the ranking; recompute lazily
+            self._ranked_cache.clear()
+            self._cache_avgdl = avgdl
+        cached = self._ranked_cache.get(term)
+        if cached is None:
+            k1, b, avgdl = self.k1, self.b, self._cache_avgdl
+            impacts = {
+                doc_id: tf * (k1 + 1) / (tf + k1 * (1 - b + b * self._doc_len[doc_id] / avgdl))
+                for doc_id, tf in self._postings[term].items()
+            }
+            ranked = sorted(((value, doc_id) for doc_id, value in impacts.items()), reverse=True)
+            cached = self._ranked_cache[term] = (ranked, impacts)
+        return cached
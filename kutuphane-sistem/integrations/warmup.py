@@ -0,0 +1,126 @@
+from typing import Any, Dict, Optional
+from datetime import datetime
+import asyncio
+import os
+import time
+import logging
+from dotenv import load_dotenv
+from .query_log import QueryLog
+from .shared_state import LeaderLease, get_leader
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+# Most frequent queries replayed per warm-up
+WARMUP_TOP_N = int(os.getenv("WARMUP_TOP_N", "50"))
+# Seconds of query log history the top queries are taken from (default 7 days)
+WARMUP_WINDOW = float(os.getenv("WARMUP_WINDOW", "604800"))
+# Seconds between warm-ups; with CATALOG_CACHE_TTL or less the top queries never go cold
+WARMUP_INTERVAL = float(os.getenv("WARMUP_INTERVAL", "600"))
+# Longest startup waits for the first warm-up before serving requests
+WARMUP_STARTUP_TIMEOUT = float(os.getenv("WARMUP_STARTUP_TIMEOUT", "30"))
+# Seconds between query log flushes
+QUERY_LOG_FLUSH_INTERVAL = float(os.getenv("QUERY_LOG_FLUSH_INTERVAL", "60"))
+
+
+class CacheWarmer:
+    """
+    Replays the most frequent recent queries through the catalog, academic
+    and website paths so their caches are filled before users ask.
+
+    start() runs one warm-up (bounded by WARMUP_STARTUP_TIMEOUT) before the
+    app starts serving, then a background task flushes the query log every
+    QUERY_LOG_FLUSH_INTERVAL seconds and warms again every WARMUP_INTERVAL.
+    Replays skip ChatGPT and are not recorded in the query log or answer
+    metrics. With several workers only the leader warms; the catalog cache
+    is shared, so the others get its results too.
+    """
+
+    def __init__(self, query_service, query_log: QueryLog, leader: Optional[LeaderLease] = None,
+                 interval: float = WARMUP_INTERVAL, enabled: bool = WARMUP_ENABLED):
+        self.query_service = query_service
+        self.query_log = query_log
+        self.leader = leader or get_leader()
+        self.interval = interval
+        self.enabled = enabled
+        self._task: Optional[asyncio.Task] = None
+        self._warming: Optional[asyncio.Task] = None
+        self._last_run: Optional[float] = None
+        self._last: Dict[str, Any] = {"finished": None, "queries": 0, "answered": 0, "seconds": None}
+
+    async def warm(self) -> int:
+        """
+        Replays the top WARMUP_TOP_N queries of the last WARMUP_WINDOW seconds.
+
+        Returns:
+            int: Number of queries a backend answered
+        """
+        self._last_run = time.monotonic()
+        loop = asyncio.get_running_loop()
+        queries = await loop.run_in_executor(None, self.query_log.top, WARMUP_TOP_N, WARMUP_WINDOW)
+        if not queries:
+            return 0
+        start = time.perf_counter()
+        answered = await self.query_service.warm(queries)
+        elapsed = time.perf_counter() - start
+        self._last = {
+            "finished": datetime.now().isoformat(timespec="seconds"),
+            "queries": len(queries),
+            "answered": answered,
+            "seconds": round(elapsed, 3),
+        }
+        logger.info("Cache warm-up: %d queries replayed, %d answered by a backend, %.1fs",
+                    len(queries), answered, elapsed)
+        return answered
+
+    async def _warm_safely(self):
+        try:
+            await self.warm()
+        except Exception as e:
+            logger.error("Cache warm-up failed: %s", e)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(min(QUERY_LOG_FLUSH_INTERVAL, self.interval))
+            try:
+                await loop.run_in_executor(None, self.query_log.flush)
+            except Exception as e:
+                logger.error("Query log flush failed: %s", e)
+            due = self._last_run is None or time.monotonic() - self._last_run >= self.interval
+            if self.enabled and due and self.leader.is_leader and (self._warming is None or self._warming.done()):
+                self._warming = asyncio.ensure_future(self._warm_safely())
+                await self._warming
+
+    async def start(self):
+        """Warms the caches once, then keeps flushing and warming on the running event loop."""
+        if self._task is not None and not self._task.done():
+            return
+        if self.enabled and self.leader.is_leader:
+            self._warming = asyncio.ensure_future(self._warm_safely())
+            try:
+                # Shielded: a slow warm-up keeps going after startup stops waiting for it
+                await asyncio.wait_for(asyncio.shield(self._warming), WARMUP_STARTUP_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning("Cache warm-up did not finish within %.0fs, continuing in the background",
+                               WARMUP_STARTUP_TIMEOUT)
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """Stops the tasks and writes the counts recorded since the last flush."""
+        for task in (self._task, self._warming):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._warming = None
+        self.query_log.close()
+
+    def status(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "leader": self.leader.is_leader, "interval": self.interval, **self._last}
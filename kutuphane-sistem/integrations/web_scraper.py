@@ -1,52 +1,228 @@
-import requests
 from bs4 import BeautifulSoup
 import logging
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import re
 from dotenv import load_dotenv
 import os
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
+import asyncio
+import functools
+import time
+from .http_client import get_async_client
+from .resilience import get_breaker
+from .metrics import SCRAPER_PARSES
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
-class LibraryWebScraper:
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
+}
+
+# Staff profile crawling
+STAFF_CRAWL_CONCURRENCY = int(os.getenv("STAFF_CRAWL_CONCURRENCY", "8"))
+STAFF_CRAWL_PER_HOST = int(os.getenv("STAFF_CRAWL_PER_HOST", "4"))
+STAFF_PAGE_TIMEOUT = float(os.getenv("STAFF_PAGE_TIMEOUT", "10"))
+# Profiles fetched more recently than this are reused without a request
+STAFF_PROFILE_TTL = int(os.getenv("STAFF_PROFILE_TTL", "86400"))
+
+PERS_ID_RE = re.compile(r'pers_id=(\d+)')
+PHONE_RE = re.compile(r"\+90\s*\d{3}\s*\d{3}\s*\d{4}")
+
+# Shared by the sync and async scrapers: both talk to the same site
+website_breaker = get_breaker("website", timeout=10)
+
+@functools.lru_cache(maxsize=4096)
+def _absolute_url(base: str, href: str) -> str:
+    """urljoin, memoized: a crawl sees the same profile and announcement links every time."""
+    return urljoin(base, href)
+
+
+def _has_class(name: str) -> str:
+    """XPath test matching BeautifulSoup's class_=name (one of the element's classes)."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+class LxmlExtractor:
+    """
+    Fast path for the pages the scraper reads: lxml's C parser with the
+    XPath expressions compiled once. Text is joined like BeautifulSoup's
+    get_text(strip=True), so both paths return the same values. A method
+    returns None when the page lacks the expected structure, letting the
+    caller fall back to BeautifulSoup.
+    """
+
+    def __init__(self, base_url: str):
+        from lxml import etree, html
+        self.base_url = base_url
+        self._fromstring = html.fromstring
+        self._staff_hrefs = etree.XPath("//a[contains(@href, 'pers_id=')]/@href")
+        self._form_rows = etree.XPath(f"(//div[{_has_class('form')}])[1]/descendant::table[1]//tr")
+        self._cells = etree.XPath(".//td")
+        self._first_href = etree.XPath("(.//a[@href])[1]/@href")
+        self._profile_labels = etree.XPath(f"//div[{_has_class('pLabel')}]")
+        self._profile_value = etree.XPath(f"following-sibling::div[{_has_class('pValue')}][1]")
+        self._announcement_rows = etree.XPath("(//table)[1]//tr")
+        self._first_link = etree.XPath("(.//a)[1]")
+        self._contact_block = etree.XPath("(//div[normalize-space(@class) = 'dinamic-content text-left'])[1]")
+        self._first_strong = etree.XPath("(.//strong)[1]")
+        self._first_span = etree.XPath("(.//span)[1]")
+        self._image_alts = etree.XPath(".//img/@alt")
+        self._mailto = etree.XPath("(.//a[contains(@href, 'mailto:')])[1]/@href")
+
+    @staticmethod
+    def _text(element) -> str:
+        return "".join(part.strip() for part in element.itertext())
+
+    def staff_links(self, html: str) -> Optional[List[str]]:
+        links = {}
+        for href in self._staff_hrefs(self._fromstring(html)):
+            if PERS_ID_RE.search(href):
+                links[href if href.startswith('http') else _absolute_url(self.base_url, href)] = None
+        return list(links)
+
+    def staff_details(self, html: str) -> Optional[Dict[str, str]]:
+        doc = self._fromstring(html)
+        rows = self._form_rows(doc)
+        labels = self._profile_labels(doc)
+        if not rows and not labels:
+            return None
+        details = dict.fromkeys(('name', 'title', 'unit', 'phone', 'internal_phone', 'email'), '')
+        for tr in rows:
+            cols = self._cells(tr)
+            if len(cols) < 2:
+                continue
+            key = self._text(cols[0]).rstrip(':')
+            val = self._text(cols[1])
+            if key == 'Adı Soyadı':
+                details['name'] = val
+            elif key == 'Ünvanı':
+                details['title'] = val
+            elif key == 'Birimi':
+                details['unit'] = val
+            elif key in ('İş Telefonu', 'Telefon'):
+                details['phone'] = val
+            elif key in ('Dahili Telefon', 'Dahili'):
+                details['internal_phone'] = val
+            elif 'E-posta' in key:
+                href = self._first_href(cols[1])
+                if href and 'mailto:' in href[0]:
+                    details['email'] = href[0].replace('mailto:', '').strip()
+                else:
+                    details['email'] = val
+        if not details['name']:
+            for label in labels:
+                text = self._text(label).lower()
+                value = self._profile_value(label)
+                val = self._text(value[0]) if value else ''
+                if 'ünvan' in text:
+                    details['title'] = val
+                elif 'telefon' in text:
+                    details['phone'] = val
+                elif 'e-posta' in text:
+                    details['email'] = val
+                elif 'oda no' in text:
+                    details['internal_phone'] = val
+        return details
+
+    def announcements(self, html: str) -> Optional[List[Dict[str, str]]]:
+        rows = self._announcement_rows(self._fromstring(html))
+        if not rows:
+            return None
+        announcements = []
+        for row in rows[1:6]:
+            cols = self._cells(row)
+            if len(cols) >= 3:
+                link = self._first_link(cols[2])
+                href = link[0].get('href') if link else None
+                announcements.append({
+                    'title': self._text(link[0]) if link else self._text(cols[2]),
+                    'date': self._text(cols[1]),
+                    'url': _absolute_url(self.base_url, href) if href is not None else ''
+                })
+        return announcements
+
+    def contact_info(self, html: str) -> Optional[Dict[str, Any]]:
+        content = self._contact_block(self._fromstring(html))
+        if not content:
+            return None
+        content = content[0]
+        contact = {'address': '', 'phone': [], 'email': ''}
+        strong = self._first_strong(content)
+        if strong:
+            span = self._first_span(strong[0])
+            contact['address'] = self._text(span[0] if span else strong[0])
+        contact['phone'] = [
+            alt.strip() for alt in self._image_alts(content)
+            if PHONE_RE.match(alt.strip())
+        ]
+        mailto = self._mailto(content)
+        if mailto:
+            contact['email'] = mailto[0].replace('mailto:', '').strip()
+        return contact
+
+
+class BaseLibraryWebScraper:
+    """
+    URLs and HTML extraction for the library website scraper.
+
+    Pages are parsed with LxmlExtractor; BeautifulSoup's html.parser is used
+    only when lxml is missing, raises, or does not find the expected
+    structure (e.g. after a site redesign).
+    """
+
     def __init__(self):
         self.base_url = os.getenv("LIBRARY_WEBSITE_URL", "https://batman.edu.tr/Birimler/kutuphane")
         self.announcements_url = f"{self.base_url}/tum-duyurular"
         self.staff_url = f"{self.base_url}/idari-kadro"
         self.contact_url = os.getenv("CONTACT_PAGE_URL", f"{self.base_url}/sayfalar/17995")
+        try:
+            self._fast: Optional[LxmlExtractor] = LxmlExtractor(self.base_url)
+        except ImportError:
+            logger.warning("lxml not installed, website pages are parsed with BeautifulSoup")
+            self._fast = None
 
-        logger.info(f"Initialized web scraper with base URL: {self.base_url}")
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
-        })
+        logger.info("Initialized web scraper with base URL: %s", self.base_url)
 
-    def _get_soup(self, url: str) -> Optional[BeautifulSoup]:
-        try:
-            logger.info(f"Fetching URL: {url}")
-            resp = self.session.get(url, timeout=10)
-            resp.raise_for_status()
-            logger.info(f"Successfully fetched URL: {url}")
-            return BeautifulSoup(resp.text, 'html.parser')
-        except Exception as e:
-            logger.error(f"Error fetching {url}: {e}")
-            return None
+    def _parse(self, html: str, page: str, slow: Callable[[BeautifulSoup], Any]) -> Any:
+        """Extracts `page` with the lxml fast path, or with `slow` on a BeautifulSoup tree if that fails."""
+        if self._fast is not None:
+            try:
+                result = getattr(self._fast, page)(html)
+            except Exception as e:
+                logger.debug("lxml %s extraction failed: %s", page, e)
+                result = None
+            if result is not None:
+                SCRAPER_PARSES.labels(page=page, parser="lxml").inc()
+                return result
+            logger.debug("Falling back to BeautifulSoup for %s", page)
+        SCRAPER_PARSES.labels(page=page, parser="beautifulsoup").inc()
+        return slow(BeautifulSoup(html, 'html.parser'))
+
+    def _extract_staff_links(self, html: str) -> List[str]:
+        return self._parse(html, "staff_links", self._soup_staff_links)
+
+    def _extract_staff_details(self, html: str) -> Dict[str, str]:
+        return self._parse(html, "staff_details", self._soup_staff_details)
 
-    def _extract_staff_links(self, soup: BeautifulSoup) -> List[str]:
-        links = set()
+    def _parse_announcements(self, html: str) -> List[Dict[str, str]]:
+        return self._parse(html, "announcements", self._soup_announcements)
+
+    def _parse_contact_info(self, html: str) -> Dict[str, Optional[List[str]]]:
+        return self._parse(html, "contact_info", self._soup_contact_info)
+
+    def _soup_staff_links(self, soup: BeautifulSoup) -> List[str]:
+        # dict keeps the listing order while dropping duplicates
+        links = {}
         for a in soup.find_all('a', href=re.compile(r'pers_id=\d+')):
             href = a['href']
-            full = href if href.startswith('http') else urljoin(self.base_url, href)
-            links.add(full)
+            full = href if href.startswith('http') else _absolute_url(self.base_url, href)
+            links[full] = None
         return list(links)
 
-    def _extract_staff_details(self, soup: BeautifulSoup) -> Dict[str, str]:
+    def _soup_staff_details(self, soup: BeautifulSoup) -> Dict[str, str]:
         details = {
             'name': '',
             'title': '',
@@ -97,29 +273,7 @@ class LibraryWebScraper:
                     details['internal_phone'] = val
         return details
 
-    def get_all_staff_details(self) -> List[Dict[str, str]]:
-        soup = self._get_soup(self.staff_url)
-        if not soup:
-            logger.error("Failed to fetch staff listing page")
-            return []
-        links = self._extract_staff_links(soup)
-        logger.info(f"Found {len(links)} unique staff profile links")
-        all_details = []
-        for link in links:
-            profile = self._get_soup(link)
-            if not profile:
-                continue
-            details = self._extract_staff_details(profile)
-            if details.get('name'):
-                logger.info(f"Processed profile: {details['name']}")
-                all_details.append(details)
-        logger.info(f"Successfully processed {len(all_details)} staff profiles")
-        return all_details
-
-    def get_announcements(self) -> List[Dict[str, str]]:
-        soup = self._get_soup(self.announcements_url)
-        if not soup:
-            return []
+    def _soup_announcements(self, soup: BeautifulSoup) -> List[Dict[str, str]]:
         rows = soup.find_all('table')[0].find_all('tr')[1:6]
         announcements = []
         for row in rows:
@@ -127,7 +281,7 @@ class LibraryWebScraper:
             if len(cols) >= 3:
                 title_link = cols[2].find('a')
                 title = title_link.get_text(strip=True) if title_link else cols[2].get_text(strip=True)
-                url = urljoin(self.base_url, title_link['href']) if title_link else ''
+                url = _absolute_url(self.base_url, title_link['href']) if title_link else ''
                 announcements.append({
                     'title': title,
                     'date': cols[1].get_text(strip=True),
@@ -135,10 +289,7 @@ class LibraryWebScraper:
                 })
         return announcements
 
-    def get_contact_info(self) -> Dict[str, Optional[List[str]]]:
-        soup = self._get_soup(self.contact_url)
-        if not soup:
-            return {}
+    def _soup_contact_info(self, soup: BeautifulSoup) -> Dict[str, Optional[List[str]]]:
         content = soup.find('div', class_='dinamic-content text-left')
         if not content:
             logger.error("Contact content area not found")
@@ -153,12 +304,126 @@ class LibraryWebScraper:
         phones = []
         for img in content.find_all('img', alt=True):
             alt = img['alt'].strip()
-            if re.match(r"\+90\s*\d{3}\s*\d{3}\s*\d{4}", alt):
+            if PHONE_RE.match(alt):
                 phones.append(alt)
         contact['phone'] = phones
         # Email
         email_link = content.find('a', href=re.compile(r'mailto:'))
         if email_link:
             contact['email'] = email_link['href'].replace('mailto:', '').strip()
-        logger.info(f"Contact information gathering completed: {contact}")
+        logger.debug("Contact information gathering completed: %s", contact)
         return contact
+
+
+class AsyncLibraryWebScraper(BaseLibraryWebScraper):
+    """
+    Library website scraper on the shared pooled HTTP client.
+
+    Pages are fetched with conditional GETs (If-None-Match / If-Modified-Since).
+    When the site answers 304 the previous parse result is reused, so a
+    periodic refresh of unchanged pages costs one small request and no parsing.
+    """
+
+    def __init__(self, concurrency: int = STAFF_CRAWL_CONCURRENCY, per_host: int = STAFF_CRAWL_PER_HOST):
+        super().__init__()
+        # url -> (ETag, Last-Modified, parsed result)
+        self._pages: Dict[str, Tuple[Optional[str], Optional[str], Any]] = {}
+        # pers_id -> (fetched at, details)
+        self._profiles: Dict[str, Tuple[float, Dict[str, str]]] = {}
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self._host_limits[host]
+
+    async def _get_parsed(self, url: str, parse: Callable[[str], Any],
+                          timeout: float = 10) -> Optional[Any]:
+        """Fetches url conditionally and returns parse(html), or the cached result on 304."""
+        headers = dict(HEADERS)
+        cached = self._pages.get(url)
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        try:
+            logger.debug("Fetching URL: %s", url)
+            with website_breaker.attempt() as call_timeout:
+                resp = await get_async_client().get(url, headers=headers, timeout=min(timeout, call_timeout))
+                if resp.status_code >= 500:
+                    resp.raise_for_status()
+            if resp.status_code == 304 and cached:
+                logger.debug("Not modified: %s", url)
+                return cached[2]
+            resp.raise_for_status()
+            logger.debug("Successfully fetched URL: %s", url)
+            result = parse(resp.text)
+        except Exception as e:
+            logger.error("Error fetching %s: %s", url, e)
+            return None
+        etag = resp.headers.get('ETag')
+        last_modified = resp.headers.get('Last-Modified')
+        if etag or last_modified:
+            self._pages[url] = (etag, last_modified, result)
+        return result
+
+    async def get_all_staff_details(self) -> List[Dict[str, str]]:
+        """
+        Crawls the staff listing and then the profiles in parallel.
+
+        At most `concurrency` profiles are fetched at once and at most
+        `per_host` per host. Each page has its own timeout, and failed pages
+        are left out instead of failing the crawl. Profiles are kept by
+        pers_id; one fetched within STAFF_PROFILE_TTL is reused without a
+        request.
+        """
+        links = await self._get_parsed(self.staff_url, self._extract_staff_links)
+        if links is None:
+            logger.error("Failed to fetch staff listing page")
+            return []
+        logger.info("Found %d unique staff profile links", len(links))
+
+        crawl_limit = asyncio.Semaphore(self.concurrency)
+        now = time.monotonic()
+
+        async def fetch_profile(link: str) -> Tuple[str, Optional[Dict[str, str]]]:
+            match = PERS_ID_RE.search(link)
+            pers_id = match.group(1) if match else link
+            cached = self._profiles.get(pers_id)
+            if cached and now - cached[0] < STAFF_PROFILE_TTL:
+                return pers_id, cached[1]
+            async with crawl_limit, self._host_limit(link):
+                try:
+                    details = await asyncio.wait_for(
+                        self._get_parsed(link, self._extract_staff_details, timeout=STAFF_PAGE_TIMEOUT),
+                        STAFF_PAGE_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+                    logger.error("Timed out fetching %s", link)
+                    details = None
+            if details and details.get('name'):
+                self._profiles[pers_id] = (time.monotonic(), details)
+                return pers_id, details
+            # Keep serving the previous copy of a profile that failed this time
+            return pers_id, cached[1] if cached else None
+
+        results = await asyncio.gather(*(fetch_profile(link) for link in links))
+        current = {pers_id for pers_id, _ in results}
+        for pers_id in list(self._profiles):
+            if pers_id not in current:
+                del self._profiles[pers_id]
+
+        all_details = [details for _, details in results if details]
+        logger.info("Successfully processed %d of %d staff profiles", len(all_details), len(links))
+        return all_details
+
+    async def get_announcements(self) -> List[Dict[str, str]]:
+        return await self._get_parsed(self.announcements_url, self._parse_announcements) or []
+
+    async def get_contact_info(self) -> Dict[str, Optional[List[str]]]:
+        return await self._get_parsed(self.contact_url, self._parse_contact_info) or {}
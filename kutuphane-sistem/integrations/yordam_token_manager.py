@@ -2,52 +2,328 @@ import os
 import requests
 from dotenv import load_dotenv
 import logging
-from typing import Optional, Dict
+import asyncio
+import contextvars
+import threading
+import time
+from typing import Optional, Dict, Tuple
 from datetime import datetime, timedelta
+from urllib.parse import quote_plus
+from .shared_state import LeaderLease, get_leader, get_state
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
-# API Configuration
-API_URL = os.getenv("LIBRARY_API_URL", "").strip()
-API_USER = os.getenv("YORDAM_USERNAME", "").strip()
-API_PASS = os.getenv("YORDAM_PASSWORD", "").strip()
+# API Configuration (the token is issued by the same webservice that answers searches)
+API_URL = (os.getenv("LIBRARY_API_URL", "").strip()
+           or os.getenv("YORDAM_API_URL", "https://katalog.yordamdestek.com/yordam/webservis/webservis.php"))
+API_USER = (os.getenv("YORDAM_USERNAME", "") or os.getenv("LIBRARY_API_USER", "")).strip()
+API_PASS = (os.getenv("YORDAM_PASSWORD", "") or os.getenv("LIBRARY_API_PASS", "")).strip()
 
-# Token cache
-TOKEN_CACHE = {
-    "token": None,
-    "expiry": None
-}
+# Lifetime assumed when the login response does not say when the token expires
+YORDAM_TOKEN_TTL = int(os.getenv("YORDAM_TOKEN_TTL", "3600"))
+# Tokens are renewed this many seconds before they expire
+YORDAM_TOKEN_REFRESH_MARGIN = int(os.getenv("YORDAM_TOKEN_REFRESH_MARGIN", "300"))
+YORDAM_LOGIN_TIMEOUT = float(os.getenv("YORDAM_LOGIN_TIMEOUT", "10"))
+# Seconds to wait before trying again after a failed login
+YORDAM_LOGIN_BACKOFF = float(os.getenv("YORDAM_LOGIN_BACKOFF", "30"))
+
+# Token cache, kept in the shared state so every worker uses the same token
+TOKEN_CACHE_KEY = "yordam:token"
+LOGIN_LOCK = "yordam_login"
+
+# This process's copy of the cached token, so requests do not read the shared state
+_local: Dict = {"token": None, "expiry": None}
+# One login at a time per process; across workers the LOGIN_LOCK lock does the same
+_login_lock = threading.Lock()
+_login_retry_at = 0.0
 
 def get_diagnostic_info() -> Dict:
     """
     Returns diagnostic information about the API connection.
     """
+    token, expiry = _cached_entry()
     return {
         "endpoint": API_URL,
         "user": API_USER,
         "has_password": bool(API_PASS),
-        "test_url": f"{API_URL}?islem=token&kullanici={API_USER}&sifre=***"
+        "test_url": f"{API_URL}?islem=token&kullanici={API_USER}&sifre=***",
+        "has_static_token": bool(_static_token()),
+        "token_expiry": expiry.isoformat(timespec="seconds") if token else None
     }
 
-def get_yordam_token() -> Optional[str]:
+def has_credentials() -> bool:
+    return bool(API_USER and API_PASS)
+
+def _static_token() -> Optional[str]:
+    return os.getenv("STATIC_YORDAM_TOKEN", "").strip() or None
+
+def _local_entry() -> Tuple[Optional[str], Optional[datetime]]:
+    """Returns the unexpired (token, expiry) this process holds, without touching the shared state."""
+    if _local["token"] and _local["expiry"] > datetime.now():
+        return _local["token"], _local["expiry"]
+    return None, None
+
+def _cached_entry() -> Tuple[Optional[str], Optional[datetime]]:
+    """Returns the unexpired (token, expiry), from this process or the shared state."""
+    token, expiry = _local_entry()
+    if token:
+        return token, expiry
+    return _shared_entry()
+
+def _shared_entry() -> Tuple[Optional[str], Optional[datetime]]:
+    """Reads the token other workers may have stored and takes it over locally."""
+    try:
+        cached = get_state().get(TOKEN_CACHE_KEY)
+    except Exception as e:
+        logger.warning("Token cache unavailable: %s", e)
+        return None, None
+    if not cached:
+        return None, None
+    expiry = datetime.fromisoformat(cached["expiry"])
+    if expiry <= datetime.now():
+        return None, None
+    _local.update(token=cached["token"], expiry=expiry)
+    return cached["token"], expiry
+
+def get_cached_token() -> Optional[str]:
+    """
+    Returns the cached token if it has not expired.
+    """
+    return _cached_entry()[0]
+
+def cache_token(token: str, expiry: datetime):
+    """
+    Stores a token for all workers until its expiry.
     """
-    Returns manually set static token from .env file.
+    ttl = (expiry - datetime.now()).total_seconds()
+    if ttl <= 0:
+        return
+    _local.update(token=token, expiry=expiry)
+    try:
+        get_state().set(TOKEN_CACHE_KEY, {"token": token, "expiry": expiry.isoformat()}, ttl=ttl)
+    except Exception as e:
+        logger.warning("Could not cache token: %s", e)
+
+def _forget_token(token: str):
+    """Drops a token Yordam rejected, unless it was already replaced."""
+    if _local["token"] == token:
+        _local.update(token=None, expiry=None)
+    try:
+        state = get_state()
+        cached = state.get(TOKEN_CACHE_KEY)
+        if cached and cached["token"] == token:
+            state.delete(TOKEN_CACHE_KEY)
+    except Exception as e:
+        logger.warning("Could not drop rejected token: %s", e)
+
+def _parse_login(response: requests.Response) -> Tuple[Optional[str], Optional[datetime]]:
+    """
+    Extracts (token, expiry) from an islem=token response. Accepts a JSON
+    object with token/access_token (top level or under response/data) and
+    expires_in seconds or an expires/expiry timestamp, a JSON string, or the
+    bare token as plain text. Without an expiry, YORDAM_TOKEN_TTL is assumed.
+    """
+    try:
+        data = response.json()
+    except ValueError:
+        data = response.text.strip()
+
+    token, expiry = None, None
+    if isinstance(data, dict):
+        if data.get("status") == "error":
+            logger.error("Yordam token isteği reddedildi: %s", data.get("message", "Bilinmeyen hata"))
+            return None, None
+        for source in (data, data.get("response"), data.get("data")):
+            if isinstance(source, dict) and (source.get("token") or source.get("access_token")):
+                token = str(source.get("token") or source.get("access_token"))
+                if source.get("expires_in"):
+                    expiry = datetime.now() + timedelta(seconds=float(source["expires_in"]))
+                elif source.get("expires") or source.get("expiry"):
+                    try:
+                        # fromisoformat before Python 3.11 does not accept a "Z" suffix
+                        stamp = str(source.get("expires") or source.get("expiry"))
+                        expiry = datetime.fromisoformat(stamp.replace("Z", "+00:00"))
+                    except ValueError:
+                        pass
+                    else:
+                        # Compared with the naive local datetime.now() everywhere else
+                        if expiry.tzinfo is not None:
+                            expiry = expiry.astimezone().replace(tzinfo=None)
+                break
+    elif isinstance(data, str) and data and len(data) <= 512 and not any(c in data for c in " <{"):
+        token = data
+
+    if token and expiry is None:
+        expiry = datetime.now() + timedelta(seconds=YORDAM_TOKEN_TTL)
+    return token, expiry
+
+def _request_token() -> Optional[str]:
+    global _login_retry_at
+    try:
+        response = requests.get(
+            API_URL,
+            params={"islem": "token", "kullanici": API_USER, "sifre": API_PASS},
+            headers={"Accept": "application/json", "User-Agent": "BatmanLibrary/1.0"},
+            timeout=YORDAM_LOGIN_TIMEOUT
+        )
+        response.raise_for_status()
+        token, expiry = _parse_login(response)
+    except Exception as e:
+        # The exception text may contain the request URL, which carries the password
+        message = str(e).replace(API_PASS, "***").replace(quote_plus(API_PASS), "***")
+        logger.error("❌ Yordam token alınamadı: %s", message)
+        token, expiry = None, None
+
+    if not token:
+        _login_retry_at = time.monotonic() + YORDAM_LOGIN_BACKOFF
+        return None
+    cache_token(token, expiry)
+    logger.info("🔑 Yeni Yordam token alındı, geçerlilik: %s", expiry.isoformat(timespec="seconds"))
+    return token
+
+def _login(rejected: Optional[str]) -> Optional[str]:
+    """Logs in, or waits for the worker that is already logging in."""
+    state = get_state()
+    owner = get_leader().owner
+    if state.shared and not state.acquire_lock(LOGIN_LOCK, owner, ttl=YORDAM_LOGIN_TIMEOUT * 2):
+        deadline = time.monotonic() + YORDAM_LOGIN_TIMEOUT * 2
+        while time.monotonic() < deadline:
+            time.sleep(0.2)
+            token, _ = _shared_entry()
+            if token and token != rejected:
+                return token
+        return None
+    try:
+        return _request_token()
+    finally:
+        if state.shared:
+            state.release_lock(LOGIN_LOCK, owner)
+
+def renew_yordam_token(rejected: Optional[str] = None) -> Optional[str]:
     """
-    token = os.getenv("STATIC_YORDAM_TOKEN", "").strip()
+    Returns a token other than `rejected`, logging in if needed.
+
+    Concurrent callers share one login: whoever gets the lock logs in, the
+    others find the new token in the cache. Without credentials, or while
+    backing off after a failed login, the static token is returned unless it
+    is the rejected one.
+
+    Args:
+        rejected (Optional[str]): Token Yordam just refused, or the one to replace
+
+    Returns:
+        Optional[str]: A usable token, or None
+    """
+    with _login_lock:
+        current = get_cached_token()
+        if current and current != rejected:
+            return current
+        if rejected:
+            _forget_token(rejected)
+            # Another worker may already have replaced it
+            current, _ = _shared_entry()
+            if current and current != rejected:
+                return current
+        token = None
+        if has_credentials() and time.monotonic() >= _login_retry_at:
+            token = _login(rejected)
     if token:
-        logger.info("📦 Statik token .env dosyasından alındı.")
         return token
+    static = _static_token()
+    return static if static != rejected else None
+
+def get_yordam_token() -> Optional[str]:
+    """
+    Returns a usable token: the cached one, a freshly issued one, or the
+    manually set static token from .env file.
+    """
+    if has_credentials():
+        token = get_cached_token() or renew_yordam_token()
     else:
-        logger.error("❌ STATIC_YORDAM_TOKEN .env dosyasında bulunamadı.")
-        return None
+        token = _static_token()
+    if not token:
+        logger.error("❌ Yordam token yok: YORDAM_USERNAME/YORDAM_PASSWORD veya STATIC_YORDAM_TOKEN ayarlanmalı.")
+    return token
+
+async def get_yordam_token_async() -> Optional[str]:
+    """
+    get_yordam_token for the event loop: a token this process holds is
+    returned inline; reading the shared state (a blocking SQLite or Redis
+    call) and a login run in the default executor.
+    """
+    token = _local_entry()[0] if has_credentials() else _static_token()
+    if token:
+        return token
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(None, context.run, get_yordam_token)
+
+async def renew_yordam_token_async(rejected: Optional[str] = None) -> Optional[str]:
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(None, context.run, renew_yordam_token, rejected)
 
 def validate_token(token: str) -> bool:
     """
-    Token doğrulaması devre dışı bırakıldı.
+    Yordam has no endpoint for checking a token; a rejected token is detected
+    when a search fails (see library_api) and replaced there.
+    """
+    return bool(token and token.strip())
+
+class TokenRefresher:
+    """
+    Renews the token YORDAM_TOKEN_REFRESH_MARGIN seconds before it expires,
+    so requests never wait for a login. Runs only with credentials configured
+    and, with several workers, only in the leader.
     """
-    return True 
\ No newline at end of file
+
+    def __init__(self, leader: Optional[LeaderLease] = None):
+        self.leader = leader or get_leader()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def refresh_if_due(self) -> float:
+        """
+        Renews the token if it is missing or about to expire.
+
+        Returns:
+            float: Seconds until the next check
+        """
+        token, expiry = _cached_entry()
+        if token:
+            due_in = (expiry - datetime.now()).total_seconds() - YORDAM_TOKEN_REFRESH_MARGIN
+            if due_in > 0:
+                return min(due_in, 60)
+        # The current token stays cached and usable until the new one replaces it
+        with _login_lock:
+            if time.monotonic() < _login_retry_at:
+                return _login_retry_at - time.monotonic()
+            renewed = _login(rejected=token)
+        return 1 if renewed else YORDAM_LOGIN_BACKOFF
+
+    def _run(self):
+        while not self._stop.is_set():
+            wait = 60
+            if self.leader.is_leader:
+                try:
+                    wait = self.refresh_if_due()
+                except Exception as e:
+                    logger.error("Yordam token refresh failed: %s", e)
+            self._stop.wait(wait)
+
+    def start(self):
+        """Starts proactive renewal in a daemon thread."""
+        if not has_credentials():
+            logger.info("Yordam kullanıcı bilgileri yok, statik token kullanılacak")
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="yordam-token", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import time
+
+from integrations.cache import TTLCache
+from integrations.shared_state import MemoryState
+
+
+class RecordingState(MemoryState):
+    """A shared backend that records which threads call it."""
+
+    shared = True
+
+    def __init__(self):
+        super().__init__()
+        self.threads = []
+        self.ttls = {}
+
+    def get(self, key):
+        self.threads.append(threading.current_thread())
+        return super().get(key)
+
+    def set(self, key, value, ttl=None):
+        self.threads.append(threading.current_thread())
+        self.ttls[key] = ttl
+        super().set(key, value, ttl)
+
+
+def shared_cache(state, **kwargs):
+    cache = TTLCache("test", **kwargs)
+    cache._shared = state
+    return cache
+
+
+def test_async_path_keeps_shared_state_calls_off_the_event_loop():
+    state = RecordingState()
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return ["result"]
+
+    async def run():
+        first = shared_cache(state)
+        assert await first.get_or_load("q", loader) == ["result"]
+        # Another worker: local miss, answered from the shared state
+        second = shared_cache(state)
+        assert await second.get_or_load("q", loader) == ["result"]
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(run())
+    assert calls == [1]
+    assert state.threads and all(thread is not loop_thread for thread in state.threads)
+
+
+def test_empty_values_are_not_served_stale():
+    cache = TTLCache("test", ttl=0.05, negative_ttl=0.05, stale_ttl=60)
+    cache.set("empty", [])
+    cache.set("full", ["result"])
+    time.sleep(0.06)
+    assert cache._lookup("empty") == (False, None, False)
+    assert cache._lookup("full") == (True, ["result"], False)
+
+
+def test_empty_values_get_no_stale_time_in_shared_state():
+    state = RecordingState()
+    cache = shared_cache(state, ttl=300, negative_ttl=30, stale_ttl=600)
+    cache.set("empty", [])
+    cache.set("full", ["result"])
+    assert state.ttls["cache:test:empty"] == 30
+    assert state.ttls["cache:test:full"] == 900
@@ -0,0 +1,55 @@
+import pytest
+
+from integrations.intent_router import IntentRouter, website_topic
+
+
+@pytest.fixture
+def router():
+    return IntentRouter(model=None)
+
+
+@pytest.mark.parametrize("title", [
+    "Suç ve Ceza",
+    "Da Vinci Şifresi",
+    "Çelik Nasıl Su Verildi",
+    "Internet of things",
+])
+def test_book_titles_with_general_words_reach_the_catalog(router, title):
+    route = router.route(title)
+    assert route is None or "catalog" in route
+
+
+@pytest.mark.parametrize("title", [
+    "Adres Defteri",
+    "Telefonun İcadı",
+    "Personel Yönetimi",
+    "Halkla İlişkiler ve İletişim",
+    "E-posta ile Pazarlama",
+])
+def test_book_titles_with_website_words_reach_the_catalog(router, title):
+    route = router.route(title)
+    assert route is None or "catalog" in route
+
+
+@pytest.mark.parametrize("query", ["merhaba", "kütüphane kaçta kapanıyor", "ödünç süresi nedir"])
+def test_general_questions_skip_the_backends(router, query):
+    assert router.route(query) == []
+
+
+@pytest.mark.parametrize("query, topic", [
+    ("duyurular", "announcements"),
+    ("Kütüphane personeli", "staff"),
+    ("çalışanlar kimler", "staff"),
+    ("iletişim bilgileri", "contact"),
+    ("kütüphanenin adresi", "contact"),
+    ("kütüphanenin telefon numarası", "contact"),
+    ("e-posta adresiniz nedir", "contact"),
+    ("telefonunuz", "contact"),
+])
+def test_website_routes_have_a_website_topic(router, query, topic):
+    assert router.route(query) == ["website"]
+    assert website_topic(query) == topic
+
+
+def test_no_website_topic_for_other_queries():
+    assert website_topic("yapay zeka kitapları") is None
@@ -0,0 +1,31 @@
+import asyncio
+import threading
+
+from integrations import library_api
+from integrations.results import CatalogItem
+
+
+def test_mirror_search_runs_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def mirror_search(query, limit=10):
+        threads.append(threading.current_thread())
+        return [CatalogItem(f"{query} {n}") for n in range(limit)]
+
+    monkeypatch.setattr(library_api, "LIBRARY_SEARCH_MODE", "mirror")
+    monkeypatch.setattr(library_api, "_mirror_search", mirror_search)
+
+    async def run():
+        records = await library_api.query_library_async("tarih", "token")
+        page, total = await library_api.search_catalog_page_async("tarih", "token", 10, 10)
+        return records, page, threading.current_thread()
+
+    records, page, loop_thread = asyncio.run(run())
+    assert len(records) == 10
+    assert page[0].title == "tarih 10"
+    assert len(threads) == 2 and loop_thread not in threads
+
+
+def test_live_mode_skips_the_mirror(monkeypatch):
+    monkeypatch.setattr(library_api, "LIBRARY_SEARCH_MODE", "live")
+    assert asyncio.run(library_api._mirror_search_async("tarih")) is None
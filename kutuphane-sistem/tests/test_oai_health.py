@@ -0,0 +1,46 @@
+import threading
+import time
+
+from integrations.oai_health import OAIEndpointMonitor
+from integrations.shared_state import MemoryState
+
+
+class Leader:
+    is_leader = True
+    state = MemoryState()
+
+
+class CountingMonitor(OAIEndpointMonitor):
+    def __init__(self):
+        super().__init__(endpoints=["http://oai.test/request"], interval=60, leader=Leader())
+        self.probes = 0
+
+    def refresh(self):
+        self.probes += 1
+        time.sleep(0.1)
+        with self._lock:
+            self._status = dict(self._status, endpoint=self.endpoints[0])
+        return self.status()
+
+
+def test_get_endpoint_waits_for_the_first_check_instead_of_probing_again():
+    monitor = CountingMonitor()
+    monitor.start()
+    try:
+        results = []
+        callers = [threading.Thread(target=lambda: results.append(monitor.get_endpoint())) for _ in range(3)]
+        for caller in callers:
+            caller.start()
+        for caller in callers:
+            caller.join()
+    finally:
+        monitor.stop()
+    assert results == ["http://oai.test/request"] * 3
+    assert monitor.probes == 1
+
+
+def test_get_endpoint_probes_when_no_monitor_thread_runs():
+    monitor = CountingMonitor()
+    assert monitor.get_endpoint() == "http://oai.test/request"
+    assert monitor.get_endpoint() == "http://oai.test/request"
+    assert monitor.probes == 1
@@ -0,0 +1,109 @@
+import io
+
+import pytest
+
+from integrations import oai_pmh
+from integrations.oai_pmh import OAIError, OAIHarvester, parse_list_records
+
+RESPONSE = b"""<?xml version="1.0" encoding="UTF-8"?>
+<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/"
+         xmlns:dc="http://purl.org/dc/elements/1.1/">
+  <ListRecords>
+    <record>
+      <header><identifier>oai:test:1</identifier><datestamp>2024-01-01</datestamp></header>
+      <metadata><dc:title>Osmanli tarihi</dc:title></metadata>
+    </record>
+    <record><metadata><dc:title>Header missing</dc:title></metadata></record>
+    <record>
+      <header><identifier> </identifier><datestamp>2024-01-02</datestamp></header>
+    </record>
+    <record>
+      <header status="deleted"><identifier>oai:test:2</identifier><datestamp>2024-01-03</datestamp></header>
+    </record>
+    <resumptionToken>next-page</resumptionToken>
+  </ListRecords>
+</OAI-PMH>"""
+
+
+def collect(source):
+    records = parse_list_records(source)
+    found = []
+    while True:
+        try:
+            found.append(next(records))
+        except StopIteration as stop:
+            return found, stop.value
+
+
+def test_malformed_records_are_skipped():
+    records, token = collect(io.BytesIO(RESPONSE))
+    assert [(record.identifier, record.deleted) for record in records] == [("oai:test:1", False), ("oai:test:2", True)]
+    assert records[0].title == "Osmanli tarihi"
+    assert token == "next-page"
+
+
+class FakeStore:
+    def __init__(self, **state):
+        self.state = state
+        self.rows = []
+
+    def get_state(self, key):
+        return self.state.get(key)
+
+    def set_state(self, key, value):
+        self.state[key] = value
+
+    def upsert_records(self, rows):
+        self.rows.extend(rows)
+        return len(rows)
+
+    def delete_records(self, identifiers):
+        return len(identifiers)
+
+    def count(self):
+        return len(self.rows)
+
+
+class FakeMonitor:
+    def get_endpoint(self):
+        return "http://oai.test/request"
+
+
+def test_expired_resumption_token_restarts_without_recursion(monkeypatch):
+    requests = []
+
+    class FakeClient:
+        def __init__(self, endpoint):
+            pass
+
+        def list_records(self, from_date=None, resumption_token=None, on_page=None):
+            requests.append((from_date, resumption_token))
+            if resumption_token:
+                raise OAIError("badResumptionToken")
+            records = yield from parse_list_records(io.BytesIO(RESPONSE))
+            on_page(None)
+            return records
+
+    monkeypatch.setattr(oai_pmh, "OAIPMHClient", FakeClient)
+    store = FakeStore(resumption_token="expired", last_datestamp="2023-12-31")
+    harvester = OAIHarvester(store=store, monitor=FakeMonitor(), leader=object())
+
+    assert harvester.harvest() == 2
+    assert requests == [(None, "expired"), ("2023-12-31", None)]
+    assert store.state["resumption_token"] is None
+    assert store.state["last_datestamp"] == "2024-01-03"
+
+
+def test_bad_resumption_token_without_a_saved_token_is_raised(monkeypatch):
+    class FakeClient:
+        def __init__(self, endpoint):
+            pass
+
+        def list_records(self, from_date=None, resumption_token=None, on_page=None):
+            raise OAIError("badResumptionToken")
+            yield
+
+    monkeypatch.setattr(oai_pmh, "OAIPMHClient", FakeClient)
+    harvester = OAIHarvester(store=FakeStore(), monitor=FakeMonitor(), leader=object())
+    with pytest.raises(OAIError, match="badResumptionToken"):
+        harvester.harvest()
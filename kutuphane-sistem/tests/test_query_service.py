@@ -0,0 +1,66 @@
+import asyncio
+import threading
+
+from integrations import query_service
+from integrations.query_service import QueryService
+from integrations.results import AcademicItem, CatalogItem, answer
+
+
+def test_batch_overlaps_academic_and_catalog_lookups(monkeypatch):
+    events = []
+    catalog_started = threading.Event()
+
+    def query_oai_many(keywords):
+        events.append(("academic", threading.current_thread()))
+        # Only returns once the catalog lookup has started alongside it
+        assert catalog_started.wait(1)
+        return [[AcademicItem(f"makale {keyword}")] for keyword in keywords]
+
+    async def query_library_many_async(queries, token, concurrency, deadline):
+        catalog_started.set()
+        events.append(("catalog", threading.current_thread()))
+        await asyncio.sleep(0.05)
+        return [[CatalogItem(f"kitap {query}")] for query in queries]
+
+    async def get_token():
+        return "token"
+
+    monkeypatch.setattr(query_service, "query_oai_many", query_oai_many)
+    monkeypatch.setattr(query_service, "query_library_many_async", query_library_many_async)
+    monkeypatch.setattr(query_service, "get_yordam_token_async", get_token)
+    monkeypatch.setattr(query_service, "validate_token", lambda token: True)
+
+    service = QueryService(llm=lambda messages, max_tokens: "")
+    orders = {"tarih": ["catalog", "academic"], "fizik": ["academic"]}
+
+    async def run():
+        return await service._backend_answers(orders), threading.current_thread()
+
+    found, loop_thread = asyncio.run(run())
+    assert found["tarih"]["catalog"] and found["tarih"]["academic"] and found["fizik"]["academic"]
+    assert dict(events)["academic"] is not loop_thread
+
+
+def test_stream_sends_results_in_priority_order(monkeypatch):
+    counted = []
+    monkeypatch.setattr(query_service, "count_answer", counted.append)
+    service = QueryService(llm=lambda messages, max_tokens: "")
+
+    def backend(name, delay):
+        async def handler(query):
+            await asyncio.sleep(delay)
+            return answer(name, [CatalogItem(name)])
+        return handler
+
+    # The academic backend finishes first, but the catalog has priority
+    monkeypatch.setattr(service, "backend_stages", lambda query: [
+        ("catalog", backend("catalog", 0.05), 1), ("academic", backend("academic", 0), 1)
+    ])
+
+    async def run():
+        return [event async for event in service.stream_query("tarih")]
+
+    events = asyncio.run(run())
+    assert [event.get("source") for event in events] == ["catalog", "academic", None]
+    assert events[-1] == {"type": "done"}
+    assert counted == ["catalog"]
@@ -0,0 +1,48 @@
+import asyncio
+
+from integrations.cache import TTLCache
+from integrations.results import CatalogItem
+from integrations.search_cursor import SEARCH_PREFETCH, SearchCursors
+
+
+def make_cursors(calls):
+    async def fetch(query, offset, size):
+        calls.append((offset, size))
+        await asyncio.sleep(0.01)
+        return [CatalogItem(f"{query} {n}") for n in range(offset, offset + size)], None
+
+    cache = TTLCache("test_cursor", ttl=60, stale_ttl=0, negative_ttl=60, shared=False)
+    return SearchCursors({"catalog": fetch}, cache), cache
+
+
+def test_concurrent_pages_of_one_cursor_fetch_once():
+    calls = []
+    cursors, cache = make_cursors(calls)
+
+    async def run():
+        first = await cursors.search("catalog", "tarih", limit=10)
+        cursor_id = first["next_cursor"].split(".")[0]
+        deep = f"{cursor_id}.{SEARCH_PREFETCH}.10"
+        return await asyncio.gather(cursors.page(deep), cursors.page(deep)), cursor_id
+
+    (a, b), cursor_id = asyncio.run(run())
+    assert calls == [(0, SEARCH_PREFETCH), (SEARCH_PREFETCH, SEARCH_PREFETCH)]
+    assert [item.title for item in a["items"]] == [item.title for item in b["items"]]
+    assert a["items"][0].title == f"tarih {SEARCH_PREFETCH}"
+    assert len(cache.get(cursor_id)["items"]) == 2 * SEARCH_PREFETCH
+
+
+def test_page_does_not_modify_the_cached_state():
+    calls = []
+    cursors, cache = make_cursors(calls)
+
+    async def run():
+        first = await cursors.search("catalog", "tarih", limit=10)
+        cursor_id = first["next_cursor"].split(".")[0]
+        before = cache.get(cursor_id)
+        await cursors.page(f"{cursor_id}.{SEARCH_PREFETCH}.10")
+        return before, cache.get(cursor_id)
+
+    before, after = asyncio.run(run())
+    assert len(before["items"]) == SEARCH_PREFETCH
+    assert len(after["items"]) == 2 * SEARCH_PREFETCH
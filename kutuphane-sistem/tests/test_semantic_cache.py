@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from integrations.query_service import QueryService
+from integrations.semantic_cache import HashingEmbedder, SemanticCache, SEMANTIC_CACHE_THRESHOLD
+
+
+class StubEmbedder:
+    """Fixed vectors per question, so similarities are known exactly."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.calls = []
+
+    def __call__(self, text):
+        self.calls.append(text)
+        return self.vectors[text]
+
+
+class StubLLM:
+    def __init__(self, answer="Kütüphane 22.00'de kapanır."):
+        self.answer = answer
+        self.calls = 0
+
+    def __call__(self, messages, max_tokens):
+        self.calls += 1
+        return self.answer
+
+
+def test_sparse_lookup_serves_only_close_questions():
+    cache = SemanticCache(StubEmbedder({
+        "a": {0: 1.0, 1: 1.0},
+        "a'": {0: 1.0, 1: 0.9},
+        "b": {0: 1.0, 2: 1.0},
+    }), threshold=0.9)
+    cache.store("a", "answer a")
+    assert cache.lookup("a'") == "answer a"
+    assert cache.lookup("b") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_dense_lookup_uses_the_lsh_index():
+    cache = SemanticCache(StubEmbedder({
+        "a": [1.0, 0.2, 0.0, 0.1],
+        "a'": [0.98, 0.25, 0.02, 0.1],
+        "b": [0.0, 0.1, 1.0, -0.5],
+    }), threshold=0.95)
+    cache.store("a", "answer a")
+    assert cache.lookup("a'") == "answer a"
+    assert cache.lookup("b") is None
+
+
+def test_expired_and_evicted_entries_are_not_served():
+    vectors = {"a": {0: 1.0}, "b": {1: 1.0}, "c": {2: 1.0}}
+    cache = SemanticCache(StubEmbedder(vectors), maxsize=2, ttl=0)
+    cache.store("a", "answer a")
+    assert cache.lookup("a") is None
+
+    cache = SemanticCache(StubEmbedder(vectors), maxsize=2)
+    for question in ("a", "b", "c"):
+        cache.store(question, f"answer {question}")
+    assert cache.lookup("a") is None
+    assert cache.lookup("c") == "answer c"
+    assert len(cache) == 2
+
+
+@pytest.mark.parametrize("paraphrase", ["kütüphane saat kaçta kapanır", "Kütüphane kaçta kapanıyor?"])
+def test_default_embedder_matches_paraphrases(paraphrase):
+    cache = SemanticCache(HashingEmbedder(), threshold=SEMANTIC_CACHE_THRESHOLD)
+    cache.store("kütüphane kaçta kapanıyor", "22.00")
+    assert cache.lookup(paraphrase) == "22.00"
+
+
+@pytest.mark.parametrize("other", ["kütüphane kaçta açılıyor", "kütüphane cumartesi açık mı", "kütüphane nerede"])
+def test_default_embedder_keeps_different_questions_apart(other):
+    cache = SemanticCache(HashingEmbedder(), threshold=SEMANTIC_CACHE_THRESHOLD)
+    cache.store("kütüphane kaçta kapanıyor", "22.00")
+    assert cache.lookup(other) is None
+
+
+def test_query_service_calls_the_llm_once_per_question_meaning():
+    llm = StubLLM()
+    cache = SemanticCache(HashingEmbedder())
+    service = QueryService(llm=llm, semantic_cache=cache)
+
+    async def ask():
+        first = await service.get_chatgpt_response_async("kütüphane kaçta kapanıyor")
+        second = await service.get_chatgpt_response_async("kütüphane saat kaçta kapanır")
+        return first, second
+
+    first, second = asyncio.run(ask())
+    assert first == second
+    assert llm.calls == 1
+    # One lookup per question: the first misses, the second hits
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_streamed_answers_are_cached():
+    llm = StubLLM("Kütüphane hafta sonu açıktır.")
+    cache = SemanticCache(HashingEmbedder())
+    service = QueryService(llm=llm, semantic_cache=cache)
+
+    async def stream(query):
+        return [event async for event in service.stream_chatgpt_response(query)]
+
+    asyncio.run(stream("kütüphane hafta sonu açık mı"))
+    events = asyncio.run(stream("hafta sonu kütüphane açık mı"))
+    assert events == [{"type": "result", "source": "semantic_cache", "items": [],
+                       "text": "Kütüphane hafta sonu açıktır."}]
+    assert llm.calls == 1
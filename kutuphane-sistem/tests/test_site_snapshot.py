@@ -0,0 +1,26 @@
+from integrations.site_snapshot import SiteSnapshot
+
+
+def snapshot():
+    return SiteSnapshot(scraper=object(), path=None, leader=object())
+
+
+def published(updated, title="Duyuru"):
+    return {"data": {"announcements": [{"title": title, "url": "http://x", "date": "01.01.2025"}]},
+            "updated": {"announcements": updated}}
+
+
+def test_pulling_an_unchanged_snapshot_keeps_the_built_items():
+    site = snapshot()
+    site._apply(published("2025-01-01T10:00:00"))
+    items = site.get_items("announcements")
+    site._apply(published("2025-01-01T10:00:00"))
+    assert site.get_items("announcements") is items
+
+
+def test_pulling_a_newer_snapshot_rebuilds_the_items():
+    site = snapshot()
+    site._apply(published("2025-01-01T10:00:00"))
+    site.get_items("announcements")
+    site._apply(published("2025-01-01T10:30:00", title="Yeni duyuru"))
+    assert [item.title for item in site.get_items("announcements")] == ["Yeni duyuru"]
@@ -0,0 +1,86 @@
+import pytest
+
+from integrations.text_index import InvertedIndex, stem, tokenize, turkish_casefold, turkish_lower
+
+
+@pytest.mark.parametrize("text, folded", [
+    ("IŞIK", "isik"),
+    ("İstanbul", "istanbul"),
+    ("ılık", "ilik"),
+    ("Zekâ", "zeka"),
+    ("ÇÖĞÜŞ", "cogus"),
+    ("Café", "cafe"),
+])
+def test_turkish_casefold(text, folded):
+    assert turkish_casefold(text) == folded
+
+
+def test_turkish_lower_keeps_dotless_i():
+    assert turkish_lower("IRMAK İZMİR") == "ırmak izmir"
+
+
+@pytest.mark.parametrize("token, stemmed", [
+    ("kitaplari", "kitap"),
+    ("zekasi", "zeka"),
+    ("kutuphanelerinde", "kutuphan"),
+    ("kutuphane", "kutuphan"),
+    ("tarihi", "tarih"),
+    # Never cut below four characters
+    ("evde", "evde"),
+    ("ada", "ada"),
+])
+def test_stem(token, stemmed):
+    assert stem(token) == stemmed
+
+
+def test_tokenize_folds_stems_and_drops_stopwords():
+    assert tokenize("Yapay Zekâ ve Kütüphaneler hakkında kitap") == ["yapay", "zeka", "kutuphan"]
+    assert tokenize("ve", keep_stopwords=True) == ["ve"]
+
+
+def documents():
+    return [
+        ("title-hit", {"title": "Osmanlı Tarihi", "description": "Genel bir inceleme"}),
+        ("description-hit", {"title": "Genel Kültür", "description": "Osmanlı dönemine kısa bir bakış"}),
+        ("other", {"title": "Yapay Zekâ", "description": "Makine öğrenmesi"}),
+    ]
+
+
+def test_title_hits_outrank_description_hits():
+    index = InvertedIndex()
+    index.add_many(documents())
+    assert [key for key, _ in index.search("osmanlı")] == ["title-hit", "description-hit"]
+
+
+def test_min_match_requires_most_query_terms():
+    index = InvertedIndex()
+    index.add_many(documents())
+    assert [key for key, _ in index.search("osmanlı tarihi")][0] == "title-hit"
+    assert index.search("osmanlı kimya fizik") == []
+
+
+def test_removed_and_replaced_documents():
+    index = InvertedIndex()
+    index.add_many(documents())
+    index.remove("title-hit")
+    index.add("other", {"title": "Osmanlı Sanatı"})
+    assert len(index) == 2
+    assert [key for key, _ in index.search("osmanlı")] == ["other", "description-hit"]
+
+
+def test_scores_follow_the_document_count():
+    # b=0 leaves document length out, so only idf can differ
+    index = InvertedIndex(b=0)
+    index.add_many(documents())
+    index.search("osmanlı yapay", min_match=0.5)
+    # Adds documents without the query terms: N changes, their postings do not.
+    # Their length keeps the average within the 10% the ranked lists tolerate
+    added = [(f"extra-{n}", {"title": "Genel Bilgi", "description": "Genel inceleme"}) for n in range(20)]
+    index.add_many(added)
+
+    fresh = InvertedIndex(b=0)
+    fresh.add_many(documents() + added)
+    results = index.search("osmanlı yapay", min_match=0.5)
+    expected = fresh.search("osmanlı yapay", min_match=0.5)
+    assert [key for key, _ in results] == [key for key, _ in expected]
+    assert [score for _, score in results] == pytest.approx([score for _, score in expected])
@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta, timezone
+
+from integrations.yordam_token_manager import _parse_login
+
+
+class JSONResponse:
+    def __init__(self, data):
+        self.data = data
+        self.text = ""
+
+    def json(self):
+        return self.data
+
+
+def test_timezone_aware_expiry_becomes_naive_local_time():
+    expires = datetime.now(timezone.utc) + timedelta(hours=1)
+    for stamp in (expires.isoformat(), expires.strftime("%Y-%m-%dT%H:%M:%SZ")):
+        token, expiry = _parse_login(JSONResponse({"token": "abc", "expires": stamp}))
+        assert token == "abc"
+        assert expiry.tzinfo is None
+        # Comparable with datetime.now(), and about an hour away
+        assert timedelta(minutes=59) < expiry - datetime.now() <= timedelta(hours=1)
+
+
+def test_naive_expiry_is_kept():
+    token, expiry = _parse_login(JSONResponse({"data": {"access_token": "abc", "expiry": "2030-01-02T03:04:05"}}))
+    assert (token, expiry) == ("abc", datetime(2030, 1, 2, 3, 4, 5))